@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Measures how long `import zulip` and constructing a zulip.Client take
+in a fresh interpreter, as they do for every run of the git, svn and
+nagios hooks, and fails if the import exceeds its time budget.
+
+    python benchmarks/bench_import_time.py [--budget-ms 100] [--runs 15]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+CONSTRUCT_CLIENT = """
+import time
+start = time.perf_counter()
+import zulip
+client = zulip.Client(email="hook-bot@example.com", api_key="key", site="https://zulip.example.com")
+client.get_user_agent()
+print(time.perf_counter() - start)
+"""
+
+
+def import_time_us() -> int:
+    """Returns the cumulative import time of zulip reported by -X importtime."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import zulip"],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    for line in process.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == "zulip":
+            return int(fields[1])
+    raise RuntimeError("zulip not found in -X importtime output")
+
+
+def client_time_s() -> float:
+    process = subprocess.run(
+        [sys.executable, "-c", CONSTRUCT_CLIENT],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return float(process.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    # The first run also writes the .pyc files, so don't count it.
+    import_time_us()
+    import_times = [import_time_us() / 1000 for i in range(args.runs)]
+    client_times = [client_time_s() * 1000 for i in range(args.runs)]
+
+    import_ms = statistics.median(import_times)
+    print(f"import zulip:                  {import_ms:8.1f}ms (budget {args.budget_ms:.0f}ms)")
+    print(f"import zulip + Client + agent: {statistics.median(client_times):8.1f}ms")
+    if import_ms > args.budget_ms:
+        sys.exit(f"import zulip took {import_ms:.1f}ms, over its {args.budget_ms:.0f}ms budget")
+
+
+if __name__ == "__main__":
+    main()
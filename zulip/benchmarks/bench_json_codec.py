@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Compares the JSON codecs zulip.Client can use on large `register` and
+`get_messages` responses, and on request marshalling.
+
+    python benchmarks/bench_json_codec.py
+"""
+
+import json
+import timeit
+from typing import Any, Callable, Dict, List
+
+from payloads import get_messages_response, register_response
+
+from zulip.json_codec import JSONCodec, OrjsonCodec, UjsonCodec
+
+
+def available_codecs() -> List[JSONCodec]:
+    codecs = [JSONCodec()]
+    for codec_class in (OrjsonCodec, UjsonCodec):
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            pass
+    return codecs
+
+
+def best_time(func: Callable[[], Any], repeat: int = 5) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    register_body = json.dumps(register_response()).encode()
+    messages_body = json.dumps(get_messages_response()).encode()
+    # The non-string parameters of a typical register request, which
+    # do_api_query encodes one by one.
+    request = {
+        "event_types": ["message", "subscription", "realm_user", "stream"],
+        "narrow": [["stream", "devel"], ["topic", "release"]],
+        "fetch_event_types": ["realm_user", "subscription", "stream", "realm_emoji"],
+        "apply_markdown": True,
+        "client_gravatar": True,
+        "slim_presence": True,
+    }
+
+    cases = [
+        (f"decode register ({len(register_body) / 1e6:.1f} MB)", register_body),
+        (f"decode get_messages ({len(messages_body) / 1e6:.1f} MB)", messages_body),
+    ]
+
+    def measure(codec: JSONCodec) -> Dict[str, float]:
+        timings = {name: best_time(lambda: codec.loads(body)) for name, body in cases}
+        timings["marshal register request"] = best_time(
+            lambda: {key: codec.dumps(value) for key, value in request.items()}
+        )
+        return timings
+
+    results = {codec.name: measure(codec) for codec in available_codecs()}
+
+    baseline = results["json"]
+    print("{:<36} {:>8} {:>12} {:>8}".format("case", "codec", "time", "speedup"))
+    for case in baseline:
+        for codec_name, timings in results.items():
+            print(
+                "{:<36} {:>8} {:>10.3f}ms {:>7.1f}x".format(
+                    case,
+                    codec_name,
+                    timings[case] * 1000,
+                    baseline[case] / timings[case],
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
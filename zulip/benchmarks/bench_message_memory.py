@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Measures the memory taken by a large batch of messages, e.g. an archive
+script's, kept as the dicts get_messages returns and as zulip.Message
+objects (iter_messages(compact=True)).
+
+    python benchmarks/bench_message_memory.py --count 100000
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from payloads import make_messages
+
+from zulip import Message
+
+
+def make_bodies(count: int, page_size: int = 1000) -> List[bytes]:
+    """
+    Returns get_messages pages of `count` messages in total, as JSON,
+    so that each measurement decodes its own copy of every string like
+    the client does.
+    """
+    rng = random.Random(0)
+    messages = make_messages(count)
+    for message in messages[::5]:
+        # Every fifth message is a private message to two users.
+        user_ids = [message["sender_id"], rng.randint(1, 2000)]
+        message.update(
+            type="private",
+            display_recipient=[
+                {
+                    "id": user_id,
+                    "email": f"user{user_id}@example.com",
+                    "full_name": f"User Number {user_id}",
+                    "is_mirror_dummy": False,
+                }
+                for user_id in user_ids
+            ],
+            subject="",
+        )
+        del message["stream_id"]
+    return [
+        json.dumps(messages[start : start + page_size]).encode()
+        for start in range(0, count, page_size)
+    ]
+
+
+def measure(bodies: List[bytes], load: Callable[[bytes], List[Any]]) -> Dict[str, float]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    messages = []  # type: List[Any]
+    for body in bodies:
+        messages.extend(load(body))
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Keeps the messages alive until they have been measured.
+    del messages
+    return {"current": current, "peak": peak, "seconds": elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    bodies = make_bodies(args.count)
+    results = {
+        "dict": measure(bodies, json.loads),
+        "zulip.Message": measure(
+            bodies, lambda body: [Message(message) for message in json.loads(body)]
+        ),
+    }
+
+    print(f"{args.count} messages:")
+    for name, result in results.items():
+        print(
+            f"  {name:<14} {result['current'] / 1e6:8.1f} MB"
+            f"  ({result['current'] / args.count:6.0f} bytes/message,"
+            f" peak {result['peak'] / 1e6:.1f} MB, {result['seconds']:.2f}s)"
+        )
+    ratio = results["dict"]["current"] / results["zulip.Message"]["current"]
+    print(f"zulip.Message takes {ratio:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
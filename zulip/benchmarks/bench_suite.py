@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the client's hot paths, and saves the results as JSON so
+that releases can be compared:
+
+    python benchmarks/bench_suite.py --output before.json
+    (upgrade or change zulip)
+    python benchmarks/bench_suite.py --output after.json --compare before.json
+
+With --compare, benchmarks that got slower by more than --threshold
+(by default 10%) are reported, and the script exits with status 1.
+Use --filter to run only the benchmarks whose name contains a string.
+
+Each benchmark reports the best (minimum) time per operation over
+--repeat runs, which is the least noisy estimate, as well as the
+median.  Everything runs locally: requests are answered by a
+zulip.testing.ScriptedTransport, or by a zulip.testing.FakeZulipServer
+for send_message.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from payloads import get_messages_response, make_messages, register_response
+
+import zulip
+from zulip.testing import FakeZulipServer, ScriptedTransport, make_response
+
+# A benchmark returns a function doing `number` operations, and a
+# cleanup function.
+_Benchmark = Callable[[], Tuple[Callable[[], object], Callable[[], None]]]
+_Benchmarks = List[Tuple[str, _Benchmark]]
+BENCHMARKS = []  # type: _Benchmarks
+
+
+def benchmark(name: str) -> Callable[[_Benchmark], _Benchmark]:
+    def register(func: _Benchmark) -> _Benchmark:
+        BENCHMARKS.append((name, func))
+        return func
+
+    return register
+
+
+def no_cleanup() -> None:
+    pass
+
+
+def stub_client(respond: Callable[[str, str], bytes]) -> zulip.Client:
+    return zulip.Client(
+        email="bench-bot@example.com",
+        api_key="key",
+        site="https://zulip.example.com",
+        transport=ScriptedTransport(
+            respond=lambda method, endpoint: make_response(200, respond(method, endpoint))
+        ),
+    )
+
+
+@benchmark("do_api_query marshalling")
+def bench_do_api_query() -> Tuple[Callable[[], object], Callable[[], None]]:
+    client = stub_client(lambda method, endpoint: b'{"result": "success", "msg": ""}')
+    request = {
+        "event_types": ["message", "subscription", "realm_user", "stream"],
+        "narrow": [["stream", "devel"], ["topic", "release"]],
+        "apply_markdown": True,
+        "client_gravatar": True,
+        "queue_lifespan_secs": 600,
+    }
+    return lambda: client.call_endpoint("register", request=request), no_cleanup
+
+
+@benchmark("send_message round trip (local server)")
+def bench_send_message() -> Tuple[Callable[[], object], Callable[[], None]]:
+    server = FakeZulipServer().start()
+    client = server.make_client("bench-bot@example.com")
+    message = {"type": "stream", "to": "general", "topic": "bench", "content": "hello"}
+
+    def send() -> object:
+        result = client.send_message(message)
+        assert result["result"] == "success", result
+        return result
+
+    return send, server.stop
+
+
+@benchmark("call_on_each_event dispatch, per event")
+def bench_call_on_each_event() -> Tuple[Callable[[], object], Callable[[], None]]:
+    batch = 100
+    events = [
+        {"type": "message", "id": i, "message": message, "flags": []}
+        for i, message in enumerate(make_messages(batch))
+    ]
+    events_body = json.dumps({"result": "success", "msg": "", "events": events}).encode()
+    register_body = json.dumps(
+        {"result": "success", "msg": "", "queue_id": "1:1", "last_event_id": -1}
+    ).encode()
+    client = stub_client(
+        lambda method, endpoint: events_body if endpoint == "events" else register_body
+    )
+
+    class Done(Exception):
+        pass
+
+    def dispatch() -> object:
+        # Handles `batch` events, i.e. one get_events response, so
+        # that the time per operation is divided by the batch size.
+        count = [0]
+
+        def callback(event: Dict[str, Any]) -> None:
+            count[0] += 1
+            if count[0] == batch:
+                raise Done
+
+        try:
+            client.call_on_each_event(callback, ["message"])
+        except Done:
+            pass
+        return count
+
+    dispatch.per_operation = batch  # type: ignore[attr-defined]
+    return dispatch, no_cleanup
+
+
+@benchmark("decode register response")
+def bench_decode_register() -> Tuple[Callable[[], object], Callable[[], None]]:
+    body = json.dumps(register_response()).encode()
+    client = stub_client(lambda method, endpoint: body)
+    return lambda: client.register(), no_cleanup
+
+
+@benchmark("decode get_messages response")
+def bench_decode_get_messages() -> Tuple[Callable[[], object], Callable[[], None]]:
+    body = json.dumps(get_messages_response()).encode()
+    client = stub_client(lambda method, endpoint: body)
+    request = {"anchor": "newest", "num_before": 5000, "num_after": 0}
+    return lambda: client.get_messages(request), no_cleanup
+
+
+@benchmark("Client() from a zuliprc")
+def bench_client_init() -> Tuple[Callable[[], object], Callable[[], None]]:
+    fd, path = tempfile.mkstemp(suffix=".zuliprc")
+    with os.fdopen(fd, "w") as f:
+        f.write("[api]\nemail=bench-bot@example.com\nkey=key\nsite=https://zulip.example.com\n")
+    return lambda: zulip.Client(config_file=path), lambda: os.unlink(path)
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    per_operation = number * getattr(func, "per_operation", 1)
+    times = [total / per_operation for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "operations": per_operation,
+    }
+
+
+def run(name_filter: Optional[str], repeat: int) -> Dict[str, Any]:
+    results = {}
+    for name, make in BENCHMARKS:
+        if name_filter is not None and name_filter not in name:
+            continue
+        func, cleanup = make()
+        try:
+            results[name] = measure(func, repeat)
+        finally:
+            cleanup()
+        print(
+            f"{name:42} {format_time(results[name]['min']):>10} "
+            f"(median {format_time(results[name]['median'])})"
+        )
+    return {
+        "zulip_version": zulip.__version__,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "json_codec": zulip.Client(
+            email="bench-bot@example.com", api_key="key", site="https://zulip.example.com"
+        ).json_codec.name,
+        "timestamp": time.time(),
+        "benchmarks": results,
+    }
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Prints how each benchmark changed; returns whether any regressed."""
+    print(
+        f"\ncompared to zulip {baseline['zulip_version']} "
+        f"on Python {baseline['python_version']}:"
+    )
+    regressed = False
+    for name, result in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        change = result["min"] / baseline["benchmarks"][name]["min"] - 1
+        flag = ""
+        if change > threshold:
+            regressed = True
+            flag = "  REGRESSION"
+        print(f"{name:42} {change:+8.1%}{flag}")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--output", help="file to save the results to, as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--filter")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.filter, args.repeat)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
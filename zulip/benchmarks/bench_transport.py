@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Compares RequestsTransport and HTTPXTransport (HTTP/2) on many
+concurrent requests, with a long-polling get_events running alongside,
+against a local TLS server: the number of connections each opens, and
+the request latency percentiles.
+
+    pip install zulip[http2] hypercorn
+    python benchmarks/bench_transport.py [--concurrency 64] [--requests 2000]
+
+Needs the openssl command to make a self-signed certificate.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+
+import zulip
+
+# The (host, port) of each client connection a Server has seen.
+_Connections = Set[Tuple[str, int]]
+# The ASGI callables for receiving and sending messages.
+_Receive = Callable[[], Awaitable[Dict[str, Any]]]
+_Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class Server:
+    """
+    A minimal Zulip-like ASGI server that answers each request after
+    `latency` seconds (get_events after `longpoll` seconds), and
+    records the client ports it sees, i.e. the connections opened;
+    GET /stats returns how many there were and starts counting again.
+    """
+
+    def __init__(self, latency: float, longpoll: float) -> None:
+        self.latency = latency
+        self.longpoll = longpoll
+        self.connections = set()  # type: _Connections
+
+    async def __call__(self, scope: Dict[str, Any], receive: _Receive, send: _Send) -> None:
+        if scope["type"] != "http":
+            return
+        if scope["path"] == "/stats":
+            body = json.dumps({"connections": len(self.connections)}).encode()
+            self.connections = set()
+        else:
+            self.connections.add(scope["client"])
+            latency = self.longpoll if scope["path"].endswith("/events") else self.latency
+            await asyncio.sleep(latency)
+            body = b'{"result": "success", "msg": "", "events": []}'
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def make_certificate(directory: str) -> Tuple[str, str]:
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"]
+        + ["-keyout", keyfile, "-out", certfile],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return certfile, keyfile
+
+
+def serve(port: int, certfile: str, keyfile: str, latency: float) -> None:
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.certfile = certfile
+    config.keyfile = keyfile
+    config.loglevel = "WARNING"
+    # Allow the benchmark's concurrent requests on one HTTP/2 connection.
+    config.h2_max_concurrent_streams = 1000
+    config.keep_alive_max_requests = 1000000
+    asyncio.run(serve(Server(latency, longpoll=1.0), config))  # type: ignore[arg-type]
+
+
+def wait_for_port(port: int) -> None:
+    for i in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    raise RuntimeError("the server didn't start")
+
+
+def run(client: zulip.Client, concurrency: int, total: int) -> Tuple[List[float], int, float]:
+    latencies = []  # type: List[float]
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [total]
+    done = threading.Event()
+
+    def longpoll() -> None:
+        while not done.is_set():
+            client.call_endpoint("events", method="GET", longpolling=True)
+
+    def worker() -> None:
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            result = client.call_endpoint("users/me", method="GET")
+            elapsed = time.perf_counter() - start
+            with lock:
+                if result["result"] == "success":
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    poller = threading.Thread(target=longpoll)
+    poller.start()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+    done.set()
+    poller.join()
+    return latencies, errors[0], duration
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--serve", nargs=3, metavar=("PORT", "CERTFILE", "KEYFILE"))
+    args = parser.parse_args()
+
+    if args.serve:
+        port, certfile, keyfile = args.serve
+        serve(int(port), certfile, keyfile, args.latency_ms / 1000)
+        return
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    certfile, keyfile = make_certificate(tempfile.mkdtemp())
+    # Run the server in its own process, so that it doesn't compete
+    # with the client threads for the GIL.  hypercorn logs connections
+    # closed without a TLS close_notify, which is just noise here.
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--latency-ms", str(args.latency_ms)]
+        + ["--serve", str(port), certfile, keyfile],
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+        site = f"https://127.0.0.1:{port}"
+        stats_transport = zulip.RequestsTransport()
+
+        def connections() -> int:
+            response = stats_transport.request("GET", site + "/stats", verify=certfile)
+            return response.json()["connections"]
+
+        transports = [
+            ("requests", lambda: zulip.RequestsTransport(pool_maxsize=args.concurrency + 1)),
+            ("httpx, HTTP/2", lambda: zulip.HTTPXTransport()),
+        ]  # type: List[Tuple[str, Callable[[], zulip.Transport]]]
+        print(
+            f"{args.requests} requests, {args.concurrency} concurrent, "
+            f"{args.latency_ms:.0f}ms server latency, plus a long-poll"
+        )
+        print(
+            f"{'transport':16} {'connections':>11} {'p50':>8} {'p99':>8} {'req/s':>8} {'errors':>6}"
+        )
+        for name, make_transport in transports:
+            transport = make_transport()
+            client = zulip.Client(
+                email="bench@zulip.com",
+                api_key="key",
+                site=site,
+                cert_bundle=certfile,
+                transport=transport,
+            )
+            connections()
+            latencies, errors, duration = run(client, args.concurrency, args.requests)
+            transport.close()
+            print(
+                f"{name:16} {connections():11} "
+                f"{statistics.median(latencies) * 1000:7.1f}ms "
+                f"{percentile(latencies, 0.99) * 1000:7.1f}ms "
+                f"{len(latencies) / duration:8.0f} {errors:6}"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
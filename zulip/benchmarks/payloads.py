@@ -0,0 +1,143 @@
+"""
+Synthetic, but realistically shaped, Zulip API payloads for the
+benchmarks in this directory.
+"""
+
+import random
+from typing import Any, Dict, List
+
+STREAM_NAMES = ["general", "devel", "design", "announce", "support", "backend", "frontend"]
+CLIENTS = ["website", "ZulipMobile", "ZulipPython", "ZulipElectron"]
+
+
+def make_user(user_id: int) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "email": f"user{user_id}@example.com",
+        "delivery_email": None,
+        "full_name": f"User Number {user_id}",
+        "date_joined": "2021-03-04T12:34:56.789012+00:00",
+        "is_active": True,
+        "is_owner": False,
+        "is_admin": user_id % 50 == 0,
+        "is_guest": False,
+        "is_bot": user_id % 20 == 0,
+        "role": 400,
+        "timezone": "Europe/Berlin",
+        "avatar_url": f"https://secure.gravatar.com/avatar/{user_id:032x}?d=identicon&version=1",
+        "avatar_version": 1,
+        "profile_data": {"1": {"value": "+1-555-0100", "rendered_value": None}},
+    }
+
+
+def make_message(message_id: int, rng: random.Random) -> Dict[str, Any]:
+    sender_id = rng.randint(1, 2000)
+    stream_id = rng.randint(0, len(STREAM_NAMES) - 1)
+    content = " ".join(rng.choice(["lorem", "ipsum", "dolor", "sit", "amet"]) for i in range(40))
+    return {
+        "id": message_id,
+        "sender_id": sender_id,
+        "content": f"<p>{content}</p>",
+        "recipient_id": 10 + stream_id,
+        "timestamp": 1620000000 + message_id,
+        "client": rng.choice(CLIENTS),
+        "subject": f"topic {rng.randint(1, 30)}",
+        "topic_links": [],
+        "is_me_message": False,
+        "reactions": [
+            {
+                "emoji_name": "thumbs_up",
+                "emoji_code": "1f44d",
+                "reaction_type": "unicode_emoji",
+                "user_id": rng.randint(1, 2000),
+            }
+            for i in range(rng.randint(0, 2))
+        ],
+        "submessages": [],
+        "flags": ["read"],
+        "sender_full_name": f"User Number {sender_id}",
+        "sender_email": f"user{sender_id}@example.com",
+        "sender_realm_str": "zulip",
+        "display_recipient": STREAM_NAMES[stream_id],
+        "type": "stream",
+        "stream_id": stream_id + 1,
+        "avatar_url": None,
+        "content_type": "text/html",
+    }
+
+
+def make_messages(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [make_message(message_id, rng) for message_id in range(1, count + 1)]
+
+
+def get_messages_response(count: int = 5000) -> Dict[str, Any]:
+    return {
+        "result": "success",
+        "msg": "",
+        "anchor": 10000000000000000,
+        "found_newest": True,
+        "found_oldest": False,
+        "found_anchor": False,
+        "history_limited": False,
+        "messages": make_messages(count),
+    }
+
+
+def register_response(users: int = 5000, streams: int = 500) -> Dict[str, Any]:
+    return {
+        "result": "success",
+        "msg": "",
+        "queue_id": "1620000000:1",
+        "last_event_id": -1,
+        "zulip_version": "4.0",
+        "zulip_feature_level": 65,
+        "max_message_id": 100000,
+        "realm_users": [make_user(user_id) for user_id in range(1, users + 1)],
+        "realm_non_active_users": [],
+        "cross_realm_bots": [],
+        "streams": [
+            {
+                "stream_id": stream_id,
+                "name": f"stream {stream_id}",
+                "description": "A stream for discussing things",
+                "rendered_description": "<p>A stream for discussing things</p>",
+                "invite_only": False,
+                "is_web_public": False,
+                "stream_post_policy": 1,
+                "history_public_to_subscribers": True,
+                "first_message_id": stream_id * 10,
+                "message_retention_days": None,
+                "date_created": 1600000000,
+                "is_announcement_only": False,
+            }
+            for stream_id in range(1, streams + 1)
+        ],
+        "subscriptions": [
+            {
+                "stream_id": stream_id,
+                "name": f"stream {stream_id}",
+                "color": "#76ce90",
+                "pin_to_top": False,
+                "is_muted": False,
+                "in_home_view": True,
+                "audible_notifications": None,
+                "desktop_notifications": None,
+                "email_notifications": None,
+                "push_notifications": None,
+                "wildcard_mentions_notify": None,
+                "subscribers": list(range(1, users + 1, 10)),
+            }
+            for stream_id in range(1, streams + 1, 5)
+        ],
+        "realm_emoji": {
+            str(emoji_id): {
+                "id": str(emoji_id),
+                "name": f"emoji_{emoji_id}",
+                "source_url": f"/user_avatars/2/emoji/images/{emoji_id}.png",
+                "deactivated": False,
+                "author_id": 5,
+            }
+            for emoji_id in range(1, 200)
+        },
+    }
@@ -6,6 +6,8 @@ import irc.strings
 from irc.client import Event, ServerConnection, ip_numstr_to_quad
 from irc.client_aio import AioReactor
 
+import zulip
+
 
 class IRCBot(irc.bot.SingleServerIRCBot):
     reactor_class = AioReactor
@@ -65,20 +67,21 @@ class IRCBot(irc.bot.SingleServerIRCBot):
             c.privmsg("NickServ", msg)
         c.join(self.channel)
 
+        # Private messages are forwarded too, so the server can't
+        # narrow the messages it sends to the bridged topic.  Echoes
+        # of our own messages are not forwarded.
+        message_filter = zulip.MessageFilter(
+            streams=[self.stream],
+            topics=[self.topic],
+            exclude_senders=[self.zulip_client.email],
+            include_private=True,
+        )
+
         def forward_to_irc(msg: Dict[str, Any]) -> None:
-            not_from_zulip_bot = msg["sender_email"] != self.zulip_client.email
-            if not not_from_zulip_bot:
-                # Do not forward echo
-                return
             is_a_stream = msg["type"] == "stream"
             if is_a_stream:
-                in_the_specified_stream = msg["display_recipient"] == self.stream
-                at_the_specified_subject = msg["subject"].casefold() == self.topic.casefold()
-                if in_the_specified_stream and at_the_specified_subject:
-                    msg["content"] = ("@**{}**: ".format(msg["sender_full_name"])) + msg["content"]
-                    send = lambda x: self.c.privmsg(self.channel, x)
-                else:
-                    return
+                msg["content"] = ("@**{}**: ".format(msg["sender_full_name"])) + msg["content"]
+                send = lambda x: self.c.privmsg(self.channel, x)
             else:
                 recipients = [
                     u["short_name"]
@@ -92,7 +95,11 @@ class IRCBot(irc.bot.SingleServerIRCBot):
             for line in msg["content"].split("\n"):
                 send(line)
 
-        z2i = mp.Process(target=self.zulip_client.call_on_each_message, args=(forward_to_irc,))
+        z2i = mp.Process(
+            target=self.zulip_client.call_on_each_message,
+            args=(forward_to_irc,),
+            kwargs=dict(message_filter=message_filter),
+        )
         z2i.start()
 
     def on_privmsg(self, c: ServerConnection, e: Event) -> None:
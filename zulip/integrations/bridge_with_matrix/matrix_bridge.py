@@ -144,30 +144,31 @@ def zulip_to_matrix(config: Dict[str, Any], room: Any) -> Callable[[Dict[str, An
     def _zulip_to_matrix(msg: Dict[str, Any]) -> None:
         """
         Zulip -> Matrix
+
+        Only called for the messages zulip_message_filter selects.
         """
-        message_valid = check_zulip_message_validity(msg, config)
-        if message_valid:
-            matrix_username = msg["sender_full_name"].replace(" ", "")
-            matrix_text = MATRIX_MESSAGE_TEMPLATE.format(
-                username=matrix_username, message=msg["content"]
-            )
-            # Forward Zulip message to Matrix
-            room.send_text(matrix_text)
+        matrix_username = msg["sender_full_name"].replace(" ", "")
+        matrix_text = MATRIX_MESSAGE_TEMPLATE.format(
+            username=matrix_username, message=msg["content"]
+        )
+        # Forward Zulip message to Matrix
+        room.send_text(matrix_text)
 
     return _zulip_to_matrix
 
 
-def check_zulip_message_validity(msg: Dict[str, Any], config: Dict[str, Any]) -> bool:
-    is_a_stream = msg["type"] == "stream"
-    in_the_specified_stream = msg["display_recipient"] == config["stream"]
-    at_the_specified_subject = msg["subject"] == config["topic"]
-
-    # We do this to identify the messages generated from Matrix -> Zulip
+def zulip_message_filter(config: Dict[str, Any]) -> zulip.MessageFilter:
+    # We exclude the bot to identify the messages generated from Matrix -> Zulip
     # and we make sure we don't forward it again to the Matrix.
-    not_from_zulip_bot = msg["sender_email"] != config["email"]
-    if is_a_stream and not_from_zulip_bot and in_the_specified_stream and at_the_specified_subject:
-        return True
-    return False
+    return zulip.MessageFilter(
+        streams=[config["stream"]],
+        topics=[config["topic"]],
+        exclude_senders=[config["email"]],
+    )
+
+
+def check_zulip_message_validity(msg: Dict[str, Any], config: Dict[str, Any]) -> bool:
+    return zulip_message_filter(config)(msg)
 
 
 def generate_parser() -> argparse.ArgumentParser:
@@ -342,7 +343,11 @@ def main() -> None:
             matrix_client.start_listener_thread()
 
             print("Starting message handler on Zulip client")
-            zulip_client.call_on_each_message(zulip_to_matrix(zulip_config, room))
+            # Only the bridged topic is sent by the server.
+            zulip_client.call_on_each_message(
+                zulip_to_matrix(zulip_config, room),
+                message_filter=zulip_message_filter(zulip_config),
+            )
 
         except Bridge_FatalMatrixException as exception:
             sys.exit(f"Matrix bridge error: {exception}")
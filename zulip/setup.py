@@ -58,6 +58,7 @@ package_info = dict(
     entry_points={
         "console_scripts": [
             "zulip-send=zulip.send:main",
+            "zulip-export=zulip.export:main",
             "zulip-api-examples=zulip.api_examples:main",
             "zulip-matrix-bridge=integrations.bridge_with_matrix.matrix_bridge:main",
             "zulip-api=zulip.cli:cli",
@@ -73,6 +74,10 @@ setuptools_info = dict(
         "distro",
         "click",
     ],
+    extras_require={
+        "async": ["aiohttp"],
+        "http2": ["httpx[http2]"],
+    },
 )
 
 try:
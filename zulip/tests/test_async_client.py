@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import asyncio
+import io
+import ssl
+import time
+import unittest
+from typing import Any, Dict, List
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.json_codec import JSONCodec
+from zulip.testing import FakeZulipServer
+
+
+class TestAsyncClient(TestCase):
+    def setUp(self) -> None:
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            self.skipTest("aiohttp is not installed")
+
+        self.server = FakeZulipServer(heartbeat_interval=0.5).start()
+        self.addCleanup(self.server.stop)
+        self.client = self.server.make_client(
+            "iago@zulip.com", retry_policy=zulip.RetryPolicy(initial_delay=0.01, max_delay=0.01)
+        )
+        self.sender = self.server.make_client("hamlet@zulip.com")
+
+    def run_async(self, coroutine: Any) -> Any:
+        async def run() -> Any:
+            async with zulip.AsyncClient.from_client(self.client) as client:
+                return await coroutine(client)
+
+        return asyncio.run(run())
+
+    def test_requests(self) -> None:
+        async def send(client: zulip.AsyncClient) -> Dict[str, Any]:
+            await client.send_message(
+                {"type": "stream", "to": "general", "topic": "async", "content": "hello"}
+            )
+            return await client.get_messages({"anchor": "newest", "num_before": 1})
+
+        result = self.run_async(send)
+        self.assertEqual(result["result"], "success")
+        self.assertEqual(result["messages"][0]["content"], "hello")
+
+    def test_retries(self) -> None:
+        encoded = []  # type: List[Any]
+
+        class RecordingCodec(JSONCodec):
+            def dumps(self, obj: Any) -> str:
+                encoded.append(obj)
+                return super().dumps(obj)
+
+        self.client.json_codec = RecordingCodec()
+        self.server.inject_errors(2, status=503, endpoint="users/me")
+        self.server.inject_errors(1, status=429, endpoint="users/me")
+        result = self.run_async(lambda client: client.get_profile())
+        self.assertEqual(result["email"], "iago@zulip.com")
+        self.assertEqual(self.server.request_counts[("GET", "users/me")], 4)
+        # Retried requests are sent with dont_block, in the client's encoding.
+        self.assertEqual(encoded, [True] * 3)
+
+        self.server.inject_errors(1, status=400, endpoint="users/me")
+        result = self.run_async(lambda client: client.get_profile())
+        self.assertEqual(result["result"], "error")
+
+        self.client.retry_policy = zulip.RetryPolicy(max_retries=1, initial_delay=0.01)
+        self.server.inject_errors(2, status=503, endpoint="users/me")
+        result = self.run_async(lambda client: client.get_profile())
+        self.assertEqual(result["result"], "error")
+        self.assertEqual(self.server.request_counts[("GET", "users/me")], 7)
+
+    def test_upload_retries(self) -> None:
+        file = io.BytesIO(b"skipped report")
+        file.name = "report.txt"
+        file.seek(8)
+        self.server.inject_errors(1, status=503, endpoint="user_uploads")
+        result = self.run_async(lambda client: client.upload_file(file))
+        # The retry sends the file from where it started again.
+        self.assertEqual(self.server.uploads[result["uri"]], b"report")
+
+    def test_ssl_context(self) -> None:
+        def make_client(**kwargs: Any) -> zulip.AsyncClient:
+            return zulip.AsyncClient(
+                email="iago@zulip.com", api_key="key", site=self.server.url, **kwargs
+            )
+
+        context = make_client(insecure=True).ssl_context
+        self.assertEqual(context.verify_mode, ssl.CERT_NONE)
+        self.assertFalse(context.check_hostname)
+        # It uses the same CA bundle as requests.
+        self.assertGreater(len(context.get_ca_certs()), 0)
+
+        context = make_client().ssl_context
+        self.assertEqual(context.verify_mode, ssl.CERT_REQUIRED)
+
+    def test_iter_events(self) -> None:
+        def send(content: str) -> None:
+            while not self.server.queues:
+                time.sleep(0.01)
+            self.sender.send_message(
+                {"type": "private", "to": ["iago@zulip.com"], "content": content}
+            )
+
+        async def run(client: zulip.AsyncClient) -> List[str]:
+            loop = asyncio.get_event_loop()
+            sending = [loop.run_in_executor(None, send, "first")]
+            received = []  # type: List[str]
+            async for event in client.iter_events(["message"]):
+                received.append(event["message"]["content"])
+                if len(received) == 2:
+                    break
+                # The server garbage-collects the queue, so the next
+                # get_events fails with BAD_EVENT_QUEUE_ID, and a new
+                # queue is registered.
+                with self.server.condition:
+                    self.server.queues.clear()
+                sending.append(loop.run_in_executor(None, send, "second"))
+            await asyncio.gather(*sending)
+            return received
+
+        self.assertEqual(self.run_async(run), ["first", "second"])
+        self.assertEqual(self.server.request_counts[("POST", "register")], 2)
+
+    def test_iter_events_legacy_server(self) -> None:
+        async def run(client: zulip.AsyncClient) -> Dict[str, Any]:
+            get_events = client.get_events
+            calls = 0
+
+            async def legacy_get_events(**request: Any) -> Dict[str, Any]:
+                nonlocal calls
+                calls += 1
+                if calls == 1:
+                    # Legacy servers don't send the BAD_EVENT_QUEUE_ID code.
+                    return {"result": "error", "msg": "Bad event queue id: " + request["queue_id"]}
+                return await get_events(**request)
+
+            client.retry_policy = zulip.RetryPolicy(initial_delay=0.01, max_delay=0.01)
+            with patch.object(client, "get_events", legacy_get_events):
+                async for event in client.iter_events(["heartbeat"]):
+                    return event
+            raise AssertionError("iter_events stopped")
+
+        self.assertEqual(self.run_async(run)["type"], "heartbeat")
+        self.assertEqual(self.server.request_counts[("POST", "register")], 2)
+
+    def test_call_on_each_message(self) -> None:
+        class Done(Exception):
+            pass
+
+        received = []  # type: List[Dict[str, Any]]
+
+        async def callback(message: Dict[str, Any]) -> None:
+            received.append(message)
+            raise Done
+
+        def send() -> None:
+            while not self.server.queues:
+                time.sleep(0.01)
+            for stream in ["devel", "general"]:
+                self.sender.send_message(
+                    {"type": "stream", "to": stream, "topic": "bots", "content": stream}
+                )
+
+        self.server.add_stream("devel")
+
+        async def run(client: zulip.AsyncClient) -> None:
+            sending = asyncio.get_event_loop().run_in_executor(None, send)
+            try:
+                await client.call_on_each_message(
+                    callback,
+                    message_filter=zulip.MessageFilter(streams=["general"]),
+                    compact=True,
+                )
+            finally:
+                await sending
+
+        with self.assertRaises(Done):
+            self.run_async(run)
+        self.assertEqual([message["content"] for message in received], ["general"])
+        self.assertIsInstance(received[0], zulip.Message)
+
+
+if __name__ == "__main__":
+    unittest.main()
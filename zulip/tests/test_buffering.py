@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+import time
+import unittest
+from typing import Any, Dict, List
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import zulip
+from zulip.buffering import MessageBuffer
+
+
+def mock_client(sent: List[Dict[str, Any]]) -> MagicMock:
+    client = MagicMock()
+
+    def send_message(message: Dict[str, Any]) -> Dict[str, Any]:
+        sent.append(message)
+        return {"result": "success", "msg": "", "id": len(sent)}
+
+    client.send_message.side_effect = send_message
+    return client
+
+
+class TestMessageBuffer(TestCase):
+    def test_coalesces_writes(self) -> None:
+        sent = []  # type: List[Dict[str, Any]]
+        buffer = MessageBuffer(mock_client(sent), max_lines=3, flush_interval=60)
+        for i in range(7):
+            buffer.write("stream", "logs", "a", f"line {i}\n")
+        buffer.write("stream", "logs", "b", "other topic")
+        buffer.write("private", ["iago@zulip.com"], "", "hi")
+        buffer.flush()
+        self.assertEqual(
+            [(message["topic"], message["content"]) for message in sent],
+            [
+                ("a", "line 0\nline 1\nline 2"),
+                ("a", "line 3\nline 4\nline 5"),
+                ("a", "line 6"),
+                ("b", "other topic"),
+                ("", "hi"),
+            ],
+        )
+        self.assertEqual(sent[-1]["to"], ["iago@zulip.com"])
+
+        # Writes are also split to stay under max_chars.
+        sent.clear()
+        buffer.max_chars = 10
+        buffer.write("stream", "logs", "a", "123456")
+        buffer.write("stream", "logs", "a", "7890ab")
+        buffer.close()
+        self.assertEqual([message["content"] for message in sent], ["123456", "7890ab"])
+
+    def test_flush_interval(self) -> None:
+        sent = []  # type: List[Dict[str, Any]]
+        buffer = MessageBuffer(mock_client(sent), flush_interval=0.05)
+        buffer.write("stream", "logs", "a", "one ")
+        buffer.write("stream", "logs", "a", "two")
+        deadline = time.monotonic() + 5
+        while not sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([message["content"] for message in sent], ["one two"])
+        buffer.close()
+
+    def test_overflow(self) -> None:
+        release = threading.Event()
+        client = MagicMock()
+        client.send_message.side_effect = lambda message: release.wait() and {"result": "success"}
+        buffer = MessageBuffer(client, max_pending=2, max_lines=1, overflow="drop")
+        self.assertTrue(buffer.write("stream", "logs", "a", "1\n"))
+        self.assertTrue(buffer.write("stream", "logs", "a", "2\n"))
+        self.assertFalse(buffer.write("stream", "logs", "a", "3\n"))
+        self.assertEqual(buffer.dropped, 1)
+        release.set()
+        buffer.close()
+        self.assertEqual(client.send_message.call_count, 2)
+        self.assertEqual(buffer.errors, 0)
+
+
+class TestBufferedOutput(TestCase):
+    def test_zulip_stream(self) -> None:
+        sent = []  # type: List[Dict[str, Any]]
+        with patch("zulip.Client", return_value=mock_client(sent)):
+            stream = zulip.ZulipStream(type="stream", to="support", subject="report", buffered=True)
+        print("progress:", 1, file=stream)
+        print("progress:", 2, file=stream)
+        stream.flush()
+        self.assertEqual(
+            sent,
+            [
+                {
+                    "type": "stream",
+                    "to": "support",
+                    "topic": "report",
+                    "content": "progress: 1\nprogress: 2",
+                }
+            ],
+        )
+        stream.close()
+
+    def test_handler(self) -> None:
+        sent = []  # type: List[Dict[str, Any]]
+        handler = zulip.ZulipHandler(
+            mock_client(sent), to="alerts", topic=lambda record: record.name
+        )
+        handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        logger = logging.getLogger("test_buffering")
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        logger.warning("disk %d%% full", 91)
+        logger.error("disk full")
+        handler.close()
+        self.assertEqual(
+            [(message["topic"], message["content"]) for message in sent],
+            [("test_buffering", "WARNING disk 91% full\nERROR disk full")],
+        )
+
+    def test_handler_ignores_own_records(self) -> None:
+        logger = logging.getLogger("test_buffering.sending")
+        logger.propagate = False
+        sent = []  # type: List[Dict[str, Any]]
+
+        def send_message(message: Dict[str, Any]) -> Dict[str, Any]:
+            # Like the connection pool's debug logging while sending.
+            logger.warning("sending a message")
+            sent.append(message)
+            return {"result": "success", "msg": ""}
+
+        client = MagicMock()
+        client.send_message.side_effect = send_message
+        handler = zulip.ZulipHandler(
+            client, to="alerts", max_pending=1, overflow="block", flush_interval=0
+        )
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        def log() -> None:
+            logger.warning("disk full")
+            logger.warning("disk still full")
+            handler.flush()
+
+        # Fails, rather than hangs, if the handler deadlocks.
+        thread = threading.Thread(target=log, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        handler.close()
+        self.assertEqual([message["content"] for message in sent], ["disk full", "disk still full"])
+
+
+if __name__ == "__main__":
+    unittest.main()
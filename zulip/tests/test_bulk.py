@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import unittest
+from typing import Any, Dict, Optional
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.bulk import chunked
+
+SUCCESS = {"result": "success", "msg": ""}
+
+
+class TestBulkOperations(TestCase):
+    def setUp(self) -> None:
+        self.client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+
+    def test_chunked(self) -> None:
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked([], 2)), [])
+        with self.assertRaises(ValueError):
+            list(chunked([1], 0))
+
+    def test_update_message_flags(self) -> None:
+        with patch.object(self.client, "call_endpoint", return_value=SUCCESS) as mock:
+            result = self.client.bulk_update_message_flags(
+                range(2500), "add", "read", batch_size=1000
+            )
+        self.assertTrue(result.ok)
+        self.assertEqual([len(batch) for batch in result.items], [1000, 1000, 500])
+        requests = sorted(
+            (call[1]["request"] for call in mock.call_args_list),
+            key=lambda request: request["messages"][0],
+        )
+        self.assertEqual(
+            requests[2], {"messages": list(range(2000, 2500)), "op": "add", "flag": "read"}
+        )
+
+    def test_per_item_operations(self) -> None:
+        def call_endpoint(
+            url: str, method: str = "POST", request: Optional[Dict[str, Any]] = None
+        ) -> Dict[str, Any]:
+            if url == "users/9":
+                return {"result": "error", "msg": "No such user", "code": "BAD_REQUEST"}
+            return SUCCESS
+
+        with patch.object(self.client, "call_endpoint", side_effect=call_endpoint) as mock:
+            result = self.client.bulk_deactivate_users([8, 9, 10], concurrency=2)
+            self.assertEqual(result.succeeded, [8, 10])
+            self.assertEqual(result.failed, [(9, call_endpoint("users/9"))])
+            self.assertFalse(result.ok)
+            self.assertEqual(repr(result), "<BulkResult: 2 succeeded, 1 failed>")
+
+            mock.reset_mock()
+            update_result = self.client.bulk_update_users([(8, {"full_name": "Iago"})])
+            self.assertTrue(update_result.ok)
+            mock.assert_called_once_with(
+                url="users/8", method="PATCH", request={"full_name": '"Iago"'}
+            )
+
+            mock.reset_mock()
+            reactions = [{"message_id": i, "emoji_name": "tada"} for i in range(3)]
+            self.assertEqual(len(self.client.bulk_add_reactions(reactions)), 3)
+            self.assertEqual(mock.call_count, 3)
+
+    def test_subscriptions(self) -> None:
+        with patch.object(self.client, "call_endpoint", return_value=SUCCESS) as mock:
+            result = self.client.bulk_add_subscriptions(
+                ({"name": stream} for stream in ["onboarding", "general"]),
+                range(250),
+                batch_size=100,
+                announce=False,
+            )
+            self.assertEqual([len(batch) for batch in result.items], [100, 100, 50])
+            for call in mock.call_args_list:
+                request = call[1]["request"]
+                self.assertEqual(
+                    request["subscriptions"], [{"name": "onboarding"}, {"name": "general"}]
+                )
+                self.assertEqual(request["announce"], False)
+
+            mock.reset_mock()
+            result = self.client.bulk_remove_subscriptions(["onboarding"], ["a@zulip.com"])
+            self.assertEqual(result.results, [SUCCESS])
+            mock.assert_called_once_with(
+                url="users/me/subscriptions",
+                method="DELETE",
+                request={"subscriptions": ["onboarding"], "principals": ["a@zulip.com"]},
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+import unittest
+from typing import Any, Dict
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.testing import FakeZulipServer, ScriptedTransport, make_response
+
+
+class TestResponseCache(TestCase):
+    def test_ttl_and_eviction(self) -> None:
+        cache = zulip.ResponseCache(ttls={"streams": 10, "users/{id}": 10}, max_entries=2)
+        results = iter({"result": "success", "n": n} for n in range(100))
+
+        def get(url: str, **request: Any) -> Dict[str, Any]:
+            return cache.get(url, request, lambda: next(results))
+
+        with patch("time.monotonic", return_value=100) as clock:
+            self.assertEqual(get("streams")["n"], 0)
+            self.assertEqual(get("streams")["n"], 0)
+            self.assertEqual(get("streams", include_public=False)["n"], 1)
+            # Not cached.
+            self.assertEqual(get("messages")["n"], 2)
+            self.assertEqual(get("messages")["n"], 3)
+            # Evicts the least recently used entry.
+            self.assertEqual(get("users/8")["n"], 4)
+            self.assertEqual(get("streams", include_public=False)["n"], 1)
+            self.assertEqual(get("streams")["n"], 5)
+
+            clock.return_value = 111
+            self.assertEqual(get("streams")["n"], 6)
+            get("streams")["streams"] = "modified"
+            self.assertNotIn("streams", get("streams"))
+
+            cache.handle_event({"type": "stream", "op": "create", "streams": []})
+            self.assertEqual(get("streams")["n"], 7)
+        self.assertEqual((cache.hits, cache.misses), (4, 6))
+
+    def test_coalescing(self) -> None:
+        cache = zulip.ResponseCache()
+        started = threading.Event()
+        release = threading.Event()
+        fetches = []
+
+        def fetch() -> Dict[str, Any]:
+            fetches.append(1)
+            started.set()
+            release.wait()
+            return {"result": "success", "msg": ""}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get("users", {}, fetch)))
+            for i in range(5)
+        ]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        while cache.coalesced < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(fetches), 1)
+        self.assertEqual(results, [{"result": "success", "msg": ""}] * 5)
+
+    def test_client(self) -> None:
+        transport = ScriptedTransport(
+            respond=lambda method, endpoint: make_response(
+                200, {"result": "success", "msg": "", "stream_id": 15}
+            )
+        )
+        client = zulip.Client(
+            email="iago@zulip.com",
+            api_key="key",
+            site="zulip.example.com",
+            transport=transport,
+            cache=zulip.ResponseCache(),
+        )
+        for i in range(3):
+            self.assertEqual(client.get_stream_id("devel")["stream_id"], 15)
+            client.send_message({"type": "stream", "to": "devel", "content": "hi"})
+        self.assertEqual(
+            transport.request_counts, {("GET", "get_stream_id"): 1, ("POST", "messages"): 3}
+        )
+
+    def test_shared_between_clients(self) -> None:
+        realms = [FakeZulipServer(streams=names).start() for names in (["devel"], ["a", "devel"])]
+        for server in realms:
+            self.addCleanup(server.stop)
+        cache = zulip.ResponseCache()
+        clients = [
+            realms[0].make_client("iago@zulip.com", cache=cache),
+            realms[1].make_client("iago@zulip.com", cache=cache),
+            realms[1].make_client("hamlet@zulip.com", cache=cache),
+        ]
+        self.assertEqual(
+            [client.get_stream_id("devel")["stream_id"] for client in clients], [1, 2, 2]
+        )
+        self.assertEqual(cache.misses, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
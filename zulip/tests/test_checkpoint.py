@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from typing import Any, Dict
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+
+
+class TestCheckpointStores(TestCase):
+    def test_stores(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            stores = [
+                zulip.FileCheckpointStore(os.path.join(directory, "checkpoint.json")),
+                zulip.SQLiteCheckpointStore(os.path.join(directory, "checkpoints.db")),
+            ]
+            for store in stores:
+                with self.subTest(store=type(store).__name__):
+                    self.assertIsNone(store.load())
+                    store.save("1517975029:0", 5)
+                    store.save("1517975029:0", 7)
+                    self.assertEqual(store.load(), ("1517975029:0", 7))
+                    store.clear()
+                    self.assertIsNone(store.load())
+
+            sqlite_path = os.path.join(directory, "checkpoints.db")
+            zulip.SQLiteCheckpointStore(sqlite_path, name="other").save("other-queue", 3)
+            self.assertIsNone(zulip.SQLiteCheckpointStore(sqlite_path).load())
+
+
+class TestResumingEventQueue(TestCase):
+    @patch("time.sleep")
+    def test_resume(self, mock_sleep: Any) -> None:
+        client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+        handled = []
+
+        def get_events(queue_id: str, last_event_id: int) -> Dict[str, Any]:
+            if queue_id == "old-queue":
+                # The first time, the saved queue is still there.
+                if last_event_id == 10:
+                    return {"result": "success", "events": [{"type": "heartbeat", "id": 11}]}
+                return {
+                    "result": "error",
+                    "code": "BAD_EVENT_QUEUE_ID",
+                    "msg": "Bad event queue id",
+                }
+            if last_event_id == -1:
+                return {"result": "success", "events": [{"type": "heartbeat", "id": 0}]}
+            raise KeyboardInterrupt
+
+        register_result = {"result": "success", "queue_id": "new-queue", "last_event_id": -1}
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = zulip.FileCheckpointStore(os.path.join(directory, "checkpoint.json"))
+            checkpoint.save("old-queue", 10)
+            with patch.object(client, "register", return_value=register_result) as mock_register:
+                with patch.object(client, "get_events", side_effect=get_events):
+                    with self.assertRaises(KeyboardInterrupt):
+                        client.call_on_each_event(
+                            lambda event: handled.append(event["id"]), checkpoint=checkpoint
+                        )
+
+            self.assertEqual(handled, [11, 0])
+            mock_register.assert_called_once()
+            self.assertEqual(checkpoint.load(), ("new-queue", 0))
+
+            with self.assertRaises(ValueError):
+                client.call_on_each_message(lambda message: None, workers=4, checkpoint=checkpoint)
+            self.assertEqual(checkpoint.load(), ("new-queue", 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+import unittest
+from typing import Any, Dict, List, Set, Tuple
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.dispatch import KeyedDispatcher, conversation_key
+
+# (topic, event ID) pairs, in the order the events were handled.
+_Handled = List[Tuple[str, int]]
+_Topics = Set[str]
+
+
+def message_event(event_id: int, topic: str) -> Dict[str, Any]:
+    return {
+        "type": "message",
+        "id": event_id,
+        "message": {
+            "type": "stream",
+            "stream_id": 1,
+            "display_recipient": "devel",
+            "subject": topic,
+            "sender_id": event_id % 3,
+        },
+    }
+
+
+class TestKeyedDispatcher(TestCase):
+    def test_orders_events_by_key(self) -> None:
+        handled = []  # type: _Handled
+        running = set()  # type: _Topics
+        overlapped = threading.Event()
+        lock = threading.Lock()
+
+        def callback(event: Dict[str, Any]) -> None:
+            topic = event["message"]["subject"]
+            with lock:
+                self.assertNotIn(topic, running)
+                running.add(topic)
+                if len(running) > 1:
+                    overlapped.set()
+            time.sleep(0.001)
+            with lock:
+                running.remove(topic)
+                handled.append((topic, event["id"]))
+
+        dispatcher = KeyedDispatcher(callback, workers=4, max_in_flight=8)
+        events = [message_event(i, f"topic {i % 5}") for i in range(100)]
+        for event in events:
+            dispatcher.submit(event)
+        dispatcher.close()
+
+        self.assertTrue(overlapped.is_set())
+        self.assertEqual(len(handled), len(events))
+        for topic in {topic for topic, event_id in handled}:
+            ids = [event_id for t, event_id in handled if t == topic]
+            self.assertEqual(ids, sorted(ids))
+
+    def test_conversation_key(self) -> None:
+        self.assertEqual(
+            conversation_key(message_event(1, "Straße")),
+            conversation_key(message_event(2, "STRASSE")),
+        )
+        self.assertNotEqual(
+            conversation_key(message_event(1, "Straße")),
+            conversation_key(message_event(2, "Strand")),
+        )
+
+    def test_backpressure_and_errors(self) -> None:
+        release = threading.Event()
+        submitted = []
+
+        def callback(event: Dict[str, Any]) -> None:
+            release.wait()
+            raise RuntimeError("callback failed")
+
+        dispatcher = KeyedDispatcher(callback, workers=1, max_in_flight=2)
+
+        def submit_events() -> None:
+            for i in range(3):
+                dispatcher.submit(message_event(i, "topic"))
+                submitted.append(i)
+
+        thread = threading.Thread(target=submit_events)
+        thread.start()
+        time.sleep(0.1)
+        self.assertEqual(submitted, [0, 1])
+        release.set()
+        thread.join()
+        with self.assertRaisesRegex(RuntimeError, "callback failed"):
+            dispatcher.close()
+
+
+class TestCallOnEachEvent(TestCase):
+    def test_workers(self) -> None:
+        client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+        handled = []  # type: List[int]
+
+        def get_events(queue_id: str, last_event_id: int) -> Dict[str, Any]:
+            if last_event_id == -1:
+                return {
+                    "result": "success",
+                    "events": [message_event(i, "topic") for i in range(5)],
+                }
+            # The first batch was handed over without waiting for it.
+            self.assertLess(len(handled), 5)
+            raise KeyboardInterrupt
+
+        def callback(message: Dict[str, Any]) -> None:
+            time.sleep(0.05)
+            handled.append(message["sender_id"])
+
+        register_result = {"result": "success", "queue_id": "1", "last_event_id": -1}
+        with patch.object(client, "register", return_value=register_result), patch.object(
+            client, "get_events", side_effect=get_events
+        ) as mock_get_events:
+            with self.assertRaises(KeyboardInterrupt):
+                client.call_on_each_message(callback, workers=2, ordering_key=zulip.sender_key)
+        self.assertEqual(mock_get_events.call_args[1]["last_event_id"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from typing import Any, Dict, List
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.export import Export
+from zulip.testing import FakeZulipServer
+
+
+class TestExport(TestCase):
+    def setUp(self) -> None:
+        self.server = FakeZulipServer().start()
+        self.addCleanup(self.server.stop)
+        self.client = self.server.make_client("iago@zulip.com")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "general.jsonl.gz")
+
+    def send(self, count: int, stream: str = "general") -> None:
+        for i in range(count):
+            self.client.send_message(
+                {"type": "stream", "to": stream, "topic": "export", "content": f"message {i}"}
+            )
+
+    def exported_ids(self) -> List[int]:
+        with gzip.open(self.path, "rt") as f:
+            return [json.loads(line)["id"] for line in f]
+
+    def stream_ids(self, stream: str = "general") -> List[int]:
+        return [
+            message["id"]
+            for message in self.server.messages
+            if message.get("display_recipient") == stream
+        ]
+
+    def test_export(self) -> None:
+        self.send(23)
+        self.send(5, stream="devel")
+        narrow = [["stream", "general"]]
+        export = Export(self.client, self.path, narrow, page_size=5)
+        self.assertEqual(export.run(), 23)
+        self.assertEqual(self.exported_ids(), self.stream_ids())
+
+        # Running it again only adds the new messages.
+        self.send(3)
+        self.assertEqual(Export(self.client, self.path, narrow, page_size=5).run(), 3)
+        self.assertEqual(self.exported_ids(), self.stream_ids())
+
+        with self.assertRaises(zulip.ZulipError):
+            Export(self.client, self.path, [["stream", "devel"]]).run()
+
+    def test_resume(self) -> None:
+        self.send(20)
+        get_messages = self.client.get_messages
+        calls = 0
+
+        def failing_get_messages(request: Dict[str, Any]) -> Dict[str, Any]:
+            nonlocal calls
+            calls += 1
+            if calls == 3:
+                return {"result": "error", "msg": "Internal server error"}
+            return get_messages(request)
+
+        with patch.object(self.client, "get_messages", side_effect=failing_get_messages):
+            with self.assertRaises(zulip.ZulipError):
+                Export(self.client, self.path, page_size=4).run()
+        exported = len(self.exported_ids())
+        self.assertGreater(exported, 0)
+        # A page written, but not saved in the state, before stopping.
+        with open(self.path, "ab") as f:
+            f.write(gzip.compress(b'{"id": 1}\n')[:10])
+
+        self.assertEqual(Export(self.client, self.path, page_size=4).run(), 20 - exported)
+        self.assertEqual(self.exported_ids(), self.stream_ids())
+
+    def test_missing_file(self) -> None:
+        self.send(3)
+        Export(self.client, self.path).run()
+        os.remove(self.path)
+        with self.assertRaises(zulip.ZulipError):
+            Export(self.client, self.path).run()
+
+        # Exporting everything again, once the state is removed too.
+        os.remove(self.path + ".state")
+        self.assertEqual(Export(self.client, self.path).run(), 3)
+
+    def test_jobs(self) -> None:
+        self.send(40)
+        export = Export(self.client, self.path, jobs=3, page_size=4)
+        self.assertEqual(export.run(), 40)
+        self.assertEqual(self.exported_ids(), self.stream_ids())
+        self.assertEqual(
+            sorted(os.listdir(os.path.dirname(self.path))),
+            ["general.jsonl.gz", "general.jsonl.gz.state"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import io
+import threading
+import time
+import unittest
+from typing import Any, Dict, List
+from unittest import TestCase
+
+import requests
+
+from zulip.testing import FakeZulipServer
+
+_Messages = List[Dict[str, Any]]
+
+
+class TestFakeZulipServer(TestCase):
+    def setUp(self) -> None:
+        self.server = FakeZulipServer(heartbeat_interval=0.5).start()
+        self.addCleanup(self.server.stop)
+        self.client = self.server.make_client("iago@zulip.com")
+
+    def test_messages_and_events(self) -> None:
+        received = []  # type: _Messages
+
+        def receive() -> None:
+            queue = self.client.register(["message"], narrow=[["stream", "general"]])
+            last_event_id = queue["last_event_id"]
+            while not received:
+                result = self.client.get_events(
+                    queue_id=queue["queue_id"], last_event_id=last_event_id
+                )
+                for event in result["events"]:
+                    last_event_id = max(last_event_id, event["id"])
+                    if event["type"] == "message":
+                        received.append(event["message"])
+
+        thread = threading.Thread(target=receive)
+        thread.start()
+        while not self.server.queues:
+            time.sleep(0.01)
+        other = self.server.make_client("hamlet@zulip.com")
+        other.send_message({"type": "private", "to": ["iago@zulip.com"], "content": "psst"})
+        result = other.send_message(
+            {"type": "stream", "to": "general", "topic": "test", "content": "hi"}
+        )
+        self.assertEqual(result["result"], "success")
+        thread.join(5)
+        self.assertEqual([message["content"] for message in received], ["hi"])
+        self.assertEqual(received[0]["sender_email"], "hamlet@zulip.com")
+
+        result = self.client.get_messages({"anchor": "newest", "num_before": 10, "num_after": 0})
+        self.assertEqual([message["content"] for message in result["messages"]], ["psst", "hi"])
+        result = self.client.get_messages(
+            {"anchor": "newest", "num_before": 10, "num_after": 0, "narrow": [["is", "private"]]}
+        )
+        self.assertEqual([message["content"] for message in result["messages"]], ["psst"])
+
+        result = self.client.send_message({"type": "stream", "to": "nope", "content": "hi"})
+        self.assertEqual(result["code"], "STREAM_DOES_NOT_EXIST")
+
+    def test_heartbeat_and_bad_queue(self) -> None:
+        queue = self.client.register(["message"])
+        result = self.client.get_events(queue_id=queue["queue_id"], last_event_id=-1)
+        self.assertEqual([event["type"] for event in result["events"]], ["heartbeat"])
+
+        self.client.deregister(queue["queue_id"])
+        result = self.client.get_events(queue_id=queue["queue_id"], last_event_id=-1)
+        self.assertEqual(result["code"], "BAD_EVENT_QUEUE_ID")
+
+    def test_uploads_and_storage(self) -> None:
+        file = io.BytesIO(b"report")
+        file.name = "report.txt"
+        result = self.client.upload_file(file)
+        response = requests.get(self.server.url + result["uri"], auth=("iago@zulip.com", "key"))
+        self.assertEqual(response.content, b"report")
+
+        self.client.update_storage({"storage": {"count": "1"}})
+        result = self.client.get_storage({"keys": ["count"]})
+        self.assertEqual(result["storage"], {"count": "1"})
+        self.assertEqual(self.client.get_stream_id("General")["stream_id"], 1)
+        self.assertEqual(self.client.get_profile()["email"], "iago@zulip.com")
+
+    def test_errors(self) -> None:
+        # Dropped connections are retried once the client has connected.
+        self.assertEqual(self.client.get_profile()["result"], "success")
+        self.server.inject_errors(count=2, status=None, endpoint="users/me")
+        self.assertEqual(self.client.get_profile()["result"], "success")
+        self.assertEqual(self.server.request_counts[("GET", "users/me")], 4)
+
+        self.server.inject_errors(status=503)
+        self.assertEqual(self.client.get_profile()["result"], "success")
+        self.assertEqual(self.server.request_counts[("GET", "users/me")], 6)
+
+        self.server.inject_errors(status=400)
+        self.assertEqual(self.client.get_profile()["result"], "error")
+
+        response = requests.get(self.server.url + "/api/v1/users/me")
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
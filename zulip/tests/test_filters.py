@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import unittest
+from typing import Any, Dict
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import zulip
+
+
+def stream_message(stream: str, topic: str, sender: str = "iago@zulip.com") -> Dict[str, Any]:
+    return {
+        "type": "stream",
+        "stream_id": 7,
+        "display_recipient": stream,
+        "subject": topic,
+        "sender_id": 5,
+        "sender_email": sender,
+    }
+
+
+class TestMessageFilter(TestCase):
+    def test_filter(self) -> None:
+        message_filter = zulip.MessageFilter(
+            streams=["Bridges"],
+            topics=["IRC"],
+            exclude_senders=["bot@zulip.com"],
+            include_private=True,
+        )
+        self.assertTrue(message_filter(stream_message("bridges", "irc")))
+        self.assertFalse(message_filter(stream_message("bridges", "slack")))
+        self.assertFalse(message_filter(stream_message("devel", "irc")))
+        self.assertFalse(message_filter(stream_message("bridges", "irc", sender="Bot@zulip.com")))
+        private = dict(stream_message("", ""), type="private", display_recipient=[])
+        self.assertTrue(message_filter(private))
+        self.assertEqual(message_filter.narrow(), [])
+
+        message_filter = zulip.MessageFilter(streams=[7], exclude_senders=[5, 6])
+        self.assertFalse(message_filter(stream_message("bridges", "irc")))
+        self.assertFalse(message_filter(private))
+        self.assertEqual(message_filter.narrow(), [])
+
+        message_filter = zulip.MessageFilter(streams=["bridges"], topics=["irc", "slack"])
+        self.assertTrue(message_filter(stream_message("bridges", "slack")))
+        self.assertEqual(message_filter.narrow(), [["stream", "bridges"]])
+        message_filter = zulip.MessageFilter(streams=["bridges"], topics=["irc"])
+        self.assertFalse(message_filter(private))
+        self.assertEqual(message_filter.narrow(), [["stream", "bridges"], ["topic", "irc"]])
+
+    def test_call_on_each_message(self) -> None:
+        client = zulip.Client(
+            email="bot@zulip.com", api_key="key", site="https://zulip.example.com"
+        )
+        messages = [
+            stream_message("bridges", "irc"),
+            stream_message("bridges", "irc", sender="bot@zulip.com"),
+        ]
+
+        class Done(Exception):
+            pass
+
+        callback = MagicMock(side_effect=Done)
+
+        with patch.object(client, "register") as mock_register, patch.object(
+            client, "get_events"
+        ) as mock_get_events:
+            mock_register.return_value = {"result": "success", "queue_id": "1", "last_event_id": -1}
+            mock_get_events.return_value = {
+                "result": "success",
+                "events": [
+                    {"type": "message", "id": i, "message": message}
+                    for i, message in enumerate(reversed(messages))
+                ],
+            }
+            with self.assertRaises(Done):
+                client.call_on_each_message(
+                    callback,
+                    message_filter=zulip.MessageFilter(
+                        streams=["bridges"],
+                        topics=["irc"],
+                        exclude_senders=[client.email],
+                    ),
+                    apply_markdown=False,
+                )
+        mock_register.assert_called_once_with(
+            ["message"], [["stream", "bridges"], ["topic", "irc"]], apply_markdown=False
+        )
+        callback.assert_called_once_with(messages[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import unittest
+from typing import Any, Dict, List
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+
+
+class FakeHistory:
+    def __init__(self, message_ids: List[int]) -> None:
+        self.message_ids = message_ids
+        self.requests = []  # type: List[Dict[str, Any]]
+
+    def get_messages(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.requests.append(request)
+        ids = self.message_ids
+        anchor = request["anchor"]
+        if anchor == "newest":
+            anchor = ids[-1]
+        elif anchor == "oldest":
+            anchor = ids[0]
+        before = [i for i in ids if i < anchor][-request["num_before"] :]
+        before = before if request["num_before"] else []
+        after = [i for i in ids if i > anchor][: request["num_after"]]
+        page = before + [i for i in ids if i == anchor] + after
+        return {
+            "result": "success",
+            "msg": "",
+            "messages": [{"id": i} for i in page],
+            "found_oldest": ids[0] in page,
+            "found_newest": ids[-1] in page,
+        }
+
+
+class TestIterMessages(TestCase):
+    def setUp(self) -> None:
+        self.client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+        self.history = FakeHistory(list(range(3, 60, 2)))
+
+    def iter_ids(self, **kwargs: Any) -> List[int]:
+        with patch.object(self.client, "get_messages", side_effect=self.history.get_messages):
+            return [message["id"] for message in self.client.iter_messages(**kwargs)]
+
+    def test_pagination(self) -> None:
+        ids = self.history.message_ids
+        for prefetch in (0, 1, 3):
+            for page_size in (1, 4, 100):
+                with self.subTest(prefetch=prefetch, page_size=page_size):
+                    self.assertEqual(
+                        self.iter_ids(page_size=page_size, prefetch=prefetch), ids[::-1]
+                    )
+                    self.assertEqual(
+                        self.iter_ids(direction="newer", page_size=page_size, prefetch=prefetch),
+                        ids,
+                    )
+
+        self.history.requests = []
+        self.iter_ids(narrow=[["stream", "devel"]], page_size=10, anchor=41, apply_markdown=False)
+        self.assertEqual(
+            self.history.requests[0],
+            {
+                "narrow": [["stream", "devel"]],
+                "anchor": 41,
+                "num_before": 10,
+                "num_after": 0,
+                "apply_markdown": False,
+            },
+        )
+        self.assertEqual([request["anchor"] for request in self.history.requests], [41, 21])
+
+    def test_error(self) -> None:
+        error = {"result": "error", "msg": "Invalid narrow operator: unknown"}
+        for prefetch in (0, 2):
+            with self.subTest(prefetch=prefetch):
+                with patch.object(self.client, "get_messages", return_value=error):
+                    with self.assertRaisesRegex(zulip.ZulipError, "Invalid narrow"):
+                        list(self.client.iter_messages(prefetch=prefetch))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import json
+import unittest
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.json_codec import JSONCodec, OrjsonCodec, UjsonCodec
+
+
+class TestJSONCodecs(TestCase):
+    def test_codecs_agree_with_json(self) -> None:
+        codecs = [JSONCodec()]
+        for codec_class in (OrjsonCodec, UjsonCodec):
+            try:
+                codecs.append(codec_class())
+            except ImportError:
+                pass
+
+        values = [
+            [["stream", "Denmark"], ["topic", "Copenhagen"]],
+            {"storage": {"entry 1": "value 1"}, 7: "non-string key"},
+            True,
+            2**70,
+            "Ünïcødé / slashes",
+        ]
+        for codec in codecs:
+            for value in values:
+                with self.subTest(codec=codec.name, value=value):
+                    self.assertEqual(json.loads(codec.dumps(value)), json.loads(json.dumps(value)))
+                    self.assertEqual(
+                        codec.loads(json.dumps(value).encode()), json.loads(json.dumps(value))
+                    )
+
+    def test_client_uses_codec(self) -> None:
+        codec = JSONCodec()
+        client = zulip.Client(
+            email="iago@zulip.com", api_key="key", site="zulip.example.com", json_codec=codec
+        )
+        self.assertIs(client.json_codec, codec)
+        with patch.object(codec, "dumps", wraps=codec.dumps) as mock_dumps, patch.object(
+            client, "call_endpoint"
+        ) as mock_call_endpoint:
+            client.update_user_by_id(8, full_name="New Name")
+        mock_dumps.assert_called_once_with("New Name")
+        mock_call_endpoint.assert_called_once_with(
+            url="users/8", method="PATCH", request={"full_name": '"New Name"'}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import subprocess
+import sys
+import unittest
+from unittest import TestCase
+
+import zulip
+
+CHECK_IMPORTS = """
+import sys
+import zulip
+heavy = ["aiohttp", "argparse", "distro", "distutils", "optparse", "requests", "sqlite3"]
+print(" ".join(name for name in heavy if name in sys.modules))
+"""
+
+
+class TestLazyImport(TestCase):
+    def test_import_is_light(self) -> None:
+        process = subprocess.run(
+            [sys.executable, "-c", CHECK_IMPORTS],
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        self.assertEqual(process.stdout.strip(), "")
+
+    def test_lazy_attributes(self) -> None:
+        from zulip import RequestsTransport
+
+        self.assertTrue(issubclass(RequestsTransport, zulip.Transport))
+        self.assertIs(zulip.SQLiteCheckpointStore, zulip.checkpoint.SQLiteCheckpointStore)
+        with self.assertRaises(AttributeError):
+            zulip.NoSuchThing
+
+    def test_platform_is_cached(self) -> None:
+        client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+        self.assertEqual(client.get_user_agent(), client.get_user_agent())
+        self.assertEqual(zulip._get_platform.cache_info().currsize, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import copy
+import pickle
+import unittest
+from typing import Any, Dict
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import zulip
+
+
+def private_message() -> Dict[str, Any]:
+    return {
+        "id": 42,
+        "type": "private",
+        "sender_id": 5,
+        "sender_email": "iago@zulip.com",
+        "display_recipient": [
+            {"id": 5, "email": "iago@zulip.com", "full_name": "Iago", "is_mirror_dummy": False},
+            {"id": 6, "email": "cordelia@zulip.com", "full_name": "Cordelia"},
+        ],
+        "subject": "",
+        "content": "<p>hello</p>",
+        "flags": ["read", "mentioned"],
+        "reactions": [
+            {
+                "emoji_name": "tada",
+                "emoji_code": "1f389",
+                "reaction_type": "unicode_emoji",
+                "user_id": 6,
+            }
+        ],
+        "submessages": [],
+        "last_edit_timestamp": 1620000000,
+    }
+
+
+class TestMessage(TestCase):
+    def test_mapping(self) -> None:
+        original = private_message()
+        message = zulip.Message(private_message())
+        self.assertFalse(hasattr(message, "__dict__"))
+        self.assertEqual(message, original)
+        self.assertEqual(message.to_dict(), original)
+        self.assertEqual(dict(message), original)
+        self.assertEqual(len(message), len(original))
+        self.assertEqual(set(message), set(original))
+        self.assertEqual(message["reactions"], original["reactions"])
+        self.assertEqual(message["last_edit_timestamp"], 1620000000)
+        self.assertIn("submessages", message)
+        self.assertNotIn("stream_id", message)
+        self.assertIsNone(message.get("stream_id"))
+        with self.assertRaises(KeyError):
+            message["stream_id"]
+
+        message["flags"].append("starred")
+        self.assertEqual(message["flags"], ["read", "mentioned", "starred"])
+        message["subject"] = "greetings"
+        del message["last_edit_timestamp"]
+        del message["submessages"]
+        self.assertNotIn("submessages", message)
+        with self.assertRaises(KeyError):
+            del message["submessages"]
+        self.assertEqual(len(message), len(original) - 2)
+
+        for copied in (copy.deepcopy(message), pickle.loads(pickle.dumps(message))):
+            self.assertIsInstance(copied, zulip.Message)
+            self.assertEqual(copied, message)
+
+    def test_shared_strings(self) -> None:
+        messages = [zulip.Message(private_message()) for i in range(2)]
+        self.assertIs(messages[0]["sender_email"], messages[1]["sender_email"])
+        self.assertIs(
+            messages[0]["reactions"][0]["emoji_name"], messages[1]["reactions"][0]["emoji_name"]
+        )
+
+    def test_compact(self) -> None:
+        client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+        with patch.object(client, "get_messages") as mock_get_messages:
+            mock_get_messages.return_value = {
+                "result": "success",
+                "messages": [private_message()],
+                "found_oldest": True,
+            }
+            messages = list(client.iter_messages(compact=True))
+        self.assertEqual(messages, [private_message()])
+        self.assertIsInstance(messages[0], zulip.Message)
+
+        class Done(Exception):
+            pass
+
+        callback = MagicMock(side_effect=Done)
+        with patch.object(client, "register") as mock_register, patch.object(
+            client, "get_events"
+        ) as mock_get_events:
+            mock_register.return_value = {"result": "success", "queue_id": "1", "last_event_id": -1}
+            mock_get_events.return_value = {
+                "result": "success",
+                "events": [{"type": "message", "id": 0, "message": private_message()}],
+            }
+            with self.assertRaises(Done):
+                client.call_on_each_message(callback, compact=True)
+        self.assertIsInstance(callback.call_args[0][0], zulip.Message)
+        callback.assert_called_once_with(private_message())
+
+
+if __name__ == "__main__":
+    unittest.main()
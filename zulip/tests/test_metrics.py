@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import unittest
+from typing import Any
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.testing import ScriptedTransport, make_response
+
+
+class TestMetricsCollector(TestCase):
+    def test_prometheus(self) -> None:
+        metrics = zulip.MetricsCollector(buckets=[0.1, 1])
+        metrics.on_response("GET", "users/8", 1, 200, 100, 0.05, None)
+        metrics.on_response("GET", "users/9", 1, None, None, 15, "timeout")
+        metrics.on_retry("GET", "users/9", 1, None, 0.5)
+
+        self.assertEqual(
+            metrics.to_prometheus().splitlines(),
+            [
+                "# HELP zulip_client_requests_total Requests made, by HTTP status or error.",
+                "# TYPE zulip_client_requests_total counter",
+                'zulip_client_requests_total{method="GET",endpoint="users/{id}",status="200"} 1',
+                'zulip_client_requests_total{method="GET",endpoint="users/{id}",status="timeout"} 1',
+                "# HELP zulip_client_retries_total Requests retried, by HTTP status or error.",
+                "# TYPE zulip_client_retries_total counter",
+                'zulip_client_retries_total{method="GET",endpoint="users/{id}",'
+                'reason="connection-error"} 1',
+                "# HELP zulip_client_response_bytes_total Size of the response bodies received.",
+                "# TYPE zulip_client_response_bytes_total counter",
+                'zulip_client_response_bytes_total{method="GET",endpoint="users/{id}"} 100',
+                "# HELP zulip_client_request_duration_seconds How long requests took.",
+                "# TYPE zulip_client_request_duration_seconds histogram",
+                'zulip_client_request_duration_seconds_bucket{method="GET",endpoint="users/{id}",'
+                'le="0.1"} 1',
+                'zulip_client_request_duration_seconds_bucket{method="GET",endpoint="users/{id}",'
+                'le="1.0"} 1',
+                'zulip_client_request_duration_seconds_bucket{method="GET",endpoint="users/{id}",'
+                'le="+Inf"} 2',
+                'zulip_client_request_duration_seconds_sum{method="GET",endpoint="users/{id}"} 15.05',
+                'zulip_client_request_duration_seconds_count{method="GET",endpoint="users/{id}"} 2',
+            ],
+        )
+
+    @patch("time.sleep")
+    def test_client(self, mock_sleep: Any) -> None:
+        metrics = zulip.MetricsCollector()
+        # Fails the first request to each endpoint with a 502.
+        transport = ScriptedTransport(
+            respond=lambda method, endpoint: make_response(
+                200 if transport.request_counts[(method, endpoint)] > 1 else 502,
+                {"result": "success", "msg": ""},
+            )
+        )
+        client = zulip.Client(
+            email="iago@zulip.com",
+            api_key="key",
+            site="zulip.example.com",
+            transport=transport,
+            request_hooks=[metrics],
+        )
+        client.get_user_by_id(8)
+        client.get_user_by_id(8)
+        client.send_message({"type": "stream", "to": "devel", "content": "hi"})
+        client.get_user_presence("othello@zulip.com")
+
+        result = metrics.as_dict()
+        self.assertEqual(
+            sorted(result), ["GET users/{email}/presence", "GET users/{id}", "POST messages"]
+        )
+        users = result["GET users/{id}"]
+        self.assertEqual(users["requests"], {"200": 2, "502": 1})
+        self.assertEqual(users["retries"], {"502": 1})
+        self.assertEqual(users["response_bytes"], 96)
+        self.assertEqual(users["duration"]["count"], 3)
+        self.assertEqual(result["POST messages"]["requests"], {"200": 1, "502": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import unittest
+from typing import Any, Dict
+from unittest import TestCase
+from unittest.mock import call, patch
+
+import zulip
+
+STREAM_IDS = {"Denmark": 1, "Verona": 2, "Rome": 3}
+
+
+def get_stream_id(stream: str) -> Dict[str, Any]:
+    if stream not in STREAM_IDS:
+        return {"result": "error", "msg": f"Invalid stream name '{stream}'"}
+    return {"result": "success", "msg": "", "stream_id": STREAM_IDS[stream]}
+
+
+def get_stream_topics(stream_id: int) -> Dict[str, Any]:
+    topics = {1: [{"name": "Copenhagen", "max_id": 11}, {"name": "Aarhus", "max_id": 12}]}
+    return {"result": "success", "msg": "", "topics": topics.get(stream_id, [])}
+
+
+class TestMoveTopics(TestCase):
+    def test_move_topics(self) -> None:
+        client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+        success = {"result": "success", "msg": ""}
+        with patch.object(
+            client, "get_stream_id", side_effect=get_stream_id
+        ) as mock_get_stream_id, patch.object(
+            client, "get_stream_topics", side_effect=get_stream_topics
+        ) as mock_get_stream_topics, patch.object(
+            client,
+            "get_messages",
+            return_value={"result": "success", "msg": "", "messages": [{"id": 21}]},
+        ), patch.object(
+            client, "call_endpoint", return_value=success
+        ) as mock_call_endpoint:
+            results = client.move_topics(
+                [
+                    ("Denmark", "copenhagen", "Verona", None),
+                    ("Denmark", "Aarhus", "Verona", "Aarhus C"),
+                    ("Verona", "Verona", "Rome", None),
+                    ("Denmark", "Odense", "Atlantis", None),
+                ]
+            )
+
+        self.assertEqual(results[:3], [success] * 3)
+        self.assertEqual(results[3]["msg"], "Invalid stream name 'Atlantis'")
+        self.assertEqual(mock_get_stream_id.call_count, 4)
+        self.assertEqual(sorted(mock_get_stream_topics.call_args_list), [call(1), call(2)])
+
+        patches = {
+            c[1]["url"]: (c[1]["request"]["stream_id"], c[1]["request"]["topic"])
+            for c in mock_call_endpoint.call_args_list
+        }
+        # The topic in Verona isn't listed by get_stream_topics, so its
+        # latest message is looked up with get_messages.
+        self.assertEqual(
+            patches,
+            {
+                "messages/11": (2, None),
+                "messages/12": (2, "Aarhus C"),
+                "messages/21": (3, None),
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
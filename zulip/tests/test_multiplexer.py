@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+import unittest
+from typing import Any, Callable, Dict
+from unittest import TestCase
+
+import zulip
+from zulip.testing import FakeZulipServer
+
+
+class Done(Exception):
+    pass
+
+
+class TestEventMultiplexer(TestCase):
+    def test_many_clients(self) -> None:
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            self.skipTest("aiohttp is not installed")
+
+        server = FakeZulipServer(heartbeat_interval=1).start()
+        self.addCleanup(server.stop)
+        emails = [f"bot{i}@zulip.com" for i in range(20)]
+        received = set()
+        multiplexer = zulip.EventMultiplexer()
+
+        def make_callback(email: str) -> Callable[[Dict[str, Any]], None]:
+            def callback(message: Dict[str, Any]) -> None:
+                self.assertEqual(message["content"], f"hi {email}")
+                received.add(email)
+                if len(received) == len(emails):
+                    raise Done
+
+            return callback
+
+        for email in emails:
+            multiplexer.add_message_callback(
+                server.make_client(email), make_callback(email), apply_markdown=False
+            )
+
+        def send() -> None:
+            while len(server.queues) < len(emails):
+                time.sleep(0.01)
+            sender = server.make_client("iago@zulip.com")
+            for email in emails:
+                sender.send_message({"type": "private", "to": [email], "content": f"hi {email}"})
+
+        sender = threading.Thread(target=send)
+        sender.start()
+        with self.assertRaises(Done):
+            multiplexer.run()
+        sender.join()
+        self.assertEqual(received, set(emails))
+
+
+if __name__ == "__main__":
+    unittest.main()
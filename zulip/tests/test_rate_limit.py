@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import time
+import unittest
+from typing import Any
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.testing import ScriptedTransport, make_response
+
+
+class TestRateLimiter(TestCase):
+    def test_unknown_budget_never_waits(self) -> None:
+        limiter = zulip.RateLimiter()
+        for i in range(100):
+            self.assertEqual(limiter.reserve(), 0)
+
+    def test_paces_requests_when_budget_is_exhausted(self) -> None:
+        limiter = zulip.RateLimiter()
+        limiter.update(
+            {
+                "X-RateLimit-Limit": "10",
+                "X-RateLimit-Remaining": "2",
+                "X-RateLimit-Reset": str(time.time() + 8),
+            }
+        )
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0)
+        # The budget refills at (10 - 2) / 8s = 1 request per second.
+        self.assertAlmostEqual(limiter.reserve(), 1, places=1)
+        self.assertAlmostEqual(limiter.reserve(), 2, places=1)
+
+    def test_server_count_is_authoritative(self) -> None:
+        limiter = zulip.RateLimiter()
+        headers = {"X-RateLimit-Limit": "10", "X-RateLimit-Reset": str(time.time() + 100)}
+        limiter.update(dict(headers, **{"X-RateLimit-Remaining": "1"}))
+        limiter.reserve()
+        self.assertGreater(limiter.reserve(), 0)
+        # The server has more budget left than we estimated.
+        limiter.update(dict(headers, **{"X-RateLimit-Remaining": "5"}))
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertAlmostEqual(limiter.refill_rate, 5 / 100, places=2)
+
+    def test_retry_after(self) -> None:
+        limiter = zulip.RateLimiter()
+        self.assertEqual(limiter.hit_limit({"Retry-After": "5"}), 5)
+        self.assertAlmostEqual(limiter.reserve(), 5, places=1)
+        self.assertEqual(limiter.hit_limit({}, {"retry-after": 0.5}), 0.5)
+
+
+class TestRateLimitedClient(TestCase):
+    @patch("time.sleep")
+    def test_429_is_retried_after_retry_after(self, mock_sleep: Any) -> None:
+        transport = ScriptedTransport(
+            [
+                make_response(
+                    429,
+                    {"result": "error", "code": "RATE_LIMIT_HIT", "retry-after": 3},
+                    {"Retry-After": "3"},
+                ),
+                make_response(200, {"result": "success", "msg": "", "id": 42}, {}),
+            ]
+        )
+        client = zulip.Client(
+            email="iago@zulip.com", api_key="key", site="zulip.example.com", transport=transport
+        )
+        result = client.send_message({"type": "stream", "to": "devel", "content": "hi"})
+        self.assertEqual(result["id"], 42)
+        delays = [call[0][0] for call in mock_sleep.call_args_list if call[0][0] > 0]
+        self.assertEqual(len(delays), 1)
+        self.assertAlmostEqual(delays[0], 3, places=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
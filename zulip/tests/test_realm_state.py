@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import unittest
+from typing import Any, Dict, List, Optional
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+
+
+def initial_state() -> Dict[str, Any]:
+    return {
+        "result": "success",
+        "queue_id": "1",
+        "last_event_id": -1,
+        "realm_users": [
+            {"user_id": 8, "email": "Iago@zulip.com", "full_name": "Iago", "is_active": True},
+            {"user_id": 9, "email": "othello@zulip.com", "full_name": "Othello", "is_active": True},
+        ],
+        "realm_non_active_users": [],
+        "cross_realm_bots": [
+            {"user_id": 1, "email": "notification-bot@zulip.com", "full_name": "Notification Bot"}
+        ],
+        "streams": [
+            {"stream_id": 1, "name": "Denmark", "description": ""},
+            {"stream_id": 2, "name": "Verona", "description": ""},
+        ],
+        "subscriptions": [
+            {"stream_id": 1, "name": "Denmark", "color": "#76ce90", "subscribers": [8, 9]}
+        ],
+        "unsubscribed": [],
+        "never_subscribed": [{"stream_id": 2, "name": "Verona", "subscribers": [9]}],
+        "realm_emoji": {"1": {"id": "1", "name": "green_tick", "deactivated": False}},
+    }
+
+
+def events() -> List[Dict[str, Any]]:
+    return [
+        {"type": "realm_user", "op": "add", "person": {"user_id": 10, "email": "a@zulip.com"}},
+        {
+            "type": "realm_user",
+            "op": "update",
+            "person": {"user_id": 8, "new_email": "i@z.com"},
+        },
+        {"type": "realm_user", "op": "update", "person": {"user_id": 9, "full_name": "O"}},
+        {"type": "realm_user", "op": "remove", "person": {"user_id": 10, "full_name": ""}},
+        {"type": "stream", "op": "create", "streams": [{"stream_id": 3, "name": "Rome"}]},
+        {"type": "stream", "op": "delete", "streams": [{"stream_id": 1, "name": "Denmark"}]},
+        {
+            "type": "stream",
+            "op": "update",
+            "stream_id": 2,
+            "name": "Verona",
+            "property": "name",
+            "value": "Venice",
+        },
+        {
+            "type": "subscription",
+            "op": "add",
+            "subscriptions": [{"stream_id": 3, "name": "Rome"}],
+        },
+        {"type": "subscription", "op": "peer_add", "stream_ids": [2, 3], "user_ids": [8]},
+        {"type": "subscription", "op": "peer_remove", "stream_id": 2, "user_id": 9},
+        {"type": "realm_emoji", "op": "update", "realm_emoji": {}},
+        {"type": "message", "message": {}},
+    ]
+
+
+def found(value: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    assert value is not None
+    return value
+
+
+class TestRealmState(TestCase):
+    def test_lookups_and_events(self) -> None:
+        state = zulip.RealmState()
+        state.load_initial_state(initial_state())
+
+        self.assertEqual(found(state.get_user_by_email("iago@ZULIP.com"))["user_id"], 8)
+        self.assertEqual(found(state.get_user_by_id(1))["full_name"], "Notification Bot")
+        self.assertEqual(state.get_stream_id("verona"), 2)
+        self.assertNotIn("subscribers", found(state.get_stream_by_id(1)))
+        self.assertEqual(state.get_subscribers(1), {8, 9})
+        self.assertTrue(state.is_subscribed(1))
+        self.assertFalse(state.is_subscribed(2))
+        self.assertEqual(found(state.get_emoji_by_name("green_tick"))["id"], "1")
+
+        for event in events():
+            state.apply_event(event)
+
+        self.assertIsNone(state.get_user_by_email("iago@zulip.com"))
+        self.assertEqual(found(state.get_user_by_email("i@z.com"))["user_id"], 8)
+        self.assertEqual(found(state.get_user_by_id(9))["full_name"], "O")
+        self.assertFalse(found(state.get_user_by_email("a@zulip.com"))["is_active"])
+        self.assertIsNone(state.get_stream_by_id(1))
+        self.assertFalse(state.is_subscribed(1))
+        self.assertIsNone(state.get_stream_id("Verona"))
+        self.assertEqual(found(state.get_stream_by_name("venice"))["stream_id"], 2)
+        self.assertTrue(state.is_subscribed(3))
+        self.assertEqual(state.get_subscribers(2), {8})
+        self.assertEqual(state.get_subscribers(3), {8})
+        self.assertIsNone(state.get_emoji_by_name("green_tick"))
+
+    def test_call_on_each_message(self) -> None:
+        client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+        state = zulip.RealmState()
+        senders = []
+
+        def get_events(queue_id: str, last_event_id: int) -> Dict[str, Any]:
+            if last_event_id == -1:
+                return {
+                    "result": "success",
+                    "events": [
+                        {
+                            "type": "realm_user",
+                            "op": "update",
+                            "id": 0,
+                            "person": {"user_id": 9, "full_name": "Othello, the Moor of Venice"},
+                        },
+                        {"type": "message", "id": 1, "message": {"sender_id": 9}},
+                    ],
+                }
+            raise KeyboardInterrupt
+
+        def callback(message: Dict[str, Any]) -> None:
+            senders.append(found(state.get_user_by_id(message["sender_id"]))["full_name"])
+
+        with patch.object(client, "register", return_value=initial_state()) as mock_register:
+            with patch.object(client, "get_events", side_effect=get_events):
+                with self.assertRaises(KeyboardInterrupt):
+                    client.call_on_each_message(callback, realm_state=state)
+
+        mock_register.assert_called_once_with(
+            ["message", "realm_user", "stream", "subscription", "realm_emoji"],
+            [],
+            include_subscribers=True,
+        )
+        self.assertEqual(senders, ["Othello, the Moor of Venice"])
+
+
+if __name__ == "__main__":
+    unittest.main()
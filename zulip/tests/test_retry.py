@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import unittest
+from typing import Any
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.testing import ScriptedTransport, make_response
+
+
+class TestRetryPolicy(TestCase):
+    def test_delays(self) -> None:
+        policy = zulip.RetryPolicy(initial_delay=1, multiplier=2, max_delay=5, jitter=0)
+        self.assertEqual([policy.get_delay(n) for n in range(1, 6)], [1, 2, 4, 5, 5])
+        # e.g. a bot whose event loop keeps failing for days
+        self.assertEqual(policy.get_delay(100000), 5)
+
+        policy = zulip.RetryPolicy(initial_delay=4, jitter=0.5)
+        for i in range(100):
+            self.assertTrue(2 <= policy.get_delay(1) <= 4)
+
+        state = zulip.RetryPolicy(max_retries=3).start()
+        self.assertEqual(len([state.next_delay() for i in range(3)]), 3)
+        self.assertIsNone(state.next_delay())
+
+        state = zulip.RetryPolicy(initial_delay=1, jitter=0, deadline=1.5).start()
+        self.assertEqual(state.next_delay(), 1)
+        self.assertIsNone(state.next_delay())
+
+    def test_endpoint_overrides(self) -> None:
+        no_retries = zulip.RetryPolicy(max_retries=0)
+        policy = zulip.RetryPolicy(endpoint_overrides={"POST messages": no_retries})
+        self.assertIs(policy.for_endpoint("POST", "messages"), no_retries)
+        self.assertIs(policy.for_endpoint("GET", "messages"), policy)
+        self.assertIs(policy.for_endpoint("POST", "messages/flags"), policy)
+
+        policy = zulip.RetryPolicy(endpoint_overrides={"users/*": no_retries})
+        self.assertIs(policy.for_endpoint("PATCH", "users/8"), no_retries)
+
+    @patch("time.sleep")
+    def test_client_retries(self, mock_sleep: Any) -> None:
+        for status_code, policy, expected_requests in [
+            (503, zulip.RetryPolicy(max_retries=3), 4),
+            (503, zulip.RetryPolicy(max_retries=3, retry_statuses=[502]), 1),
+            (
+                503,
+                zulip.RetryPolicy(
+                    endpoint_overrides={"POST messages": zulip.RetryPolicy(max_retries=0)}
+                ),
+                1,
+            ),
+        ]:
+            transport = ScriptedTransport(
+                respond=lambda method, endpoint: make_response(
+                    status_code, {"result": "error", "msg": "Server error"}
+                )
+            )
+            client = zulip.Client(
+                email="iago@zulip.com",
+                api_key="key",
+                site="zulip.example.com",
+                transport=transport,
+                retry_policy=policy,
+            )
+            result = client.send_message({"type": "stream", "to": "devel", "content": "hi"})
+            self.assertEqual(result["result"], "error")
+            self.assertEqual(transport.request_counts[("POST", "messages")], expected_requests)
+
+
+if __name__ == "__main__":
+    unittest.main()
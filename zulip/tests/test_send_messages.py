@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import random
+import time
+import unittest
+from typing import Any, Dict
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+
+
+class TestSendMessages(TestCase):
+    def setUp(self) -> None:
+        self.client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+
+    def test_results_and_conversation_order(self) -> None:
+        messages = [
+            {"type": "stream", "to": "devel", "topic": f"topic {i % 3}", "content": str(i)}
+            for i in range(30)
+        ]
+        # Topics are case-insensitive, so these are one conversation.
+        messages[3]["topic"] = "TOPIC 0"
+
+        def send_message(message: Dict[str, Any]) -> Dict[str, Any]:
+            time.sleep(random.random() / 100)
+            return {"result": "success", "msg": "", "id": int(message["content"])}
+
+        with patch.object(
+            self.client, "send_message", side_effect=send_message
+        ) as mock_send_message:
+            results = list(self.client.send_messages(messages, concurrency=3))
+
+        self.assertEqual([result["id"] for result in results], list(range(30)))
+        sent = [call[0][0] for call in mock_send_message.call_args_list]
+        for topic in ["topic 0", "topic 1", "topic 2"]:
+            contents = [
+                int(message["content"]) for message in sent if message["topic"].lower() == topic
+            ]
+            self.assertEqual(contents, sorted(contents))
+
+    def test_invalid_concurrency(self) -> None:
+        with self.assertRaises(ValueError):
+            self.client.send_messages([], concurrency=0)
+
+    def test_exception_is_raised_for_its_message(self) -> None:
+        def send_message(message: Dict[str, Any]) -> Dict[str, Any]:
+            if message["content"] == "bad":
+                raise zulip.UnrecoverableNetworkError("cannot connect to server")
+            return {"result": "success", "msg": ""}
+
+        messages = [
+            {"type": "private", "to": ["hamlet@zulip.com"], "content": "good"},
+            {"type": "private", "to": ["othello@zulip.com"], "content": "bad"},
+        ]
+        with patch.object(self.client, "send_message", side_effect=send_message):
+            results = self.client.send_messages(messages)
+            self.assertEqual(next(results)["result"], "success")
+            with self.assertRaises(zulip.UnrecoverableNetworkError):
+                next(results)
+
+
+if __name__ == "__main__":
+    unittest.main()
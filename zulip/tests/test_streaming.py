@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import json
+import unittest
+from unittest import TestCase
+
+import zulip
+from zulip.streaming import StreamingJSONParser
+from zulip.testing import ScriptedBody, ScriptedTransport, make_response
+
+
+class TestStreamingJSONParser(TestCase):
+    def test_chunk_boundaries(self) -> None:
+        document = {
+            "result": "success",
+            "anchor": 123456789,
+            "ratio": -1.5e3,
+            "found_oldest": False,
+            "messages": [{"id": i, "content": 'Ünïcødé "quoted" ✓'} for i in range(20)],
+            "empty": [],
+            "nested": {"a": [1, 2, {"b": None}]},
+        }
+        body = json.dumps(document).encode()
+        for chunk_size in (1, 3, 7, len(body)):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+                items = list(StreamingJSONParser(chunks, expand={"messages", "empty"}).iter_items())
+                self.assertEqual(
+                    [value for key, value in items if key == "messages"], document["messages"]
+                )
+                self.assertNotIn("empty", [key for key, value in items])
+                self.assertEqual(
+                    {key: value for key, value in items if key != "messages"},
+                    {
+                        key: document[key]
+                        for key in ("result", "anchor", "ratio", "found_oldest", "nested")
+                    },
+                )
+
+    def test_truncated_input(self) -> None:
+        with self.assertRaises(ValueError):
+            list(
+                StreamingJSONParser([b'{"messages": [{"id": 1}'], expand={"messages"}).iter_items()
+            )
+
+
+class TestStreamingClient(TestCase):
+    def test_get_messages_streaming(self) -> None:
+        messages = [{"id": i} for i in range(5)]
+        client = zulip.Client(
+            email="iago@zulip.com",
+            api_key="key",
+            site="zulip.example.com",
+            transport=ScriptedTransport(
+                [
+                    make_response(
+                        200,
+                        {
+                            "result": "success",
+                            "msg": "",
+                            "messages": messages,
+                            "found_newest": True,
+                        },
+                    )
+                ]
+            ),
+        )
+        items = list(client.get_messages_streaming({"anchor": "newest", "num_before": 5}))
+        self.assertEqual(
+            items,
+            [("result", "success"), ("msg", "")]
+            + [("messages", message) for message in messages]
+            + [("found_newest", True)],
+        )
+
+    def test_retries_release_connections(self) -> None:
+        responses = [
+            make_response(status_code, {"result": "success", "msg": "", "messages": []})
+            for status_code in (503, 429, 200)
+        ]
+        client = zulip.Client(
+            email="iago@zulip.com",
+            api_key="key",
+            site="zulip.example.com",
+            transport=ScriptedTransport(responses),
+            retry_policy=zulip.RetryPolicy(initial_delay=0.01, max_delay=0.01),
+        )
+        items = list(client.get_messages_streaming({"anchor": "newest", "num_before": 5}))
+        self.assertEqual(items, [("result", "success"), ("msg", "")])
+        bodies = [response.raw for response in responses]
+        for body in bodies:
+            assert isinstance(body, ScriptedBody)
+            self.assertTrue(body.released)
+        self.assertTrue(bodies[0].closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
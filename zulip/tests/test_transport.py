@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import TestCase
+
+import zulip
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class EchoAuthHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        request_body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(
+            {
+                "result": "success",
+                "msg": "",
+                "authorization": self.headers["Authorization"],
+                "cookie": self.headers.get("Cookie"),
+                "request_bytes": len(request_body),
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Set-Cookie", "sessionid=" + self.headers["Authorization"])
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+
+class TestSharedTransport(TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), EchoAuthHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_client(self, email: str, transport: zulip.Transport) -> zulip.Client:
+        return zulip.Client(
+            email=email,
+            api_key="key",
+            site="http://127.0.0.1:{}".format(self.server.server_port),
+            transport=transport,
+        )
+
+    def test_clients_share_connections(self) -> None:
+        transport = zulip.RequestsTransport()
+        iago = self.make_client("iago@zulip.com", transport)
+        hamlet = self.make_client("hamlet@zulip.com", transport)
+
+        first = iago.send_message({"type": "private", "to": "othello@zulip.com"})
+        second = hamlet.send_message({"type": "private", "to": "othello@zulip.com"})
+
+        # Each client still authenticates as itself...
+        self.assertNotEqual(first["authorization"], second["authorization"])
+        # ...but the second request reuses the first one's connection.
+        self.assertEqual(
+            transport.get_stats(),
+            {"requests": 2, "pool_hits": 1, "pool_misses": 1, "idle_closed": 0},
+        )
+        transport.close()
+
+    def test_no_shared_cookies(self) -> None:
+        for transport_class in (zulip.RequestsTransport, zulip.HTTPXTransport):
+            with self.subTest(transport=transport_class.__name__):
+                try:
+                    transport = transport_class()
+                except ImportError:
+                    self.skipTest("httpx is not installed")
+                iago = self.make_client("iago@zulip.com", transport)
+                hamlet = self.make_client("hamlet@zulip.com", transport)
+                iago.send_message({"type": "private", "to": "othello@zulip.com"})
+                result = hamlet.send_message({"type": "private", "to": "othello@zulip.com"})
+                self.assertIsNone(result["cookie"])
+                result = iago.send_message({"type": "private", "to": "othello@zulip.com"})
+                self.assertIsNone(result["cookie"])
+                transport.close()
+
+    def test_session(self) -> None:
+        client = zulip.Client(email="iago@zulip.com", api_key="key", site="zulip.example.com")
+        barrier = threading.Barrier(4)
+        sessions = []
+
+        def get_session() -> None:
+            barrier.wait()
+            sessions.append(client.session)
+
+        threads = [threading.Thread(target=get_session) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # The threads all got the session of the one transport created.
+        assert isinstance(client.transport, zulip.RequestsTransport)
+        self.assertEqual(sessions, [client.transport.session] * 4)
+
+    def test_idle_timeout(self) -> None:
+        transport = zulip.RequestsTransport(idle_timeout=0)
+        client = self.make_client("iago@zulip.com", transport)
+        client.send_message({"type": "private", "to": "othello@zulip.com"})
+        client.send_message({"type": "private", "to": "othello@zulip.com"})
+        stats = transport.get_stats()
+        self.assertEqual(stats["pool_misses"], 2)
+        self.assertEqual(stats["idle_closed"], 1)
+        transport.close()
+
+    def test_httpx_transport(self) -> None:
+        try:
+            transport = zulip.HTTPXTransport()
+        except ImportError:
+            self.skipTest("httpx is not installed")
+        iago = self.make_client("iago@zulip.com", transport)
+        hamlet = self.make_client("hamlet@zulip.com", transport)
+
+        first = iago.send_message({"type": "private", "to": "othello@zulip.com"})
+        second = hamlet.send_message({"type": "private", "to": "othello@zulip.com"})
+        self.assertEqual(first["result"], "success")
+        self.assertNotEqual(first["authorization"], second["authorization"])
+
+        file = io.BytesIO(b"x" * 100000)
+        file.name = "report.txt"
+        self.assertGreater(iago.upload_file(file)["request_bytes"], 100000)
+        self.assertEqual(dict(iago.call_endpoint_streaming("users/me"))["result"], "success")
+        self.assertEqual(transport.get_stats(), {"requests": 4})
+        transport.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
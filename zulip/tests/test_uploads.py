@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import email
+import email.message
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from typing import Any, Dict
+from unittest import TestCase
+from unittest.mock import patch
+
+import zulip
+from zulip.uploads import MultipartBody
+
+
+class TestMultipartBody(TestCase):
+    def test_body(self) -> None:
+        file = io.BytesIO(b"skipped" + os.urandom(100000))
+        file.name = "/tmp/chart.png"
+        file.seek(7)
+        body = MultipartBody({"topic": "reports"}, [file])
+
+        for i in range(2):
+            body.rewind()
+            data = b"".join(iter(lambda: body.read(1000), b""))
+            self.assertEqual(len(data), len(body))
+
+            message = email.message_from_bytes(
+                f"Content-Type: {body.content_type}\r\n\r\n".encode() + data
+            )
+            payload = message.get_payload()
+            assert isinstance(payload, list)
+            fields, uploaded = payload
+            assert isinstance(fields, email.message.Message)
+            assert isinstance(uploaded, email.message.Message)
+            self.assertEqual(fields.get_payload(), "reports")
+            self.assertEqual(uploaded.get_filename(), "chart.png")
+            self.assertEqual(uploaded.get_content_type(), "image/png")
+            self.assertEqual(uploaded.get_payload(decode=True), file.getvalue()[7:])
+
+
+class TestUploadCache(TestCase):
+    def test_client(self) -> None:
+        directory = tempfile.mkdtemp()
+        paths = []
+        for name, content in [("a.txt", b"report"), ("b.txt", b"report"), ("c.txt", b"chart")]:
+            paths.append(os.path.join(directory, name))
+            with open(paths[-1], "wb") as f:
+                f.write(content)
+        cache_path = os.path.join(directory, "uploads.json")
+
+        for i in range(2):
+            client = zulip.Client(
+                email="iago@zulip.com",
+                api_key="key",
+                site="zulip.example.com",
+                upload_cache=zulip.UploadCache(cache_path),
+            )
+            with patch.object(client, "call_endpoint") as mock_call_endpoint:
+                mock_call_endpoint.side_effect = lambda url, files: {
+                    "result": "success",
+                    "msg": "",
+                    "uri": "/user_uploads/" + os.path.basename(files[0].name),
+                }
+                results = client.upload_files(paths, concurrency=1)
+            self.assertEqual(
+                [result["uri"] for result in results],
+                ["/user_uploads/a.txt", "/user_uploads/a.txt", "/user_uploads/c.txt"],
+            )
+            self.assertEqual(mock_call_endpoint.call_count, 2 if i == 0 else 0)
+
+    def test_not_seekable(self) -> None:
+        read, write = os.pipe()
+        os.write(write, b"report")
+        os.close(write)
+        client = zulip.Client(
+            email="iago@zulip.com",
+            api_key="key",
+            site="zulip.example.com",
+            upload_cache=zulip.UploadCache(),
+        )
+        with open(read, "rb") as file, patch.object(client, "call_endpoint") as mock_call_endpoint:
+            mock_call_endpoint.return_value = {"result": "success", "msg": "", "uri": "/u/a"}
+            self.assertEqual(client.upload_file(file)["uri"], "/u/a")
+            mock_call_endpoint.assert_called_once_with(url="user_uploads", files=[file])
+        assert client.upload_cache is not None
+        self.assertEqual(client.upload_cache.results, {})
+
+    def test_concurrent_uploads(self) -> None:
+        cache = zulip.UploadCache()
+        finish = threading.Event()
+        calls = 0
+
+        def upload() -> Dict[str, Any]:
+            nonlocal calls
+            calls += 1
+            finish.wait()
+            return {"result": "success", "msg": "", "uri": "/u/a"}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(cache.get_or_upload, "key", upload) for i in range(3)]
+            # Gives the other threads time to start waiting for the upload.
+            time.sleep(0.1)
+            finish.set()
+            results = [future.result() for future in futures]
+        self.assertEqual(calls, 1)
+        self.assertEqual([result["uri"] for result in results], ["/u/a"] * 3)
+        self.assertEqual(cache.get_or_upload("key", upload)["uri"], "/u/a")
+        self.assertEqual(calls, 1)
+
+        # Failed uploads aren't cached.
+        failed = {"result": "error", "msg": "File too large"}
+        self.assertEqual(cache.get_or_upload("other", lambda: failed), failed)
+        self.assertIsNone(cache.get("other"))
+
+
+if __name__ == "__main__":
+    unittest.main()
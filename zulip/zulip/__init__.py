@@ -1,23 +1,27 @@
-import argparse
-import json
+import contextlib
+import functools
+import importlib
 import logging
-import optparse
 import os
-import platform
+import queue
 import random
 import sys
+import threading
 import time
 import traceback
 import types
 import urllib.parse
-from configparser import SafeConfigParser
-from distutils.version import LooseVersion
+from collections import OrderedDict
 from typing import (
     IO,
+    TYPE_CHECKING,
     Any,
     Callable,
+    Collection,
     Dict,
+    Hashable,
     Iterable,
+    Iterator,
     List,
     Mapping,
     Optional,
@@ -26,8 +30,79 @@ from typing import (
     Union,
 )
 
-import distro
-import requests
+from zulip.json_codec import JSONCodec, get_default_json_codec
+from zulip.rate_limit import RateLimiter
+from zulip.retry import RetryPolicy, RetryState  # noqa: F401
+
+# Many scripts using this module (e.g. the git and svn hooks) are run
+# once per event, so `import zulip` avoids importing anything that not
+# every script needs; see benchmarks/bench_import_time.py.  The names
+# below are imported from their modules on first use, and the heavy
+# third-party modules (requests, distro) inside the functions using them.
+if TYPE_CHECKING:
+    import argparse
+    import optparse
+
+    import requests
+
+    from zulip.async_client import AsyncClient  # noqa: F401
+    from zulip.buffering import MessageBuffer, ZulipHandler  # noqa: F401
+    from zulip.bulk import BulkResult  # noqa: F401
+    from zulip.cache import ResponseCache
+    from zulip.checkpoint import (  # noqa: F401
+        CheckpointStore,
+        FileCheckpointStore,
+        SQLiteCheckpointStore,
+    )
+    from zulip.dispatch import KeyedDispatcher, conversation_key, sender_key  # noqa: F401
+    from zulip.filters import MessageFilter  # noqa: F401
+    from zulip.message import Message  # noqa: F401
+    from zulip.metrics import MetricsCollector, RequestHooks  # noqa: F401
+    from zulip.multiplexer import EventMultiplexer  # noqa: F401
+    from zulip.realm_state import RealmState
+    from zulip.streaming import StreamingJSONParser  # noqa: F401
+    from zulip.transport import (  # noqa: F401
+        HTTPXTransport,
+        PoolingHTTPAdapter,
+        RequestsTransport,
+        Transport,
+    )
+    from zulip.uploads import UploadCache
+
+_LAZY_ATTRIBUTES = {
+    "AsyncClient": "zulip.async_client",
+    "MessageBuffer": "zulip.buffering",
+    "ZulipHandler": "zulip.buffering",
+    "BulkResult": "zulip.bulk",
+    "ResponseCache": "zulip.cache",
+    "CheckpointStore": "zulip.checkpoint",
+    "FileCheckpointStore": "zulip.checkpoint",
+    "SQLiteCheckpointStore": "zulip.checkpoint",
+    "KeyedDispatcher": "zulip.dispatch",
+    "conversation_key": "zulip.dispatch",
+    "sender_key": "zulip.dispatch",
+    "MessageFilter": "zulip.filters",
+    "Message": "zulip.message",
+    "MetricsCollector": "zulip.metrics",
+    "RequestHooks": "zulip.metrics",
+    "EventMultiplexer": "zulip.multiplexer",
+    "RealmState": "zulip.realm_state",
+    "StreamingJSONParser": "zulip.streaming",
+    "HTTPXTransport": "zulip.transport",
+    "PoolingHTTPAdapter": "zulip.transport",
+    "RequestsTransport": "zulip.transport",
+    "Transport": "zulip.transport",
+    "UploadCache": "zulip.uploads",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
 
 __version__ = "0.8.0"
 
@@ -36,14 +111,22 @@ assert sys.version_info >= (3, 6)
 
 logger = logging.getLogger(__name__)
 
-# Check that we have a recent enough version
-# Older versions don't provide the 'json' attribute on responses.
-assert LooseVersion(requests.__version__) >= LooseVersion("0.12.1")
-# In newer versions, the 'json' attribute is a function, not a property
-requests_json_is_function = callable(requests.Response.json)
-
 API_VERSTRING = "v1/"
 
+# The sections of register's initial state that can grow with the
+# size of the realm, which register_streaming yields element by element.
+REGISTER_STREAMING_EXPAND = frozenset(
+    [
+        "realm_users",
+        "realm_non_active_users",
+        "subscriptions",
+        "unsubscribed",
+        "never_subscribed",
+        "streams",
+        "presences",
+    ]
+)
+
 
 class CountingBackoff:
     def __init__(
@@ -115,10 +198,11 @@ def _default_client() -> str:
 
 
 def add_default_arguments(
-    parser: argparse.ArgumentParser,
+    parser: "argparse.ArgumentParser",
     patch_error_handling: bool = True,
     allow_provisioning: bool = False,
-) -> argparse.ArgumentParser:
+) -> "argparse.ArgumentParser":
+    import argparse
 
     if patch_error_handling:
 
@@ -192,7 +276,11 @@ def add_default_arguments(
 # except for the fact that is uses the deprecated `optparse` module.
 # We still keep it for legacy support of out-of-tree bots and integrations
 # depending on it.
-def generate_option_group(parser: optparse.OptionParser, prefix: str = "") -> optparse.OptionGroup:
+def generate_option_group(
+    parser: "optparse.OptionParser", prefix: str = ""
+) -> "optparse.OptionGroup":
+    import optparse
+
     logging.warning(
         """zulip.generate_option_group is based on optparse, which
                     is now deprecated. We recommend migrating to argparse and
@@ -326,6 +414,35 @@ def validate_boolean_field(field: Optional[str]) -> Union[bool, None]:
         return None
 
 
+@functools.lru_cache(maxsize=None)
+def _get_platform() -> Tuple[str, str]:
+    """
+    Returns the OS and its version, for the User-Agent.  Looking these
+    up is relatively slow, and they don't change, so they are cached.
+    """
+    import platform
+
+    vendor = ""
+    vendor_version = ""
+    try:
+        vendor = platform.system()
+        vendor_version = platform.release()
+    except OSError:
+        # If the calling process is handling SIGCHLD, platform.system() can
+        # fail with an IOError.  See http://bugs.python.org/issue9127
+        pass
+
+    if vendor == "Linux":
+        import distro
+
+        vendor, vendor_version, dummy = distro.linux_distribution()
+    elif vendor == "Windows":
+        vendor_version = platform.win32_ver()[1]
+    elif vendor == "Darwin":
+        vendor_version = platform.mac_ver()[0]
+    return (vendor, vendor_version)
+
+
 class ZulipError(Exception):
     pass
 
@@ -342,7 +459,13 @@ class UnrecoverableNetworkError(ZulipError):
     pass
 
 
-class Client:
+class BaseClient:
+    """
+    Configuration shared by Client and AsyncClient: resolving
+    credentials from arguments, the environment and zuliprc, and the
+    TLS settings used to talk to the server.
+    """
+
     def __init__(
         self,
         email: Optional[str] = None,
@@ -356,6 +479,13 @@ class Client:
         insecure: Optional[bool] = None,
         client_cert: Optional[str] = None,
         client_cert_key: Optional[str] = None,
+        transport: Optional["Transport"] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        json_codec: Optional[JSONCodec] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        cache: Optional["ResponseCache"] = None,
+        request_hooks: Optional[Sequence["RequestHooks"]] = None,
+        upload_cache: Optional["UploadCache"] = None,
     ) -> None:
         if client is None:
             client = _default_client()
@@ -396,6 +526,8 @@ class Client:
             config_file = get_default_config_filename()
 
         if config_file is not None and os.path.exists(config_file):
+            from configparser import SafeConfigParser
+
             config = SafeConfigParser()
             with open(config_file) as f:
                 config.readfp(f, config_file)
@@ -482,59 +614,111 @@ class Client:
         self.client_cert = client_cert
         self.client_cert_key = client_cert_key
 
-        self.session = None  # type: Optional[requests.Session]
+        # The HTTP transport is created lazily, unless the caller
+        # passed one in to share its connection pool with other clients.
+        self.transport = transport
+        self.session_lock = threading.Lock()
 
-        self.has_connected = False
+        # Paces requests according to the server's rate limit headers;
+        # it is shared by all threads using this client.
+        if rate_limiter is None:
+            rate_limiter = RateLimiter()
+        self.rate_limiter = rate_limiter
 
-    def ensure_session(self) -> None:
+        # Used to encode request parameters and decode responses.
+        if json_codec is None:
+            json_codec = get_default_json_codec()
+        self.json_codec = json_codec
 
-        # Check if the session has been created already, and return
-        # immediately if so.
-        if self.session:
-            return
+        # How failed requests are retried (if retry_on_errors is set),
+        # and how the event loop backs off after errors.
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+
+        # An optional cache for the results of read-mostly endpoints.
+        self.cache = cache
+
+        # Instrumentation called around each request; see
+        # zulip.RequestHooks and zulip.MetricsCollector.
+        self.request_hooks = list(request_hooks) if request_hooks is not None else []
 
-        # Build a client cert object for requests
+        # An optional cache of the URIs of uploaded files, by content.
+        self.upload_cache = upload_cache
+
+        self.has_connected = False
+
+    def _call_hooks(self, name: str, *args: Any) -> None:
+        for hooks in self.request_hooks:
+            try:
+                getattr(hooks, name)(*args)
+            except Exception:
+                logger.exception("Error in request hook %s.%s", type(hooks).__name__, name)
+
+    def get_client_cert(self) -> Union[None, str, Tuple[str, str]]:
         if self.client_cert_key is not None:
             assert self.client_cert is not None  # Otherwise ZulipError near end of __init__
-            client_cert = (
-                self.client_cert,
-                self.client_cert_key,
-            )  # type: Union[None, str, Tuple[str, str]]
-        else:
-            client_cert = self.client_cert
-
-        # Actually construct the session
-        session = requests.Session()
-        session.auth = requests.auth.HTTPBasicAuth(self.email, self.api_key)
-        session.verify = self.tls_verification
-        session.cert = client_cert
-        session.headers.update({"User-agent": self.get_user_agent()})
-        self.session = session
+            return (self.client_cert, self.client_cert_key)
+        return self.client_cert
 
-    def get_user_agent(self) -> str:
-        vendor = ""
-        vendor_version = ""
+    def _json_or_none(self, body: bytes) -> Optional[Dict[str, Any]]:
         try:
-            vendor = platform.system()
-            vendor_version = platform.release()
-        except OSError:
-            # If the calling process is handling SIGCHLD, platform.system() can
-            # fail with an IOError.  See http://bugs.python.org/issue9127
-            pass
-
-        if vendor == "Linux":
-            vendor, vendor_version, dummy = distro.linux_distribution()
-        elif vendor == "Windows":
-            vendor_version = platform.win32_ver()[1]
-        elif vendor == "Darwin":
-            vendor_version = platform.mac_ver()[0]
+            json_result = self.json_codec.loads(body)
+        except Exception:
+            return None
+        return json_result if isinstance(json_result, dict) else None
 
+    def get_user_agent(self) -> str:
+        vendor, vendor_version = _get_platform()
         return "{client_name} ({vendor}; {vendor_version})".format(
             client_name=self.client_name,
             vendor=vendor,
             vendor_version=vendor_version,
         )
 
+
+class Client(BaseClient):
+    session_kwargs = None  # type: Optional[Dict[str, Any]]
+
+    def ensure_session(self) -> None:
+        import requests
+
+        from zulip.transport import RequestsTransport  # noqa: F811
+
+        # Held so that threads making their first requests at once
+        # create the transport only once.
+        with self.session_lock:
+            # Check if the session has been created already, and return
+            # immediately if so.
+            if self.session_kwargs is not None:
+                return
+
+            if self.transport is None:
+                self.transport = RequestsTransport()
+
+            # Credentials and TLS settings are passed with each request,
+            # since the transport may be shared with other clients.
+            self.session_kwargs = dict(
+                auth=requests.auth.HTTPBasicAuth(self.email, self.api_key),
+                verify=self.tls_verification,
+                cert=self.get_client_cert(),
+                headers={"User-agent": self.get_user_agent()},
+            )
+
+    @property
+    def session(self) -> Optional["requests.Session"]:
+        """
+        The requests.Session that requests are made with, e.g. to mount
+        adapters on, or None if the client's transport doesn't use one.
+        It is shared by all the clients using the same transport.
+        """
+        from zulip.transport import RequestsTransport  # noqa: F811
+
+        self.ensure_session()
+        if isinstance(self.transport, RequestsTransport):
+            return self.transport.session
+        return None
+
     def do_api_query(
         self,
         orig_request: Mapping[str, Any],
@@ -544,6 +728,54 @@ class Client:
         files: Optional[List[IO[Any]]] = None,
         timeout: Optional[float] = None,
     ) -> Dict[str, Any]:
+        res = self.send_api_query(
+            orig_request,
+            url,
+            method=method,
+            longpolling=longpolling,
+            files=files,
+            timeout=timeout,
+        )
+        if isinstance(res, dict):
+            return res
+
+        json_result = self._json_or_none(res.content)
+        if json_result is not None:
+            return json_result
+        return {
+            "msg": "Unexpected error from the server",
+            "result": "http-error",
+            "status_code": res.status_code,
+        }
+
+    @staticmethod
+    def _response_size(res: "requests.Response", stream: bool) -> Optional[int]:
+        if not stream:
+            return len(res.content)
+        # Don't download a streamed response just to measure it.
+        content_length = res.headers.get("Content-Length", "")
+        return int(content_length) if content_length.isdigit() else None
+
+    def send_api_query(
+        self,
+        orig_request: Mapping[str, Any],
+        url: str,
+        method: str = "POST",
+        longpolling: bool = False,
+        files: Optional[List[IO[Any]]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> Union["requests.Response", Dict[str, Any]]:
+        """
+        Makes an API request, retrying it as configured, and returns
+        the server's final response; or, if we couldn't get one, an
+        error dictionary like the ones do_api_query returns.
+
+        With stream=True, the response body is not downloaded until
+        it is read, e.g. with response.iter_content().
+        """
+        import requests
+
         if files is None:
             files = []
 
@@ -557,29 +789,44 @@ class Client:
             request_timeout = 15.0 if not timeout else timeout
 
         request = {}
-        req_files = []
 
         for (key, val) in orig_request.items():
             if isinstance(val, str) or isinstance(val, str):
                 request[key] = val
             else:
-                request[key] = json.dumps(val)
+                request[key] = self.json_codec.dumps(val)
+
+        # Files are read from disk while the request is being sent,
+        # rather than all at once.
+        body = None
+        if files:
+            from zulip.uploads import MultipartBody
 
-        for f in files:
-            req_files.append((f.name, f))
+            body = MultipartBody(request, files)
 
         self.ensure_session()
-        assert self.session is not None
+        assert self.transport is not None and self.session_kwargs is not None
 
         query_state = {
             "had_error_retry": False,
             "request": request,
-            "failures": 0,
         }  # type: Dict[str, Any]
-
-        def error_retry(error_string: str) -> bool:
-            if not self.retry_on_errors or query_state["failures"] >= 10:
+        endpoint = url.split(API_VERSTRING, 1)[-1]
+        retry_policy = self.retry_policy.for_endpoint(method, endpoint)
+        retry_state = retry_policy.start()
+        attempt = 0
+
+        def error_retry(
+            error_string: str, status: Optional[int] = None, delay: Optional[float] = None
+        ) -> bool:
+            if not self.retry_on_errors:
+                return False
+            backoff = retry_state.next_delay()
+            if backoff is None:
                 return False
+            if delay is not None:
+                backoff = delay
+            self._call_hooks("on_retry", method, endpoint, attempt, status, backoff)
             if self.verbose:
                 if not query_state["had_error_retry"]:
                     sys.stdout.write(
@@ -593,11 +840,14 @@ class Client:
                 else:
                     sys.stdout.write(".")
                 sys.stdout.flush()
-            query_state["request"]["dont_block"] = json.dumps(True)
-            time.sleep(1)
-            query_state["failures"] += 1
+            query_state["request"]["dont_block"] = self.json_codec.dumps(True)
+            time.sleep(backoff)
             return True
 
+        def request_failed(error: str) -> None:
+            duration = time.monotonic() - started
+            self._call_hooks("on_response", method, endpoint, attempt, None, None, duration, error)
+
         def end_error_retry(succeeded: bool) -> None:
             if query_state["had_error_retry"] and self.verbose:
                 if succeeded:
@@ -606,30 +856,62 @@ class Client:
                     print("Failed!")
 
         while True:
+            attempt += 1
+            started = time.monotonic()
             try:
-                if method == "GET":
-                    kwarg = "params"
+                kwargs = dict(self.session_kwargs)
+                if body is not None:
+                    body.rewind()
+                    kwargs["data"] = body
+                    kwargs["headers"] = dict(kwargs["headers"], **{"Content-Type": body.content_type})
+                elif method == "GET":
+                    kwargs["params"] = query_state["request"]
                 else:
-                    kwarg = "data"
-
-                kwargs = {kwarg: query_state["request"]}
+                    kwargs["data"] = query_state["request"]
 
-                if files:
-                    kwargs["files"] = req_files
+                # Wait our turn if we're about to exceed the rate limit.
+                self.rate_limiter.acquire()
 
                 # Actually make the request!
-                res = self.session.request(
+                self._call_hooks("on_request", method, endpoint, attempt)
+                started = time.monotonic()
+                res = self.transport.request(
                     method,
                     urllib.parse.urljoin(self.base_url, url),
                     timeout=request_timeout,
+                    stream=stream,
                     **kwargs,
                 )
+                self._call_hooks(
+                    "on_response",
+                    method,
+                    endpoint,
+                    attempt,
+                    res.status_code,
+                    self._response_size(res, stream),
+                    time.monotonic() - started,
+                    None,
+                )
 
                 self.has_connected = True
+                self.rate_limiter.update(res.headers)
+
+                # When rate limited, try again once the server's
+                # Retry-After has passed; rate_limiter.acquire() waits
+                # for that, for this and any other requests.
+                if res.status_code == 429:
+                    retry_after = self.rate_limiter.hit_limit(
+                        res.headers, self._json_or_none(res.content)
+                    )
+                    if error_retry(f" (rate limited for {retry_after}s)", 429, delay=0):
+                        # Streamed responses hold their connection until closed.
+                        res.close()
+                        continue
 
-                # On 50x errors, try again after a short sleep
-                if str(res.status_code).startswith("5"):
-                    if error_retry(f" (server {res.status_code})"):
+                # On 50x errors, try again after backing off
+                if retry_policy.is_retryable_status(res.status_code):
+                    if error_retry(f" (server {res.status_code})", res.status_code):
+                        res.close()
                         continue
                     # Otherwise fall through and process the python-requests error normally
             except (requests.exceptions.Timeout, requests.exceptions.SSLError) as e:
@@ -641,6 +923,7 @@ class Client:
                     and str(e) != "The read operation timed out"
                 ):
                     raise UnrecoverableNetworkError("SSL Error")
+                request_failed("timeout")
                 if longpolling:
                     # When longpolling, we expect the timeout to fire,
                     # and the correct response is to just retry
@@ -652,6 +935,7 @@ class Client:
                         "result": "connection-error",
                     }
             except requests.exceptions.ConnectionError:
+                request_failed("connection-error")
                 if not self.has_connected:
                     # If we have never successfully connected to the server, don't
                     # go into retry logic, because the most likely scenario here is
@@ -667,29 +951,15 @@ class Client:
                     "result": "connection-error",
                 }
             except Exception:
+                request_failed("unexpected-error")
                 # We'll split this out into more cases as we encounter new bugs.
                 return {
                     "msg": f"Unexpected error:\n{traceback.format_exc()}",
                     "result": "unexpected-error",
                 }
 
-            try:
-                if requests_json_is_function:
-                    json_result = res.json()
-                else:
-                    json_result = res.json
-            except Exception:
-                json_result = None
-
-            if json_result is not None:
-                end_error_retry(True)
-                return json_result
-            end_error_retry(False)
-            return {
-                "msg": "Unexpected error from the server",
-                "result": "http-error",
-                "status_code": res.status_code,
-            }
+            end_error_retry(not str(res.status_code).startswith("5"))
+            return res
 
     def call_endpoint(
         self,
@@ -707,26 +977,178 @@ class Client:
             if v is not None:
                 marshalled_request[k] = v
         versioned_url = API_VERSTRING + (url if url is not None else "")
-        return self.do_api_query(
-            marshalled_request,
-            versioned_url,
-            method=method,
-            longpolling=longpolling,
-            files=files,
-            timeout=timeout,
+
+        def fetch() -> Dict[str, Any]:
+            return self.do_api_query(
+                marshalled_request,
+                versioned_url,
+                method=method,
+                longpolling=longpolling,
+                files=files,
+                timeout=timeout,
+            )
+
+        if self.cache is not None and method == "GET" and not longpolling:
+            return self.cache.get(
+                url if url is not None else "",
+                marshalled_request,
+                fetch,
+                scope=f"{self.base_url} {self.email}",
+            )
+        return fetch()
+
+    def call_endpoint_streaming(
+        self,
+        url: str,
+        method: str = "GET",
+        request: Optional[Dict[str, Any]] = None,
+        expand: Collection[str] = (),
+        chunk_size: int = 64 * 1024,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Like call_endpoint, but parses the response while it is being
+        downloaded, yielding its (key, value) pairs one at a time
+        rather than returning one dictionary.  Arrays under the keys
+        listed in `expand` are yielded one (key, element) pair per
+        element, so that they never need to be in memory all at once.
+
+        Errors are reported the same way as with call_endpoint: the
+        pairs then make up the usual error dictionary.
+        """
+        if request is None:
+            request = dict()
+        marshalled_request = {k: v for (k, v) in request.items() if v is not None}
+        res = self.send_api_query(
+            marshalled_request, API_VERSTRING + url, method=method, stream=True
         )
+        if isinstance(res, dict):
+            yield from res.items()
+            return
+
+        with contextlib.closing(res):
+            if res.status_code != 200:
+                json_result = self._json_or_none(res.content)
+                if json_result is None:
+                    json_result = {
+                        "msg": "Unexpected error from the server",
+                        "result": "http-error",
+                        "status_code": res.status_code,
+                    }
+                yield from json_result.items()
+                return
+
+            from zulip.streaming import StreamingJSONParser  # noqa: F811
+
+            parser = StreamingJSONParser(res.iter_content(chunk_size), expand=expand)
+            yield from parser.iter_items()
 
     def call_on_each_event(
         self,
         callback: Callable[[Dict[str, Any]], None],
         event_types: Optional[List[str]] = None,
         narrow: Optional[List[List[str]]] = None,
+        workers: int = 0,
+        ordering_key: Optional[Callable[[Dict[str, Any]], Hashable]] = None,
+        max_in_flight: Optional[int] = None,
+        checkpoint: Optional["CheckpointStore"] = None,
+        realm_state: Optional["RealmState"] = None,
         **kwargs: object,
     ) -> None:
+        """
+        Calls `callback` on each event in an event queue registered
+        with the given options; this never returns.
+
+        By default, each batch of events is handled inline before the
+        next one is fetched.  With workers > 0, events are instead
+        handled by a pool of that many threads, while the next batch
+        is fetched.  Events with the same `ordering_key` (by default,
+        events for the same conversation; zulip.sender_key orders by
+        sender instead) are still handled in order.  At most
+        `max_in_flight` events (by default, 10 per worker) are queued
+        at once; beyond that, fetching waits for the workers to catch
+        up.  An exception raised by the callback stops the loop.
+
+        With a `checkpoint` store (e.g. zulip.FileCheckpointStore), the
+        queue ID and the ID of the last event fetched are saved after
+        each batch, and a restarted process resumes reading that queue
+        rather than registering a new one and missing the events sent
+        in between.  A new queue is only registered if the server has
+        garbage-collected the saved one.  Use a separate checkpoint for
+        each set of event types and narrow.  A checkpoint cannot be
+        combined with workers, since events are acknowledged to the
+        server when they are fetched, before the workers handle them.
+
+        With a `realm_state` (a zulip.RealmState), the queue is also
+        registered for the events that keep it up to date; it is loaded
+        from the queue's initial state, and updated with each event
+        before the callback is called.
+        """
         if narrow is None:
             narrow = []
 
+        if checkpoint is not None and workers > 0:
+            # The checkpoint would move past events that are still
+            # queued for a worker, which a crash would then lose.
+            raise ValueError("checkpoint cannot be combined with workers")
+        if realm_state is not None:
+            if checkpoint is not None:
+                # A resumed queue doesn't come with an initial state.
+                raise ValueError("realm_state cannot be combined with checkpoint")
+            if event_types is not None:
+                event_types = event_types + [
+                    event_type
+                    for event_type in realm_state.EVENT_TYPES
+                    if event_type not in event_types
+                ]
+            kwargs.setdefault("include_subscribers", True)
+
+        if workers > 0:
+            from zulip.dispatch import KeyedDispatcher, conversation_key  # noqa: F811
+
+            dispatcher = KeyedDispatcher(
+                callback,
+                workers=workers,
+                key=ordering_key if ordering_key is not None else conversation_key,
+                max_in_flight=max_in_flight,
+            )
+            try:
+                self._call_on_each_event(
+                    dispatcher.submit,
+                    dispatcher.check,
+                    event_types,
+                    narrow,
+                    checkpoint,
+                    realm_state,
+                    kwargs,
+                )
+            finally:
+                dispatcher.close(wait=False)
+        else:
+            self._call_on_each_event(
+                callback, lambda: None, event_types, narrow, checkpoint, realm_state, kwargs
+            )
+
+    def _call_on_each_event(
+        self,
+        callback: Callable[[Dict[str, Any]], None],
+        check: Callable[[], None],
+        event_types: Optional[List[str]],
+        narrow: List[List[str]],
+        checkpoint: Optional["CheckpointStore"],
+        realm_state: Optional["RealmState"],
+        kwargs: Dict[str, object],
+    ) -> None:
+        # The number of consecutive errors, which determines how long
+        # to back off for after the next one.
+        errors = 0
+
+        def back_off() -> None:
+            nonlocal errors
+            errors += 1
+            time.sleep(self.retry_policy.get_delay(errors))
+
         def do_register() -> Tuple[str, int]:
+            nonlocal errors
 
             while True:
                 if event_types is None:
@@ -736,11 +1158,20 @@ class Client:
                 if "error" in res["result"]:
                     if self.verbose:
                         print("Server returned error:\n{}".format(res["msg"]))
-                    time.sleep(1)
+                    back_off()
                 else:
+                    errors = 0
+                    if realm_state is not None:
+                        realm_state.load_initial_state(res)
+                    if checkpoint is not None:
+                        checkpoint.save(res["queue_id"], res["last_event_id"])
                     return (res["queue_id"], res["last_event_id"])
 
         queue_id = None
+        if checkpoint is not None:
+            saved = checkpoint.load()
+            if saved is not None:
+                (queue_id, last_event_id) = saved
         # Make long-polling requests with `get_events`. Once a request
         # has received an answer, pass it to the callback and before
         # making a new long-polling request.
@@ -749,6 +1180,7 @@ class Client:
                 (queue_id, last_event_id) = do_register()
 
             res = self.get_events(queue_id=queue_id, last_event_id=last_event_id)
+            check()
             if "error" in res["result"]:
                 if res["result"] == "http-error":
                     if self.verbose:
@@ -780,22 +1212,79 @@ class Client:
                         queue_id = None
                 # Add a pause here to cover against potential bugs in this library
                 # causing a DoS attack against a server when getting errors.
-                # TODO: Make this back off exponentially.
-                time.sleep(1)
+                # The jitter in the backoff also keeps clients from
+                # reconnecting in lockstep after a server restart.
+                back_off()
                 continue
 
+            errors = 0
             for event in res["events"]:
                 last_event_id = max(last_event_id, int(event["id"]))
+                if self.cache is not None:
+                    self.cache.handle_event(event)
+                if realm_state is not None:
+                    realm_state.apply_event(event)
                 callback(event)
+            if checkpoint is not None and res["events"]:
+                checkpoint.save(queue_id, last_event_id)
 
     def call_on_each_message(
-        self, callback: Callable[[Dict[str, Any]], None], **kwargs: object
+        self,
+        callback: Callable[[Dict[str, Any]], None],
+        workers: int = 0,
+        ordering_key: Optional[Callable[[Dict[str, Any]], Hashable]] = None,
+        max_in_flight: Optional[int] = None,
+        checkpoint: Optional["CheckpointStore"] = None,
+        realm_state: Optional["RealmState"] = None,
+        narrow: Optional[List[List[str]]] = None,
+        message_filter: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        compact: bool = False,
+        **kwargs: object,
     ) -> None:
+        """
+        Calls `callback` on each message received; see
+        call_on_each_event for the meaning of the other arguments.
+        `ordering_key` is given the message event, not the message.
+
+        Only messages matching `narrow` are received, and of those only
+        the ones for which `message_filter` (e.g. a zulip.MessageFilter)
+        returns True are passed to the callback.  If a MessageFilter
+        can be expressed as a narrow, it is also the default narrow, so
+        that the server doesn't send the messages it would discard.
+        Note that a MessageFilter drops private messages unless it was
+        created with include_private=True.
+
+        With compact=True, the callback is given each message as a
+        zulip.Message rather than a dict, which takes several times
+        less memory for callbacks that keep the messages.
+
+        Other keyword arguments are passed on to register.
+        """
+        from zulip.filters import MessageFilter  # noqa: F811
+        from zulip.message import Message  # noqa: F811
+
+        if narrow is None and isinstance(message_filter, MessageFilter):
+            narrow = message_filter.narrow()
+
         def event_callback(event: Dict[str, Any]) -> None:
             if event["type"] == "message":
-                callback(event["message"])
-
-        self.call_on_each_event(event_callback, ["message"], None, **kwargs)
+                message = event["message"]
+                if message_filter is None or message_filter(message):
+                    if compact:
+                        message = Message(message)
+                    callback(message)
+
+        self.call_on_each_event(
+            event_callback,
+            ["message"],
+            narrow,
+            workers=workers,
+            ordering_key=ordering_key,
+            max_in_flight=max_in_flight,
+            checkpoint=checkpoint,
+            realm_state=realm_state,
+            **kwargs,
+        )
 
     def get_messages(self, message_filters: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -803,6 +1292,155 @@ class Client:
         """
         return self.call_endpoint(url="messages", method="GET", request=message_filters)
 
+    def get_messages_streaming(self, message_filters: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """
+        A bounded-memory version of get_messages for fetching large
+        pages of messages: the response's fields are yielded as
+        (key, value) pairs while it is being downloaded, with a
+        separate ("messages", message) pair for each message.
+
+        Example usage:
+
+        >>> for key, value in client.get_messages_streaming(request):
+        ...     if key == "messages":
+        ...         archive(value)
+        ...     elif key == "found_oldest":
+        ...         found_oldest = value
+        """
+        return self.call_endpoint_streaming(
+            url="messages", method="GET", request=message_filters, expand={"messages"}
+        )
+
+    def iter_messages(
+        self,
+        narrow: Optional[List[Any]] = None,
+        direction: str = "older",
+        page_size: int = 1000,
+        prefetch: int = 1,
+        anchor: Union[int, str, None] = None,
+        compact: bool = False,
+        **request: Any,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterates over all messages matching `narrow`, fetching them a
+        page of `page_size` messages at a time.  With direction="older"
+        (the default) messages are yielded newest first, starting from
+        `anchor` (by default the newest message); with direction="newer"
+        they are yielded oldest first.
+
+        While the caller processes one page, the next `prefetch` pages
+        are fetched in a background thread, so that a scan of a long
+        history isn't slowed down by waiting for each round trip.  Set
+        prefetch=0 to fetch each page only when it is needed.
+
+        With compact=True, messages are yielded as zulip.Message objects
+        rather than dicts, for callers that keep many of them in memory.
+
+        Any other keyword arguments are passed on to get_messages, and
+        a failed request raises ZulipError.
+
+        Example usage:
+
+        >>> for message in client.iter_messages([["stream", "devel"]]):
+        ...     archive(message)
+        """
+        if direction not in ("older", "newer"):
+            raise ValueError("direction must be 'older' or 'newer'")
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        if prefetch < 0:
+            raise ValueError("prefetch must not be negative")
+        if narrow is None:
+            narrow = []
+        if anchor is None:
+            anchor = "newest" if direction == "older" else "oldest"
+
+        pages = self._iter_message_pages(narrow, direction, page_size, anchor, compact, request)
+        if prefetch == 0:
+            for page in pages:
+                yield from page
+            return
+
+        # Holds fetched pages, then None once there are no more; or the
+        # exception that stopped the fetching.
+        fetched = queue.Queue(maxsize=prefetch)  # type: queue.Queue[Any]
+        stopped = threading.Event()
+
+        def put(item: Any) -> bool:
+            while not stopped.is_set():
+                try:
+                    fetched.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def fetch_pages() -> None:
+            try:
+                for page in pages:
+                    if not put(page):
+                        return
+            except BaseException as e:
+                put(e)
+            else:
+                put(None)
+
+        thread = threading.Thread(target=fetch_pages, name="zulip-iter-messages", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = fetched.get()
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield from item
+        finally:
+            # Lets the thread exit if the caller stops iterating early.
+            stopped.set()
+
+    def _iter_message_pages(
+        self,
+        narrow: List[Any],
+        direction: str,
+        page_size: int,
+        anchor: Union[int, str],
+        compact: bool,
+        request: Dict[str, Any],
+    ) -> Iterator[List[Any]]:
+        from zulip.message import Message  # noqa: F811
+
+        older = direction == "older"
+        boundary_id = None  # type: Optional[int]
+        while True:
+            result = self.get_messages(
+                dict(
+                    request,
+                    narrow=narrow,
+                    anchor=anchor,
+                    num_before=page_size if older else 0,
+                    num_after=0 if older else page_size,
+                )
+            )
+            if result["result"] != "success":
+                raise ZulipError(result["msg"])
+
+            # Each page after the first is anchored at the last message
+            # of the previous one, which the server includes again.
+            messages = [message for message in result["messages"] if message["id"] != boundary_id]
+            if older:
+                messages.reverse()
+            if messages:
+                if compact:
+                    yield [Message(message) for message in messages]
+                else:
+                    yield messages
+
+            if not messages or result["found_oldest" if older else "found_newest"]:
+                return
+            boundary_id = messages[-1]["id"]
+            anchor = boundary_id
+
     def check_messages_match_narrow(self, **request: Dict[str, Any]) -> Dict[str, Any]:
 
         """
@@ -830,11 +1468,98 @@ class Client:
             request=message_data,
         )
 
+    def send_messages(
+        self, messages: Iterable[Dict[str, Any]], concurrency: int = 4
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Sends a batch of messages using up to `concurrency` parallel
+        requests, and returns an iterator over the send_message()
+        results, in the same order as `messages`.
+
+        Messages to the same conversation (stream and topic, or set
+        of private message recipients) are still sent one at a time,
+        in order, so that they appear in that order in Zulip.
+
+        Sending starts immediately; iterating over the results just
+        waits for them.  For concurrency above 10, share a transport
+        with a larger pool_maxsize, since otherwise extra connections
+        are closed after each request.
+
+        Example usage:
+
+        >>> results = client.send_messages(messages, concurrency=8)
+        >>> [result["id"] for result in results]
+        [101, 102, 103]
+        """
+        import concurrent.futures
+
+        from zulip.bulk import map_concurrently
+
+        messages = list(messages)
+        futures = [
+            concurrent.futures.Future() for message in messages
+        ]  # type: List[concurrent.futures.Future[Dict[str, Any]]]
+
+        conversations = OrderedDict()  # type: Dict[Tuple[Any, ...], List[int]]
+        for index, message in enumerate(messages):
+            conversations.setdefault(_conversation_key(message), []).append(index)
+
+        def send_conversation(indices: List[int]) -> None:
+            for index in indices:
+                if not futures[index].set_running_or_notify_cancel():
+                    continue
+                try:
+                    futures[index].set_result(self.send_message(messages[index]))
+                except BaseException as e:
+                    futures[index].set_exception(e)
+
+        # Each message's result is set on its future as it is sent.
+        map_concurrently(send_conversation, conversations.values(), concurrency)
+
+        return (future.result() for future in futures)
+
     def upload_file(self, file: IO[Any]) -> Dict[str, Any]:
         """
         See examples/upload-file for example usage.
+
+        With an upload_cache, a file whose content was uploaded before
+        isn't uploaded again; the earlier result is returned instead.
+        Files that aren't seekable, e.g. pipes, are always uploaded,
+        since hashing them would consume their content.
+        """
+        if self.upload_cache is None or not file.seekable():
+            return self.call_endpoint(url="user_uploads", files=[file])
+
+        from zulip.uploads import file_digest
+
+        key = f"{self.base_url} {self.email} {file_digest(file)}"
+        return self.upload_cache.get_or_upload(
+            key, lambda: self.call_endpoint(url="user_uploads", files=[file])
+        )
+
+    def upload_files(
+        self, files: Iterable[Union[str, IO[Any]]], concurrency: int = 4
+    ) -> List[Dict[str, Any]]:
+        """
+        Uploads several files, given as paths or as files opened in
+        binary mode, using up to `concurrency` parallel requests, and
+        returns the upload_file() results in the same order.
+
+        Example usage:
+
+        >>> results = client.upload_files(["report.pdf", "chart.png"])
+        >>> [result["uri"] for result in results]
+        ['/user_uploads/2/1a/.../report.pdf', '/user_uploads/2/9f/.../chart.png']
         """
-        return self.call_endpoint(url="user_uploads", files=[file])
+        from zulip.bulk import run_concurrently
+
+        def upload(file: Union[str, IO[Any]]) -> Dict[str, Any]:
+            if isinstance(file, str):
+                with open(file, "rb") as f:
+                    return self.upload_file(f)
+            return self.upload_file(file)
+
+        return run_concurrently(upload, files, concurrency).results
 
     def get_attachments(self) -> Dict[str, Any]:
         """
@@ -867,6 +1592,33 @@ class Client:
         """
         return self.call_endpoint(url="messages/flags", method="POST", request=update_data)
 
+    def bulk_update_message_flags(
+        self,
+        messages: Iterable[int],
+        op: str,
+        flag: str,
+        batch_size: int = 1000,
+        concurrency: int = 4,
+    ) -> "BulkResult[List[int]]":
+        """
+        Adds (op="add") or removes (op="remove") a flag on any number of
+        messages, in requests of up to `batch_size` message IDs, using
+        up to `concurrency` parallel requests.  The result has the
+        update_message_flags result of each batch.
+
+        Example usage:
+
+        >>> client.bulk_update_message_flags(message_ids, "add", "read")
+        <BulkResult: 100 succeeded, 0 failed>
+        """
+        from zulip.bulk import chunked, run_concurrently
+
+        return run_concurrently(
+            lambda batch: self.update_message_flags({"messages": batch, "op": op, "flag": flag}),
+            chunked(messages, batch_size),
+            concurrency,
+        )
+
     def mark_all_as_read(self) -> Dict[str, Any]:
         """
         Example usage:
@@ -932,6 +1684,17 @@ class Client:
             request=reaction_data,
         )
 
+    def bulk_add_reactions(
+        self, reactions: Iterable[Dict[str, Any]], concurrency: int = 4
+    ) -> "BulkResult[Dict[str, Any]]":
+        """
+        Adds many reactions, each given as for add_reaction, using up
+        to `concurrency` parallel requests.
+        """
+        from zulip.bulk import run_concurrently
+
+        return run_concurrently(self.add_reaction, reactions, concurrency)
+
     def remove_reaction(self, reaction_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Example usage:
@@ -1138,6 +1901,36 @@ class Client:
             request=request,
         )
 
+    def register_streaming(
+        self,
+        event_types: Optional[Iterable[str]] = None,
+        narrow: Optional[List[List[str]]] = None,
+        expand: Collection[str] = REGISTER_STREAMING_EXPAND,
+        **kwargs: object,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        A bounded-memory version of register for large realms: the
+        initial state is yielded as (key, value) pairs while it is
+        being downloaded.  The potentially large lists named in
+        `expand` (users, streams and subscriptions by default) are
+        yielded one (key, element) pair per element.
+
+        Example usage:
+
+        >>> for key, value in client.register_streaming(['message']):
+        ...     if key == "realm_users":
+        ...         users_by_id[value["user_id"]] = value
+        ...     elif key == "queue_id":
+        ...         queue_id = value
+        """
+        if narrow is None:
+            narrow = []
+
+        request = dict(event_types=event_types, narrow=narrow, **kwargs)
+        return self.call_endpoint_streaming(
+            url="register", method="POST", request=request, expand=expand
+        )
+
     def deregister(self, queue_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         Example usage:
@@ -1281,6 +2074,22 @@ class Client:
             method="DELETE",
         )
 
+    def bulk_deactivate_users(
+        self, user_ids: Iterable[int], concurrency: int = 4
+    ) -> "BulkResult[int]":
+        """
+        Deactivates many users, using up to `concurrency` parallel
+        requests.
+
+        Example usage:
+
+        >>> client.bulk_deactivate_users([8, 9, 10]).failed
+        [(9, {'result': 'error', 'msg': 'No such user', 'code': 'BAD_REQUEST'})]
+        """
+        from zulip.bulk import run_concurrently
+
+        return run_concurrently(self.deactivate_user_by_id, user_ids, concurrency)
+
     def reactivate_user_by_id(self, user_id: int) -> Dict[str, Any]:
 
         """
@@ -1304,10 +2113,29 @@ class Client:
         """
 
         for key, value in request.items():
-            request[key] = json.dumps(value)
+            request[key] = self.json_codec.dumps(value)
 
         return self.call_endpoint(url=f"users/{user_id}", method="PATCH", request=request)
 
+    def bulk_update_users(
+        self, updates: Iterable[Tuple[int, Dict[str, Any]]], concurrency: int = 4
+    ) -> "BulkResult[Tuple[int, Dict[str, Any]]]":
+        """
+        Updates many users, given as (user_id, changes) pairs with the
+        changes as for update_user_by_id, using up to `concurrency`
+        parallel requests.
+
+        Example usage:
+
+        >>> client.bulk_update_users([(8, {"full_name": "New Name"}), (9, {"role": 400})])
+        <BulkResult: 2 succeeded, 0 failed>
+        """
+        from zulip.bulk import run_concurrently
+
+        return run_concurrently(
+            lambda update: self.update_user_by_id(update[0], **update[1]), updates, concurrency
+        )
+
     def get_users(self, request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         See examples/list-users for example usage.
@@ -1374,6 +2202,35 @@ class Client:
             request=request,
         )
 
+    def bulk_add_subscriptions(
+        self,
+        streams: Iterable[Dict[str, Any]],
+        principals: Iterable[Union[str, int]],
+        batch_size: int = 100,
+        concurrency: int = 4,
+        **kwargs: Any,
+    ) -> "BulkResult[List[Union[str, int]]]":
+        """
+        Subscribes any number of users (emails or user IDs) to the
+        given streams, in requests for up to `batch_size` users, using
+        up to `concurrency` parallel requests.  Other arguments are
+        passed to add_subscriptions, whose result for each batch of
+        users is returned.
+
+        Example usage:
+
+        >>> client.bulk_add_subscriptions([{"name": "onboarding"}], new_user_ids)
+        <BulkResult: 20 succeeded, 0 failed>
+        """
+        from zulip.bulk import chunked, run_concurrently
+
+        streams = list(streams)
+        return run_concurrently(
+            lambda batch: self.add_subscriptions(streams, principals=batch, **kwargs),
+            chunked(principals, batch_size),
+            concurrency,
+        )
+
     def remove_subscriptions(
         self, streams: Iterable[str], principals: Union[Sequence[str], Sequence[int]] = []
     ) -> Dict[str, Any]:
@@ -1387,6 +2244,26 @@ class Client:
             request=request,
         )
 
+    def bulk_remove_subscriptions(
+        self,
+        streams: Iterable[str],
+        principals: Iterable[Union[str, int]],
+        batch_size: int = 100,
+        concurrency: int = 4,
+    ) -> "BulkResult[List[Union[str, int]]]":
+        """
+        Like bulk_add_subscriptions, but unsubscribes the users from the
+        streams, given by name, as remove_subscriptions does.
+        """
+        from zulip.bulk import chunked, run_concurrently
+
+        def remove(batch: List[Union[str, int]]) -> Dict[str, Any]:
+            # The principals are either all emails or all user IDs.
+            return self.remove_subscriptions(names, principals=batch)  # type: ignore[arg-type]
+
+        names = list(streams)
+        return run_concurrently(remove, chunked(principals, batch_size), concurrency)
+
     def get_subscription_status(self, user_id: int, stream_id: int) -> Dict[str, Any]:
         """
         Example usage:
@@ -1654,7 +2531,7 @@ class Client:
         result = self.get_stream_id(new_stream)
         if result["result"] != "success":
             return result
-        new_stream = result["stream_id"]
+        new_stream_id = result["stream_id"]
 
         if message_id is None:
             if propagate_mode != "change_all":
@@ -1662,30 +2539,127 @@ class Client:
                     "A message_id must be provided if " 'propagate_mode isn\'t "change_all"'
                 )
 
-            # ask the server for the latest message ID in the topic.
-            result = self.get_messages(
-                {
-                    "anchor": "newest",
-                    "narrow": [
-                        {"operator": "stream", "operand": stream},
-                        {"operator": "topic", "operand": topic},
-                    ],
-                    "num_before": 1,
-                    "num_after": 0,
-                }
+            latest = self._get_latest_message_id(stream, topic)
+            if isinstance(latest, dict):
+                return latest
+            message_id = latest
+
+        return self._move_messages(
+            message_id, new_stream_id, new_topic, propagate_mode, notify_old_topic, notify_new_topic
+        )
+
+    def move_topics(
+        self,
+        moves: Iterable[Tuple[str, str, str, Optional[str]]],
+        concurrency: int = 4,
+        notify_old_topic: bool = True,
+        notify_new_topic: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Moves many topics at once.  Each move is a tuple of (stream,
+        topic, new_stream, new_topic), where new_topic may be None to
+        keep the topic's name; all messages in the topic are moved.
+
+        Each stream name is only looked up once, and the latest message
+        of each topic is found with one request per source stream,
+        rather than per topic.  The moves themselves are made using up
+        to `concurrency` parallel requests.  Returns the result of each
+        move, in the same order as `moves`.
+
+        Example usage:
+
+        >>> client.move_topics([('stream_a', 'topic_1', 'stream_b', None),
+        ...                     ('stream_a', 'topic_2', 'stream_b', 'new name')])
+        [{'result': 'success', 'msg': ''}, {'result': 'success', 'msg': ''}]
+        """
+        from zulip.bulk import run_concurrently
+        from zulip.dispatch import topic_key
+
+        moves = list(moves)
+        stream_names = list(
+            OrderedDict.fromkeys(name for move in moves for name in (move[0], move[2]))
+        )
+        stream_ids = dict(run_concurrently(self.get_stream_id, stream_names, concurrency))
+
+        source_stream_ids = list(
+            OrderedDict.fromkeys(
+                stream_ids[move[0]]["stream_id"]
+                for move in moves
+                if stream_ids[move[0]]["result"] == "success"
+            )
+        )
+        latest_message_ids = {}  # type: Dict[Tuple[int, str], int]
+        for stream_id, result in run_concurrently(
+            self.get_stream_topics, source_stream_ids, concurrency
+        ):
+            for topic in result.get("topics", []):
+                latest_message_ids[(stream_id, topic_key(topic["name"]))] = topic["max_id"]
+
+        def move_topic(move: Tuple[str, str, str, Optional[str]]) -> Dict[str, Any]:
+            stream, topic, new_stream, new_topic = move
+            for name in (stream, new_stream):
+                if stream_ids[name]["result"] != "success":
+                    return stream_ids[name]
+            stream_id = stream_ids[stream]["stream_id"]
+            message_id = latest_message_ids.get((stream_id, topic_key(topic)))
+            if message_id is None:
+                # Not every topic is listed, e.g. in private streams
+                # with protected history; fall back to looking for it.
+                latest = self._get_latest_message_id(stream_id, topic)
+                if isinstance(latest, dict):
+                    return latest
+                message_id = latest
+            return self._move_messages(
+                message_id,
+                stream_ids[new_stream]["stream_id"],
+                new_topic,
+                "change_all",
+                notify_old_topic,
+                notify_new_topic,
             )
 
-            if result["result"] != "success":
-                return result
+        return run_concurrently(move_topic, moves, concurrency).results
+
+    def _get_latest_message_id(
+        self, stream_id: Union[int, str], topic: str
+    ) -> Union[int, Dict[str, Any]]:
+        """
+        Returns the ID of the latest message in the topic, or an error
+        dictionary.
+        """
+        # ask the server for the latest message ID in the topic.
+        result = self.get_messages(
+            {
+                "anchor": "newest",
+                "narrow": [
+                    {"operator": "stream", "operand": stream_id},
+                    {"operator": "topic", "operand": topic},
+                ],
+                "num_before": 1,
+                "num_after": 0,
+            }
+        )
 
-            if len(result["messages"]) <= 0:
-                return {"result": "error", "msg": f'No messages found in topic: "{topic}"'}
+        if result["result"] != "success":
+            return result
+
+        if len(result["messages"]) <= 0:
+            return {"result": "error", "msg": f'No messages found in topic: "{topic}"'}
 
-            message_id = result["messages"][0]["id"]
+        return result["messages"][0]["id"]
 
+    def _move_messages(
+        self,
+        message_id: int,
+        new_stream_id: int,
+        new_topic: Optional[str],
+        propagate_mode: str,
+        notify_old_topic: bool,
+        notify_new_topic: bool,
+    ) -> Dict[str, Any]:
         # move topic containing message to new stream
         request = {
-            "stream_id": new_stream,
+            "stream_id": new_stream_id,
             "propagate_mode": propagate_mode,
             "topic": new_topic,
             "send_notification_to_old_thread": notify_old_topic,
@@ -1698,23 +2672,65 @@ class Client:
         )
 
 
+def _conversation_key(message: Dict[str, Any]) -> Tuple[Any, ...]:
+    from zulip.dispatch import topic_key
+
+    recipients = message.get("to")
+    if isinstance(recipients, list):
+        if message.get("type") == "private":
+            recipients = sorted(recipients, key=str)
+        recipients = tuple(recipients)
+    topic = message.get("topic", message.get("subject"))
+    if isinstance(topic, str):
+        topic = topic_key(topic)
+    return (message.get("type"), recipients, topic)
+
+
 class ZulipStream:
     """
     A Zulip stream-like object
+
+    By default, each write is sent as a message right away.  With
+    buffered=True, writes are instead collected by a
+    zulip.MessageBuffer, which is passed the `buffer_options`, and sent
+    in the background, combined into a message per `max_lines` lines,
+    `max_chars` characters or `flush_interval` seconds; flush() sends
+    them right away.
     """
 
-    def __init__(self, type: str, to: str, subject: str, **kwargs: Any) -> None:
+    def __init__(
+        self,
+        type: str,
+        to: str,
+        subject: str,
+        buffered: bool = False,
+        buffer_options: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
         self.client = Client(**kwargs)
         self.type = type
         self.to = to
         self.subject = subject
+        self.buffer = None  # type: Optional[MessageBuffer]
+        if buffered:
+            from zulip.buffering import MessageBuffer  # noqa: F811
+
+            self.buffer = MessageBuffer(self.client, **(buffer_options or {}))
 
     def write(self, content: str) -> None:
+        if self.buffer is not None:
+            self.buffer.write(self.type, self.to, self.subject, content)
+            return
         message = {"type": self.type, "to": self.to, "subject": self.subject, "content": content}
         self.client.send_message(message)
 
     def flush(self) -> None:
-        pass
+        if self.buffer is not None:
+            self.buffer.flush()
+
+    def close(self) -> None:
+        if self.buffer is not None:
+            self.buffer.close()
 
 
 def hash_util_decode(string: str) -> str:
@@ -1728,3 +2744,9 @@ def hash_util_decode(string: str) -> str:
     # Acknowledge custom string replacements in zulip/zulip's zerver/lib/url_encoding.py before unquoting.
     # NOTE: urllib.parse.unquote already does .replace('%2E', '.').
     return urllib.parse.unquote(string.replace(".", "%"))
+
+
+# Python 3.6 doesn't support module-level __getattr__.
+if sys.version_info < (3, 7):
+    for name in _LAZY_ATTRIBUTES:
+        __getattr__(name)
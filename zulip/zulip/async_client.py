@@ -0,0 +1,600 @@
+import asyncio
+import inspect
+import io
+import os
+import ssl
+import sys
+import time
+import traceback
+import urllib.parse
+from types import TracebackType
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+
+from zulip import API_VERSTRING, BaseClient, UnrecoverableNetworkError, ZulipError
+
+if TYPE_CHECKING:
+    import aiohttp
+
+EventCallback = Callable[[Dict[str, Any]], Optional[Awaitable[None]]]
+
+
+class AsyncClient(BaseClient):
+    """
+    An asyncio version of zulip.Client.  It accepts the same
+    configuration arguments, and its endpoint methods are coroutines
+    returning the same dictionaries as their zulip.Client counterparts:
+
+    >>> async with zulip.AsyncClient(config_file="~/zuliprc") as client:
+    ...     await client.send_message({"type": "stream", "to": "devel",
+    ...                                "topic": "hello", "content": "Hi!"})
+    {'result': 'success', 'msg': '', 'id': 42}
+
+    Requests are made through a pooled aiohttp.ClientSession; pass
+    `session` to share one connection pool between several clients
+    (credentials are sent per request, so the clients may belong to
+    different users or realms).  A shared session is not closed by
+    AsyncClient.close().
+
+    Requires the `aiohttp` package.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        session: Optional["aiohttp.ClientSession"] = None,
+        connection_limit: int = 100,
+        connection_limit_per_host: int = 0,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        if self.transport is not None:
+            raise ZulipError(
+                "AsyncClient does not use transports; pass an aiohttp `session` instead."
+            )
+        if self.cache is not None:
+            raise ZulipError("AsyncClient does not support response caching.")
+        if self.upload_cache is not None:
+            raise ZulipError("AsyncClient does not support upload caching.")
+        self.session = session
+        self.owns_session = session is None
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.ssl_context = self.build_ssl_context()
+        self.user_agent = None  # type: Optional[str]
+
+    @classmethod
+    def from_client(cls, client: BaseClient, **kwargs: Any) -> "AsyncClient":
+        """
+        An AsyncClient with the same credentials and settings as
+        `client`, e.g. a zulip.Client; `kwargs` are passed to the
+        constructor, e.g. a `session`.
+        """
+        tls_verification = client.tls_verification
+        return cls(
+            email=client.email,
+            api_key=client.api_key,
+            site=client.base_url,
+            client=client.client_name,
+            verbose=client.verbose,
+            retry_on_errors=client.retry_on_errors,
+            insecure=tls_verification is False,
+            cert_bundle=tls_verification if isinstance(tls_verification, str) else None,
+            client_cert=client.client_cert,
+            client_cert_key=client.client_cert_key,
+            rate_limiter=client.rate_limiter,
+            json_codec=client.json_codec,
+            retry_policy=client.retry_policy,
+            request_hooks=client.request_hooks,
+            **kwargs,
+        )
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    def build_ssl_context(self) -> ssl.SSLContext:
+        from zulip.transport import build_ssl_context
+
+        # Like Client, which uses requests' CA bundle and settings.
+        return build_ssl_context(self.tls_verification, self.get_client_cert())
+
+    def ensure_session(self) -> "aiohttp.ClientSession":
+        if self.session is not None:
+            return self.session
+
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            limit_per_host=self.connection_limit_per_host,
+        )
+        self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self) -> None:
+        if self.session is not None and self.owns_session:
+            await self.session.close()
+            self.session = None
+
+    async def do_api_query(
+        self,
+        orig_request: Mapping[str, Any],
+        url: str,
+        method: str = "POST",
+        longpolling: bool = False,
+        files: Optional[List[IO[Any]]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        import aiohttp
+
+        if files is None:
+            files = []
+
+        if longpolling:
+            # See Client.do_api_query for the choice of timeouts.
+            request_timeout = 90.0
+        else:
+            request_timeout = 15.0 if not timeout else timeout
+
+        request = {}
+        for key, val in orig_request.items():
+            if isinstance(val, str):
+                request[key] = val
+            else:
+                request[key] = self.json_codec.dumps(val)
+
+        session = self.ensure_session()
+        if self.user_agent is None:
+            self.user_agent = self.get_user_agent()
+        auth = aiohttp.BasicAuth(self.email, self.api_key)
+        headers = {"User-agent": self.user_agent}
+
+        query_state = {
+            "had_error_retry": False,
+            "request": request,
+        }  # type: Dict[str, Any]
+        endpoint = url.split(API_VERSTRING, 1)[-1]
+        retry_policy = self.retry_policy.for_endpoint(method, endpoint)
+        retry_state = retry_policy.start()
+        attempt = 0
+
+        # Each file is sent from its current position, so remember them
+        # to send the files again from there on retries.
+        uploads = []  # type: List[Tuple[IO[Any], int]]
+        for f in files:
+            if not f.seekable():
+                # Read into memory, so that it can be sent again.
+                name = f.name
+                f = io.BytesIO(f.read())
+                f.name = name
+            uploads.append((f, f.tell()))
+
+        async def error_retry(
+            error_string: str, status: Optional[int] = None, delay: Optional[float] = None
+        ) -> bool:
+            if not self.retry_on_errors:
+                return False
+            backoff = retry_state.next_delay()
+            if backoff is None:
+                return False
+            if delay is not None:
+                backoff = delay
+            self._call_hooks("on_retry", method, endpoint, attempt, status, backoff)
+            if self.verbose:
+                if not query_state["had_error_retry"]:
+                    sys.stdout.write(
+                        "zulip API(%s): connection error%s -- retrying."
+                        % (
+                            url.split(API_VERSTRING, 2)[0],
+                            error_string,
+                        )
+                    )
+                    query_state["had_error_retry"] = True
+                else:
+                    sys.stdout.write(".")
+                sys.stdout.flush()
+            query_state["request"]["dont_block"] = self.json_codec.dumps(True)
+            await asyncio.sleep(backoff)
+            return True
+
+        def request_failed(error: str) -> None:
+            duration = time.monotonic() - started
+            self._call_hooks("on_response", method, endpoint, attempt, None, None, duration, error)
+
+        def end_error_retry(succeeded: bool) -> None:
+            if query_state["had_error_retry"] and self.verbose:
+                if succeeded:
+                    print("Success!")
+                else:
+                    print("Failed!")
+
+        while True:
+            attempt += 1
+            started = time.monotonic()
+            kwargs = {}  # type: Dict[str, Any]
+            if method == "GET":
+                kwargs["params"] = query_state["request"]
+            elif uploads:
+                form = aiohttp.FormData()
+                for key, val in query_state["request"].items():
+                    form.add_field(key, val)
+                for f, start in uploads:
+                    f.seek(start)
+                    form.add_field(f.name, f, filename=os.path.basename(f.name))
+                kwargs["data"] = form
+            else:
+                kwargs["data"] = query_state["request"]
+
+            try:
+                # Wait our turn if we're about to exceed the rate limit.
+                delay = self.rate_limiter.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                # Actually make the request!
+                self._call_hooks("on_request", method, endpoint, attempt)
+                started = time.monotonic()
+                async with session.request(
+                    method,
+                    urllib.parse.urljoin(self.base_url, url),
+                    auth=auth,
+                    headers=headers,
+                    ssl=self.ssl_context,
+                    timeout=aiohttp.ClientTimeout(total=request_timeout),
+                    **kwargs,
+                ) as res:
+                    status_code = res.status
+                    response_headers = res.headers
+                    body = await res.read()
+                self._call_hooks(
+                    "on_response",
+                    method,
+                    endpoint,
+                    attempt,
+                    status_code,
+                    len(body),
+                    time.monotonic() - started,
+                    None,
+                )
+
+                self.has_connected = True
+                self.rate_limiter.update(response_headers)
+
+                # See Client.do_api_query.
+                if status_code == 429:
+                    retry_after = self.rate_limiter.hit_limit(
+                        response_headers, self._json_or_none(body)
+                    )
+                    if await error_retry(f" (rate limited for {retry_after}s)", 429, delay=0):
+                        continue
+
+                # On 50x errors, try again after backing off
+                if retry_policy.is_retryable_status(status_code):
+                    if await error_retry(f" (server {status_code})", status_code):
+                        continue
+                    # Otherwise fall through and process the error normally
+            except asyncio.TimeoutError:
+                request_failed("timeout")
+                if longpolling:
+                    # When longpolling, we expect the timeout to fire,
+                    # and the correct response is to just retry
+                    continue
+                end_error_retry(False)
+                return {
+                    "msg": f"Connection error:\n{traceback.format_exc()}",
+                    "result": "connection-error",
+                }
+            except aiohttp.ClientSSLError:
+                raise UnrecoverableNetworkError("SSL Error")
+            except aiohttp.ClientConnectionError:
+                request_failed("connection-error")
+                if not self.has_connected:
+                    # See Client.do_api_query: most likely the server
+                    # isn't running or the site is wrong.
+                    raise UnrecoverableNetworkError("cannot connect to server " + self.base_url)
+
+                if await error_retry(""):
+                    continue
+                end_error_retry(False)
+                return {
+                    "msg": f"Connection error:\n{traceback.format_exc()}",
+                    "result": "connection-error",
+                }
+            except Exception:
+                request_failed("unexpected-error")
+                return {
+                    "msg": f"Unexpected error:\n{traceback.format_exc()}",
+                    "result": "unexpected-error",
+                }
+
+            json_result = self._json_or_none(body)
+            if json_result is not None:
+                end_error_retry(True)
+                return json_result
+            end_error_retry(False)
+            return {
+                "msg": "Unexpected error from the server",
+                "result": "http-error",
+                "status_code": status_code,
+            }
+
+    async def call_endpoint(
+        self,
+        url: Optional[str] = None,
+        method: str = "POST",
+        request: Optional[Dict[str, Any]] = None,
+        longpolling: bool = False,
+        files: Optional[List[IO[Any]]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        if request is None:
+            request = dict()
+        marshalled_request = {}
+        for k, v in request.items():
+            if v is not None:
+                marshalled_request[k] = v
+        versioned_url = API_VERSTRING + (url if url is not None else "")
+        return await self.do_api_query(
+            marshalled_request,
+            versioned_url,
+            method=method,
+            longpolling=longpolling,
+            files=files,
+            timeout=timeout,
+        )
+
+    async def iter_events(
+        self,
+        event_types: Optional[List[str]] = None,
+        narrow: Optional[List[List[str]]] = None,
+        **kwargs: object,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        An async iterator over the events of an event queue, with the
+        same queue (re)registration behavior as Client.call_on_each_event:
+
+        >>> async for event in client.iter_events(["message"]):
+        ...     print(event)
+        """
+        if narrow is None:
+            narrow = []
+
+        # See Client.call_on_each_event.
+        errors = 0
+
+        async def back_off() -> None:
+            nonlocal errors
+            errors += 1
+            await asyncio.sleep(self.retry_policy.get_delay(errors))
+
+        async def do_register() -> Tuple[str, int]:
+            nonlocal errors
+            while True:
+                if event_types is None:
+                    res = await self.register(None, None, **kwargs)
+                else:
+                    res = await self.register(event_types, narrow, **kwargs)
+                if "error" in res["result"]:
+                    if self.verbose:
+                        print("Server returned error:\n{}".format(res["msg"]))
+                    await back_off()
+                else:
+                    errors = 0
+                    return (res["queue_id"], res["last_event_id"])
+
+        queue_id = None
+        while True:
+            if queue_id is None:
+                queue_id, last_event_id = await do_register()
+
+            res = await self.get_events(queue_id=queue_id, last_event_id=last_event_id)
+            if "error" in res["result"]:
+                if self.verbose:
+                    print("Error fetching events:\n{}".format(res.get("msg")))
+                # As in Client.call_on_each_event, legacy servers only
+                # send the message.
+                if res.get("code") == "BAD_EVENT_QUEUE_ID" or res.get("msg", "").startswith(
+                    "Bad event queue id:"
+                ):
+                    # Our event queue went away; register a new one.
+                    queue_id = None
+                # Same protection against hammering the server as in
+                # Client.call_on_each_event.
+                await back_off()
+                continue
+
+            errors = 0
+            for event in res["events"]:
+                last_event_id = max(last_event_id, int(event["id"]))
+                yield event
+
+    async def call_on_each_event(
+        self,
+        callback: EventCallback,
+        event_types: Optional[List[str]] = None,
+        narrow: Optional[List[List[str]]] = None,
+        **kwargs: object,
+    ) -> None:
+        """
+        Like Client.call_on_each_event; `callback` may be a plain
+        function or a coroutine function.
+        """
+        async for event in self.iter_events(event_types, narrow, **kwargs):
+            result = callback(event)
+            if inspect.isawaitable(result):
+                await result
+
+    async def call_on_each_message(
+        self,
+        callback: EventCallback,
+        narrow: Optional[List[List[str]]] = None,
+        message_filter: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        compact: bool = False,
+        **kwargs: object,
+    ) -> None:
+        """Like Client.call_on_each_message."""
+        from zulip.filters import MessageFilter
+        from zulip.message import Message
+
+        if narrow is None and isinstance(message_filter, MessageFilter):
+            narrow = message_filter.narrow()
+
+        async def event_callback(event: Dict[str, Any]) -> None:
+            if event["type"] == "message":
+                message = event["message"]
+                if message_filter is not None and not message_filter(message):
+                    return
+                if compact:
+                    message = Message(message)
+                result = callback(message)
+                if inspect.isawaitable(result):
+                    await result
+
+        await self.call_on_each_event(event_callback, ["message"], narrow, **kwargs)
+
+    async def get_messages(self, message_filters: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call_endpoint(url="messages", method="GET", request=message_filters)
+
+    async def get_raw_message(self, message_id: int) -> Dict[str, str]:
+        return await self.call_endpoint(url=f"messages/{message_id}", method="GET")
+
+    async def send_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call_endpoint(url="messages", request=message_data)
+
+    async def upload_file(self, file: IO[Any]) -> Dict[str, Any]:
+        return await self.call_endpoint(url="user_uploads", files=[file])
+
+    async def update_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call_endpoint(
+            url="messages/%d" % (message_data["message_id"],),
+            method="PATCH",
+            request=message_data,
+        )
+
+    async def delete_message(self, message_id: int) -> Dict[str, Any]:
+        return await self.call_endpoint(url=f"messages/{message_id}", method="DELETE")
+
+    async def update_message_flags(self, update_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call_endpoint(url="messages/flags", method="POST", request=update_data)
+
+    async def add_reaction(self, reaction_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call_endpoint(
+            url="messages/{}/reactions".format(reaction_data["message_id"]),
+            method="POST",
+            request=reaction_data,
+        )
+
+    async def remove_reaction(self, reaction_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call_endpoint(
+            url="messages/{}/reactions".format(reaction_data["message_id"]),
+            method="DELETE",
+            request=reaction_data,
+        )
+
+    async def render_message(self, request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.call_endpoint(url="messages/render", method="POST", request=request)
+
+    async def set_typing_status(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call_endpoint(url="typing", method="POST", request=request)
+
+    async def get_realm_emoji(self) -> Dict[str, Any]:
+        return await self.call_endpoint(url="realm/emoji", method="GET")
+
+    async def get_server_settings(self) -> Dict[str, Any]:
+        return await self.call_endpoint(url="server_settings", method="GET")
+
+    async def get_events(self, **request: Any) -> Dict[str, Any]:
+        return await self.call_endpoint(
+            url="events",
+            method="GET",
+            longpolling=True,
+            request=request,
+        )
+
+    async def register(
+        self,
+        event_types: Optional[Iterable[str]] = None,
+        narrow: Optional[List[List[str]]] = None,
+        **kwargs: object,
+    ) -> Dict[str, Any]:
+        if narrow is None:
+            narrow = []
+
+        request = dict(event_types=event_types, narrow=narrow, **kwargs)
+        return await self.call_endpoint(url="register", request=request)
+
+    async def deregister(self, queue_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self.call_endpoint(
+            url="events",
+            method="DELETE",
+            request=dict(queue_id=queue_id),
+            timeout=timeout,
+        )
+
+    async def get_profile(self, request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.call_endpoint(url="users/me", method="GET", request=request)
+
+    async def get_streams(self, **request: Any) -> Dict[str, Any]:
+        return await self.call_endpoint(url="streams", method="GET", request=request)
+
+    async def get_stream_id(self, stream: str) -> Dict[str, Any]:
+        stream_encoded = urllib.parse.quote(stream, safe="")
+        return await self.call_endpoint(url=f"get_stream_id?stream={stream_encoded}", method="GET")
+
+    async def get_stream_topics(self, stream_id: int) -> Dict[str, Any]:
+        return await self.call_endpoint(url=f"users/me/{stream_id}/topics", method="GET")
+
+    async def get_user_by_id(self, user_id: int, **request: Any) -> Dict[str, Any]:
+        return await self.call_endpoint(url=f"users/{user_id}", method="GET", request=request)
+
+    async def get_users(self, request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.call_endpoint(url="users", method="GET", request=request)
+
+    async def get_members(self, request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.get_users(request=request)
+
+    async def get_subscriptions(self, request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.call_endpoint(url="users/me/subscriptions", method="GET", request=request)
+
+    async def add_subscriptions(
+        self, streams: Iterable[Dict[str, Any]], **kwargs: Any
+    ) -> Dict[str, Any]:
+        request = dict(subscriptions=streams, **kwargs)
+        return await self.call_endpoint(url="users/me/subscriptions", request=request)
+
+    async def remove_subscriptions(
+        self, streams: Iterable[str], principals: Union[Sequence[str], Sequence[int]] = []
+    ) -> Dict[str, Any]:
+        request = dict(subscriptions=streams, principals=principals)
+        return await self.call_endpoint(
+            url="users/me/subscriptions", method="DELETE", request=request
+        )
+
+    async def update_storage(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call_endpoint(url="bot_storage", method="PUT", request=request)
+
+    async def get_storage(self, request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.call_endpoint(url="bot_storage", method="GET", request=request)
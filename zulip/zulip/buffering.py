@@ -0,0 +1,270 @@
+import collections
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from zulip import Client
+
+# The (type, to, topic) of the messages a piece of text is sent in.
+_Destination = Tuple[str, Any, str]
+_Texts = List[str]
+
+
+class _Chunk:
+    """Text waiting to be sent to one destination, as one message."""
+
+    def __init__(self) -> None:
+        self.parts = []  # type: _Texts
+        self.chars = 0
+        self.lines = 0
+        self.since = time.monotonic()
+        self.writes = 0
+
+    def append(self, text: str) -> None:
+        self.parts.append(text)
+        self.chars += len(text)
+        self.lines += text.count("\n")
+        self.writes += 1
+
+
+_Chunks = Deque[_Chunk]
+_ChunksByDestination = Dict[_Destination, _Chunks]
+
+
+class MessageBuffer:
+    """
+    Coalesces many small pieces of text into few messages, which a
+    background thread sends with `client`.
+
+    Text written to the same stream and topic (or the same private
+    message recipients) is sent as one message once it reaches
+    `max_chars` characters or `max_lines` lines, or `flush_interval`
+    seconds after the first piece was written, whichever is first.
+    Writing never waits for the server.
+
+    At most `max_pending` writes are buffered at once.  Beyond that,
+    write() waits for the background thread to catch up if `overflow`
+    is "block", or discards the text and counts it in `dropped` if it
+    is "drop".  Messages the server rejects are counted in `errors`.
+    """
+
+    def __init__(
+        self,
+        client: "Client",
+        max_chars: int = 5000,
+        max_lines: int = 50,
+        flush_interval: float = 2.0,
+        max_pending: int = 1000,
+        overflow: str = "block",
+    ) -> None:
+        if overflow not in ("block", "drop"):
+            raise ValueError('overflow must be "block" or "drop"')
+        self.client = client
+        self.max_chars = max_chars
+        self.max_lines = max_lines
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.overflow = overflow
+
+        self.condition = threading.Condition()
+        self.chunks = collections.OrderedDict()  # type: _ChunksByDestination
+        self.pending = 0
+        self.sending = 0
+        self.flushing = 0
+        self.closed = False
+        self.dropped = 0
+        self.errors = 0
+        self.thread = None  # type: Optional[threading.Thread]
+
+    def write(self, type: str, to: Any, topic: str, text: str) -> bool:
+        """
+        Buffers `text` to be sent to the given destination; returns
+        False if it was dropped instead.
+        """
+        if isinstance(to, list):
+            to = tuple(to)
+        with self.condition:
+            if self.closed:
+                raise ValueError("write to a closed MessageBuffer")
+            while self.pending >= self.max_pending:
+                if self.overflow == "drop":
+                    self.dropped += 1
+                    return False
+                self.condition.wait()
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="zulip-message-buffer", daemon=True
+                )
+                self.thread.start()
+
+            chunks = self.chunks.setdefault((type, to, topic), collections.deque())
+            if (
+                not chunks
+                or chunks[-1].chars + len(text) > self.max_chars
+                or chunks[-1].lines >= self.max_lines
+            ):
+                chunks.append(_Chunk())
+            chunks[-1].append(text)
+            self.pending += 1
+            self.condition.notify_all()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Sends all buffered text now, waiting up to `timeout` seconds for
+        it to be sent; returns whether it was.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            self.flushing += 1
+            self.condition.notify_all()
+            try:
+                while (self.pending or self.sending) and self.thread is not None:
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+                return True
+            finally:
+                self.flushing -= 1
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Sends the buffered text, and stops the background thread."""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def _next_due(self) -> Tuple[Optional[_Destination], Optional[float]]:
+        # Returns a destination whose first chunk should be sent now,
+        # or else how long until one should be.
+        now = time.monotonic()
+        wait = None  # type: Optional[float]
+        for destination, chunks in self.chunks.items():
+            chunk = chunks[0]
+            if (
+                self.flushing
+                or self.closed
+                or len(chunks) > 1
+                or chunk.chars >= self.max_chars
+                or chunk.lines >= self.max_lines
+                or now - chunk.since >= self.flush_interval
+            ):
+                return destination, None
+            remaining = chunk.since + self.flush_interval - now
+            wait = remaining if wait is None else min(wait, remaining)
+        return None, wait
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while True:
+                    destination, wait = self._next_due()
+                    if destination is not None:
+                        break
+                    if self.closed:
+                        return
+                    self.condition.wait(wait)
+                chunks = self.chunks[destination]
+                chunk = chunks.popleft()
+                if not chunks:
+                    del self.chunks[destination]
+                self.sending += 1
+
+            try:
+                self._send(destination, "".join(chunk.parts))
+            finally:
+                with self.condition:
+                    self.sending -= 1
+                    self.pending -= chunk.writes
+                    self.condition.notify_all()
+
+    def _send(self, destination: _Destination, content: str) -> None:
+        content = content.rstrip("\n")
+        if not content.strip():
+            return
+        type, to, topic = destination
+        message = {
+            "type": type,
+            "to": list(to) if isinstance(to, tuple) else to,
+            "topic": topic,
+            "content": content,
+        }
+        try:
+            result = self.client.send_message(message)
+        except Exception:
+            result = {"result": "error"}
+        if result.get("result") != "success":
+            with self.condition:
+                self.errors += 1
+
+
+class ZulipHandler(logging.Handler):
+    """
+    A logging handler which sends log records as Zulip messages:
+
+    >>> handler = zulip.ZulipHandler(client, to="alerts", topic="backups")
+    >>> logging.getLogger("backups").addHandler(handler)
+
+    Records are formatted and queued, and sent by a background thread
+    so that logging never waits for the server; records logged close
+    together to the same topic are combined into one message.  `topic`
+    may also be a function returning the topic for a record, e.g.
+    `lambda record: record.name`.
+
+    At most `max_pending` records are queued; when the server can't
+    keep up, records beyond that are dropped (and counted in
+    `buffer.dropped`) if `overflow` is "drop", the default, or logging
+    waits if it is "block".  The other keyword arguments are passed to
+    MessageBuffer.  Call close() (logging.shutdown() does it for all
+    handlers) to send the queued records before the program exits.
+
+    Records logged by the background thread itself, e.g. by requests
+    while it sends a message, are ignored: queuing them would make the
+    thread wait for itself if the queue is full and `overflow` is
+    "block", and could otherwise send messages about sending messages
+    without end.
+    """
+
+    def __init__(
+        self,
+        client: "Client",
+        to: Any,
+        topic: Union[str, Callable[[logging.LogRecord], str]] = "logs",
+        type: str = "stream",
+        level: int = logging.NOTSET,
+        max_pending: int = 1000,
+        overflow: str = "drop",
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(level)
+        self.to = to
+        self.topic = topic
+        self.type = type
+        self.buffer = MessageBuffer(client, max_pending=max_pending, overflow=overflow, **kwargs)
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # Checked before Handler.handle takes the handler's lock, which
+        # a thread waiting for the queue to have room holds.
+        if threading.current_thread() is self.buffer.thread:
+            return False
+        return super().handle(record)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            topic = self.topic(record) if callable(self.topic) else self.topic
+            self.buffer.write(self.type, self.to, topic, self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        self.buffer.flush()
+
+    def close(self) -> None:
+        self.buffer.close()
+        super().close()
@@ -0,0 +1,77 @@
+import concurrent.futures
+import itertools
+from typing import Any, Callable, Dict, Generic, Iterable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Splits `items` into lists of at most `size` items."""
+    if size < 1:
+        raise ValueError("batch size must be at least 1")
+    iterator = iter(items)
+    chunk = list(itertools.islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, size))
+
+
+class BulkResult(Generic[T]):
+    """
+    The results of a bulk operation, e.g. Client.bulk_deactivate_users:
+    the API result for each item (or, for operations that send items
+    in batches, for each batch), in the order they were given.
+
+    >>> result = client.bulk_deactivate_users(user_ids)
+    >>> if not result.ok:
+    ...     for user_id, error in result.failed:
+    ...         print(user_id, error["msg"])
+    """
+
+    def __init__(self, items: List[T], results: List[Dict[str, Any]]) -> None:
+        self.items = items
+        self.results = results
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[Tuple[T, Dict[str, Any]]]:
+        return iter(zip(self.items, self.results))
+
+    @property
+    def succeeded(self) -> List[T]:
+        return [item for item, result in self if result.get("result") == "success"]
+
+    @property
+    def failed(self) -> List[Tuple[T, Dict[str, Any]]]:
+        return [(item, result) for item, result in self if result.get("result") != "success"]
+
+    @property
+    def ok(self) -> bool:
+        return all(result.get("result") == "success" for result in self.results)
+
+    def __repr__(self) -> str:
+        return f"<BulkResult: {len(self.succeeded)} succeeded, {len(self.failed)} failed>"
+
+
+def map_concurrently(func: Callable[[T], R], items: Iterable[T], concurrency: int) -> Iterator[R]:
+    """
+    Starts calling `func` on each item, using up to `concurrency`
+    threads, and returns an iterator over the results in order, which
+    waits for each result as it gets to it.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    futures = [executor.submit(func, item) for item in items]
+    executor.shutdown(wait=False)
+    return (future.result() for future in futures)
+
+
+def run_concurrently(
+    func: Callable[[T], Dict[str, Any]], items: Iterable[T], concurrency: int
+) -> BulkResult[T]:
+    """Calls `func` on each item, using up to `concurrency` threads."""
+    items = list(items)
+    return BulkResult(items, list(map_concurrently(func, items, concurrency)))
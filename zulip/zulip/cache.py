@@ -0,0 +1,168 @@
+import concurrent.futures
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+# How long, in seconds, the results of the read-mostly endpoints are
+# cached by default, keyed by endpoint_pattern.
+DEFAULT_TTLS = {
+    "get_stream_id": 300.0,
+    "streams": 60.0,
+    "users": 60.0,
+    "users/{id}": 60.0,
+    "realm/emoji": 300.0,
+    "server_settings": 300.0,
+}
+
+# The cached endpoints whose results may be changed by each type of
+# event; see ResponseCache.handle_event.
+INVALIDATING_EVENTS = {
+    "stream": ["streams", "get_stream_id"],
+    "realm_user": ["users", "users/{id}"],
+    "realm_bot": ["users", "users/{id}"],
+    "realm_emoji": ["realm/emoji"],
+    "realm": ["server_settings"],
+}
+
+# The client's scope, a request's URL, and its parameters encoded as JSON.
+_Key = Tuple[str, str, str]
+
+
+def endpoint_pattern(url: str) -> str:
+    """
+    Returns the endpoint that a request URL below /api/v1/ is for,
+    without its query string, and with numeric path segments (user and
+    message IDs and the like) replaced by {id} and emails by {email};
+    e.g. "users/{id}" for "users/8", or "users/{email}/presence".
+    """
+    path = url.split("?", 1)[0].strip("/")
+    return "/".join(_segment_pattern(segment) for segment in path.split("/"))
+
+
+def _segment_pattern(segment: str) -> str:
+    if segment.isdigit():
+        return "{id}"
+    if "@" in segment:
+        return "{email}"
+    return segment
+
+
+class ResponseCache:
+    """
+    An in-memory cache of the results of GET requests to read-mostly
+    endpoints, for use as the `cache` argument of zulip.Client.
+
+    Results are kept for the TTL configured for their endpoint in
+    `ttls` (DEFAULT_TTLS by default); other endpoints are not cached.
+    At most `max_entries` results are kept, evicting the least
+    recently used ones.  Concurrent identical requests for a result
+    that is not cached yet are coalesced into one request to the
+    server.  Only successful results are cached, and each caller gets
+    its own copy, so callers are free to modify results.  A cache can
+    be shared between clients: results are kept separately for each
+    server and user.
+
+    Since results can become stale before their TTL expires, pass the
+    events you receive from the server to handle_event (the Client
+    does so itself in call_on_each_event), which drops the results
+    that they may have changed.
+    """
+
+    def __init__(self, ttls: Optional[Mapping[str, float]] = None, max_entries: int = 1024) -> None:
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # key -> (expiry time, endpoint, result), least recently used first.
+        self.entries = OrderedDict()  # type: OrderedDict[_Key, Tuple[float, str, Dict[str, Any]]]
+        self.in_flight = {}  # type: Dict[_Key, concurrent.futures.Future[Dict[str, Any]]]
+        # Bumped on each invalidation, so that a request that was in
+        # flight at the time doesn't cache its possibly stale result.
+        self.generations = {}  # type: Dict[str, int]
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(
+        self,
+        url: str,
+        request: Mapping[str, Any],
+        fetch: Callable[[], Dict[str, Any]],
+        scope: str = "",
+    ) -> Dict[str, Any]:
+        """
+        Returns the cached result of the GET request for `url` with
+        `request`, or calls `fetch` to make the request.  Results are
+        only shared between requests with the same `scope`, which
+        identifies the server and the user making the request.
+        """
+        endpoint = endpoint_pattern(url)
+        ttl = self.ttls.get(endpoint)
+        if ttl is None:
+            return fetch()
+
+        key = (scope, url, json.dumps(request, sort_keys=True, default=str))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[2])
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = concurrent.futures.Future()
+                self.in_flight[key] = future
+                generation = self._generation(endpoint)
+                owner = True
+
+        if not owner:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = fetch()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+
+        cached = copy.deepcopy(result)
+        with self.lock:
+            del self.in_flight[key]
+            if result.get("result") == "success" and self._generation(endpoint) == generation:
+                self.entries[key] = (time.monotonic() + ttl, endpoint, cached)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        future.set_result(cached)
+        return result
+
+    def _generation(self, endpoint: str) -> Tuple[int, int]:
+        return (self.generations.get(endpoint, 0), self.generations.get("*", 0))
+
+    def invalidate(self, endpoint: Optional[str] = None) -> None:
+        """
+        Drops the cached results for `endpoint` (e.g. "users/{id}"),
+        or all cached results if it is None.
+        """
+        if endpoint is None:
+            endpoint = "*"
+        with self.lock:
+            self.generations[endpoint] = self.generations.get(endpoint, 0) + 1
+            for key, (expiry, entry_endpoint, result) in list(self.entries.items()):
+                if endpoint in ("*", entry_endpoint):
+                    del self.entries[key]
+
+    def handle_event(self, event: Mapping[str, Any]) -> None:
+        """
+        Drops the cached results that `event`, received from the
+        server's event queue, may have changed.
+        """
+        for endpoint in INVALIDATING_EVENTS.get(event["type"], []):
+            self.invalidate(endpoint)
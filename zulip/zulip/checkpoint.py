@@ -0,0 +1,111 @@
+import abc
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Optional, Tuple
+
+
+class CheckpointStore(abc.ABC):
+    """
+    Remembers the event queue that call_on_each_event is reading from,
+    and how far it has got, so that a restarted process can carry on
+    with the same queue instead of registering a new one.
+
+    Subclasses implement load, save and clear; see FileCheckpointStore
+    and SQLiteCheckpointStore.
+    """
+
+    @abc.abstractmethod
+    def load(self) -> Optional[Tuple[str, int]]:
+        """Returns the saved (queue_id, last_event_id), if any."""
+
+    @abc.abstractmethod
+    def save(self, queue_id: str, last_event_id: int) -> None:
+        ...
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class FileCheckpointStore(CheckpointStore):
+    """
+    Stores the checkpoint as a small JSON file, which is replaced
+    atomically on each save.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.abspath(os.path.expanduser(path))
+
+    def load(self) -> Optional[Tuple[str, int]]:
+        try:
+            with open(self.path) as f:
+                checkpoint = json.load(f)
+            return (checkpoint["queue_id"], int(checkpoint["last_event_id"]))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            # A corrupt checkpoint just means registering a new queue.
+            return None
+
+    def save(self, queue_id: str, last_event_id: int) -> None:
+        directory = os.path.dirname(self.path)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".zulip-checkpoint-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"queue_id": queue_id, "last_event_id": last_event_id}, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def clear(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """
+    Stores checkpoints in an SQLite database, which can be shared by
+    several bots; each one uses its own `name`.
+    """
+
+    def __init__(self, path: str, name: str = "default") -> None:
+        self.name = name
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            os.path.expanduser(path), isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS zulip_checkpoints "
+            "(name TEXT PRIMARY KEY, queue_id TEXT NOT NULL, last_event_id INTEGER NOT NULL)"
+        )
+
+    def load(self) -> Optional[Tuple[str, int]]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT queue_id, last_event_id FROM zulip_checkpoints WHERE name = ?",
+                (self.name,),
+            ).fetchone()
+        if row is None:
+            return None
+        return (row[0], row[1])
+
+    def save(self, queue_id: str, last_event_id: int) -> None:
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO zulip_checkpoints (name, queue_id, last_event_id) "
+                "VALUES (?, ?, ?)",
+                (self.name, queue_id, last_event_id),
+            )
+
+    def clear(self) -> None:
+        with self.lock:
+            self.connection.execute("DELETE FROM zulip_checkpoints WHERE name = ?", (self.name,))
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,128 @@
+import collections
+import concurrent.futures
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def topic_key(topic: str) -> str:
+    """
+    The key to compare topic names by: topics that only differ in case
+    are the same topic.
+    """
+    return topic.casefold()
+
+
+def conversation_key(event: Dict[str, Any]) -> Hashable:
+    """
+    Orders message events by conversation: messages to the same stream
+    and topic, or to the same set of private message recipients, are
+    handled in order.  Other events are ordered by their type.
+    """
+    if event["type"] != "message":
+        return ("event", event["type"])
+    message = event["message"]
+    if message["type"] == "stream":
+        return (
+            "stream",
+            message.get("stream_id", message["display_recipient"]),
+            topic_key(message["subject"]),
+        )
+    return ("private", tuple(sorted(recipient["id"] for recipient in message["display_recipient"])))
+
+
+def sender_key(event: Dict[str, Any]) -> Hashable:
+    """
+    Orders message events by sender; other events by their type.
+    """
+    if event["type"] != "message":
+        return ("event", event["type"])
+    return ("sender", event["message"]["sender_id"])
+
+
+class KeyedDispatcher:
+    """
+    Runs an event callback on a pool of `workers` threads.
+
+    Events with the same ordering key (by default, those in the same
+    conversation) are handled one at a time, in the order they were
+    submitted; events with different keys are handled concurrently.
+    At most `max_in_flight` events may be queued or running at once;
+    beyond that, submit() blocks until a worker catches up.
+
+    If the callback raises an exception, it is re-raised by the next
+    call to submit(), check() or close(), so that errors stop the
+    event loop just as they do when the callback is run inline.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Dict[str, Any]], None],
+        workers: int = 4,
+        key: Callable[[Dict[str, Any]], Hashable] = conversation_key,
+        max_in_flight: Optional[int] = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if max_in_flight is None:
+            max_in_flight = 10 * workers
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self.callback = callback
+        self.key = key
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="zulip-dispatch"
+        )
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        # The events waiting to be handled, for each key that a worker
+        # is currently handling events for.
+        self.waiting = {}  # type: Dict[Hashable, collections.deque[Dict[str, Any]]]
+        self.error = None  # type: Optional[BaseException]
+
+    def submit(self, event: Dict[str, Any]) -> None:
+        self.check()
+        key = self.key(event)
+        self.in_flight.acquire()
+        with self.lock:
+            if key in self.waiting:
+                self.waiting[key].append(event)
+                return
+            self.waiting[key] = collections.deque([event])
+        self.executor.submit(self.run, key)
+
+    def run(self, key: Hashable) -> None:
+        while True:
+            with self.lock:
+                events = self.waiting[key]
+                if not events:
+                    del self.waiting[key]
+                    return
+                event = events.popleft()
+            try:
+                self.callback(event)
+            except BaseException as e:
+                with self.lock:
+                    if self.error is None:
+                        self.error = e
+            finally:
+                self.in_flight.release()
+
+    def check(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stops accepting events.  With wait=True, waits for all
+        submitted events to be handled first.
+        """
+        if not wait:
+            with self.lock:
+                for events in self.waiting.values():
+                    for event in events:
+                        self.in_flight.release()
+                    events.clear()
+        self.executor.shutdown(wait=wait)
+        if wait:
+            self.check()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# zulip-export -- Archives the history of a narrow as compressed JSON lines.
+
+import argparse
+import concurrent.futures
+import gzip
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import zulip
+
+logging.basicConfig()
+
+log = logging.getLogger("zulip-export")
+
+_Range = Dict[str, Any]
+
+
+class Export:
+    """
+    Exports the messages matching `narrow` to `path`, as gzipped JSON
+    lines in message ID order, using get_messages with anchor-based
+    pagination.
+
+    Progress is saved to a small JSON state file (by default `path`
+    with ".state" appended) after each page, so that an interrupted
+    export resumes where it stopped; once complete, running it again
+    appends only the messages sent since.  Each page is written as a
+    separate gzip member, which gzip readers decompress as one stream,
+    so that a page left half-written by an interruption can be cut off.
+
+    With jobs > 1, the range of message IDs is split into that many
+    parts, fetched concurrently into separate files, which are joined
+    once they are all complete.
+    """
+
+    def __init__(
+        self,
+        client: zulip.Client,
+        path: str,
+        narrow: Optional[List[Any]] = None,
+        jobs: int = 1,
+        page_size: int = 1000,
+        state_path: Optional[str] = None,
+    ) -> None:
+        if jobs < 1:
+            raise ValueError("jobs must be at least 1")
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        self.client = client
+        self.path = path
+        self.narrow = narrow if narrow is not None else []
+        self.jobs = jobs
+        self.page_size = page_size
+        self.state_path = state_path if state_path is not None else path + ".state"
+        self.lock = threading.Lock()
+        self.ranges = []  # type: List[_Range]
+        self.exported = 0
+
+    def run(self) -> int:
+        """Runs the export, and returns the number of messages exported."""
+        self.ranges = self._load_ranges()
+        pending = [export_range for export_range in self.ranges if not export_range["done"]]
+        if len(pending) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                for future in [executor.submit(self._export_range, r) for r in pending]:
+                    future.result()
+        else:
+            for export_range in pending:
+                self._export_range(export_range)
+        self._join_ranges()
+        return self.exported
+
+    def _load_ranges(self) -> List[_Range]:
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = None
+        if state is not None:
+            if state["narrow"] != self.narrow:
+                raise zulip.ZulipError(
+                    f"{self.state_path} is for a different narrow: {state['narrow']}"
+                )
+            for export_range in state["ranges"]:
+                # Resuming writes after the saved offset, which would
+                # leave a gap of zeros in a missing or truncated file.
+                path = export_range["path"]
+                if export_range["offset"] > (os.path.getsize(path) if os.path.exists(path) else 0):
+                    raise zulip.ZulipError(
+                        f"{path} is missing or shorter than saved in {self.state_path};"
+                        " remove the state file to export everything again"
+                    )
+            log.info("Continuing the export saved in %s", self.state_path)
+            return state["ranges"]
+
+        if os.path.exists(self.path):
+            raise zulip.ZulipError(f"{self.path} already exists, without a state file")
+        ranges = [self._new_range(self.path, 0, None)]
+        if self.jobs > 1:
+            bounds = self._get_id_bounds()
+            if bounds is not None:
+                first_id, last_id = bounds
+                size = max(-(-(last_id - first_id + 1) // self.jobs), self.page_size)
+                starts = list(range(first_id, last_id + 1, size))
+                ranges = [
+                    self._new_range(
+                        self.path if i == 0 else f"{self.path}.part{i}",
+                        start,
+                        starts[i + 1] - 1 if i + 1 < len(starts) else None,
+                    )
+                    for i, start in enumerate(starts)
+                ]
+        self._save_state(ranges)
+        return ranges
+
+    @staticmethod
+    def _new_range(path: str, start: int, end: Optional[int]) -> _Range:
+        # `start` is the ID to fetch from next; `offset` is the size of
+        # the file up to the last complete page.
+        return {"path": path, "start": start, "end": end, "offset": 0, "done": False}
+
+    def _get_id_bounds(self) -> Optional[Tuple[int, int]]:
+        oldest = self._get_messages("oldest", 0, 1)["messages"]
+        newest = self._get_messages("newest", 1, 0)["messages"]
+        if not oldest or not newest:
+            return None
+        return (oldest[0]["id"], newest[-1]["id"])
+
+    def _get_messages(self, anchor: Any, num_before: int, num_after: int) -> Dict[str, Any]:
+        result = self.client.get_messages(
+            {
+                "narrow": self.narrow,
+                "anchor": anchor,
+                "num_before": num_before,
+                "num_after": num_after,
+            }
+        )
+        if result["result"] != "success":
+            raise zulip.ZulipError(result["msg"])
+        return result
+
+    def _export_range(self, export_range: _Range) -> None:
+        end = export_range["end"]
+        mode = "r+b" if os.path.exists(export_range["path"]) else "wb"
+        with open(export_range["path"], mode) as f:
+            # Drops anything written after the last saved page.
+            f.truncate(export_range["offset"])
+            f.seek(export_range["offset"])
+            while True:
+                result = self._get_messages(export_range["start"], 0, self.page_size)
+                messages = result["messages"]
+                if end is not None:
+                    messages = [message for message in messages if message["id"] <= end]
+                if messages:
+                    lines = "".join(
+                        json.dumps(message, ensure_ascii=False) + "\n" for message in messages
+                    )
+                    f.write(gzip.compress(lines.encode(), compresslevel=6))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                with self.lock:
+                    self.exported += len(messages)
+                    if messages:
+                        export_range["start"] = messages[-1]["id"] + 1
+                    export_range["offset"] = f.tell()
+                    export_range["done"] = (
+                        not messages
+                        or result["found_newest"]
+                        or (end is not None and export_range["start"] > end)
+                    )
+                    self._save_state(self.ranges)
+                if export_range["done"]:
+                    log.info("Exported the messages up to %s", export_range["start"] - 1)
+                    return
+
+    def _join_ranges(self) -> None:
+        if len(self.ranges) > 1:
+            # Each part ends with complete gzip members, so joining them
+            # is a plain concatenation; it starts over from the first
+            # part's saved size, in case it was interrupted before.
+            with open(self.path, "r+b") as f:
+                f.truncate(self.ranges[0]["offset"])
+                f.seek(0, os.SEEK_END)
+                for export_range in self.ranges[1:]:
+                    with open(export_range["path"], "rb") as part:
+                        remaining = export_range["offset"]
+                        while remaining:
+                            chunk = part.read(min(remaining, 1 << 20))
+                            f.write(chunk)
+                            remaining -= len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+                offset = f.tell()
+        else:
+            offset = self.ranges[0]["offset"]
+
+        # Later runs carry on from the newest message exported.
+        start = max(export_range["start"] for export_range in self.ranges)
+        part_paths = [export_range["path"] for export_range in self.ranges[1:]]
+        self.ranges = [dict(self._new_range(self.path, start, None), offset=offset)]
+        self._save_state(self.ranges)
+        for part_path in part_paths:
+            os.unlink(part_path)
+
+    def _save_state(self, ranges: List[_Range]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".zulip-export-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"narrow": self.narrow, "ranges": ranges}, f)
+            os.replace(temp_path, self.state_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def main() -> int:
+    usage = """zulip-export [options] --output FILE
+
+    Exports the messages matching a narrow, oldest first, to a gzipped
+    file with one JSON-encoded message per line.  An interrupted export
+    resumes when run again with the same options, and running it again
+    after it has completed adds the messages sent since.
+
+    Examples: zulip-export --stream devel --output devel.jsonl.gz
+              zulip-export --narrow '[["sender", "iago@example.com"]]' --output iago.jsonl.gz
+
+    Specify your Zulip API credentials and server in a ~/.zuliprc file or using the options.
+    """
+
+    parser = zulip.add_default_arguments(argparse.ArgumentParser(usage=usage))
+    parser.add_argument("-o", "--output", required=True, help="The file to export to.")
+    parser.add_argument("-s", "--stream", help="Export the messages in this stream.")
+    parser.add_argument("-S", "--subject", help="Export the messages with this topic.")
+    parser.add_argument("--narrow", help="A narrow, as JSON, to export the messages of.")
+    parser.add_argument(
+        "--state", help="The file to save the progress to (default: the output file + .state)."
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Split the history into this many parts, exported concurrently.",
+    )
+    parser.add_argument("--page-size", type=int, default=1000)
+
+    options = parser.parse_args()
+
+    if options.verbose:
+        logging.getLogger().setLevel(logging.INFO)
+    narrow = []  # type: List[Any]
+    if options.narrow:
+        try:
+            narrow = json.loads(options.narrow)
+        except ValueError:
+            parser.error("--narrow must be valid JSON.")
+    if options.stream:
+        narrow.append(["stream", options.stream])
+    if options.subject:
+        narrow.append(["topic", options.subject])
+    if options.jobs < 1 or options.page_size < 1:
+        parser.error("--jobs and --page-size must be at least 1.")
+
+    client = zulip.init_from_options(options)
+    export = Export(client, options.output, narrow, options.jobs, options.page_size, options.state)
+    try:
+        exported = export.run()
+    except zulip.ZulipError as e:
+        log.error("Export failed, run again to resume: %s", e)
+        return 1
+    log.info("Exported %d messages to %s", exported, options.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
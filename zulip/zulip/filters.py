@@ -0,0 +1,100 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Union
+
+_Names = FrozenSet[str]
+_IDs = FrozenSet[int]
+
+
+class MessageFilter:
+    """
+    Selects the messages to handle, for call_on_each_message:
+
+    >>> message_filter = zulip.MessageFilter(
+    ...     streams=["bridges"], topics=["irc"], exclude_senders=[client.email]
+    ... )
+    >>> client.call_on_each_message(callback, message_filter=message_filter)
+
+    Stream messages must be sent to one of `streams` (names or IDs)
+    and have one of `topics`, if given; like on the server, stream
+    names and topics are compared case-insensitively.  Messages sent by
+    any of `exclude_senders` (emails or user IDs), e.g. the bot itself,
+    are never selected.
+
+    Private messages are only selected if `include_private` is true,
+    since that prevents narrowing.  It is false by default, even for
+    filters without `streams` or `topics`: a filter that only excludes
+    senders then selects stream messages only, so pass
+    include_private=True to also handle private messages.
+
+    When a filter can be expressed as a narrow (a single stream and
+    at most one topic, without private messages), call_on_each_message
+    also registers its event queue with that narrow, so that the
+    server only sends the selected messages; see narrow().
+    """
+
+    def __init__(
+        self,
+        streams: Optional[Iterable[Union[str, int]]] = None,
+        topics: Optional[Iterable[str]] = None,
+        exclude_senders: Iterable[Union[str, int]] = (),
+        include_private: bool = False,
+    ) -> None:
+        self.streams = list(streams) if streams is not None else None
+        self.topics = list(topics) if topics is not None else None
+        self.include_private = include_private
+
+        # Compiled into sets once, since a filter is checked against
+        # every message a bot receives.
+        self.stream_names = None  # type: Optional[_Names]
+        self.stream_ids = frozenset()  # type: _IDs
+        if self.streams is not None:
+            self.stream_names = frozenset(
+                stream.casefold() for stream in self.streams if isinstance(stream, str)
+            )
+            self.stream_ids = frozenset(
+                stream for stream in self.streams if isinstance(stream, int)
+            )
+        self.topic_names = (
+            frozenset(topic.casefold() for topic in self.topics)
+            if self.topics is not None
+            else None
+        )
+        self.excluded_emails = frozenset(
+            sender.casefold() for sender in exclude_senders if isinstance(sender, str)
+        )
+        self.excluded_ids = frozenset(
+            sender for sender in exclude_senders if isinstance(sender, int)
+        )
+
+    def __call__(self, message: Dict[str, Any]) -> bool:
+        if self.excluded_ids and message.get("sender_id") in self.excluded_ids:
+            return False
+        if self.excluded_emails and message["sender_email"].casefold() in self.excluded_emails:
+            return False
+        if message["type"] != "stream":
+            return self.include_private
+        if self.stream_names is not None and (
+            message["display_recipient"].casefold() not in self.stream_names
+            and message.get("stream_id") not in self.stream_ids
+        ):
+            return False
+        if self.topic_names is not None and message["subject"].casefold() not in self.topic_names:
+            return False
+        return True
+
+    def narrow(self) -> List[List[str]]:
+        """
+        A narrow for the server to select the messages with, which may
+        also select some messages this filter doesn't (e.g. from the
+        excluded senders), or [] if there is none.
+        """
+        if self.include_private or self.streams is None or len(self.streams) != 1:
+            return []
+        stream = self.streams[0]
+        if not isinstance(stream, str):
+            return []
+        narrow = [["stream", stream]]
+        if self.topics is not None:
+            if len(self.topics) != 1:
+                return narrow
+            narrow.append(["topic", self.topics[0]])
+        return narrow
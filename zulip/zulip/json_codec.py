@@ -0,0 +1,78 @@
+import functools
+import json
+from typing import Any, Union
+
+
+class JSONCodec:
+    """
+    How zulip.Client encodes request parameters and decodes responses.
+
+    This default implementation uses the standard library's json
+    module; get_default_json_codec() picks a faster codec when one is
+    installed.  To use your own, subclass this and pass an instance as
+    the `json_codec` argument of zulip.Client.
+    """
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self.orjson = orjson
+        self.options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return self.orjson.dumps(obj, option=self.options).decode()
+        except TypeError:
+            # orjson is stricter than json about what it serializes
+            # (e.g. integers beyond 64 bits).
+            return json.dumps(obj)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self.orjson.loads(data)
+
+
+class UjsonCodec(JSONCodec):
+    name = "ujson"
+
+    def __init__(self) -> None:
+        import ujson
+
+        self.ujson = ujson
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return self.ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+        except (TypeError, OverflowError):
+            return json.dumps(obj)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self.ujson.loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def get_default_json_codec() -> JSONCodec:
+    """
+    Returns the fastest available codec: orjson if it is installed,
+    and the standard library otherwise.
+
+    ujson is not picked automatically, since on current versions of
+    CPython it decodes Zulip's responses more slowly than the standard
+    library does (see benchmarks/bench_json_codec.py); pass a
+    UjsonCodec explicitly if it is faster in your environment.
+    """
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        return JSONCodec()
@@ -0,0 +1,226 @@
+import bisect
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from zulip.cache import endpoint_pattern
+
+# The upper bounds, in seconds, of the request latency histogram
+# buckets.  They go up to 90s, the timeout for long-polling requests.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 90.0)
+
+# (method, endpoint)
+_Key = Tuple[str, str]
+
+
+class RequestHooks:
+    """
+    Callbacks run around each HTTP request a Client makes, for
+    instrumentation; pass instances in the `request_hooks` argument of
+    zulip.Client or zulip.AsyncClient, and override the methods you
+    need.
+
+    `endpoint` is the request's path below /api/v1/, e.g. "messages"
+    or "users/8", and `attempt` counts the attempts at the request,
+    starting from 1.  Hooks are called from whichever thread made the
+    request, so implementations must be thread-safe; exceptions they
+    raise are logged and otherwise ignored.
+    """
+
+    def on_request(self, method: str, endpoint: str, attempt: int) -> None:
+        """Called just before a request is sent."""
+
+    def on_response(
+        self,
+        method: str,
+        endpoint: str,
+        attempt: int,
+        status: Optional[int],
+        response_bytes: Optional[int],
+        duration: float,
+        error: Optional[str],
+    ) -> None:
+        """
+        Called once a request has finished, with the HTTP status and
+        size of the response body, and how many seconds the request
+        took.  If no response was received, `status` is None and
+        `error` is "timeout", "connection-error" or "unexpected-error".
+        The size of a streamed response is only known if the server
+        sent a Content-Length header.
+        """
+
+    def on_retry(
+        self, method: str, endpoint: str, attempt: int, status: Optional[int], delay: float
+    ) -> None:
+        """
+        Called when the request is about to be retried after `attempt`
+        failed with the HTTP status `status` (None for a connection
+        error), `delay` seconds from now.
+        """
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        # counts[i] is the number of observations in (buckets[i - 1],
+        # buckets[i]]; the last one counts those above all buckets.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class MetricsCollector(RequestHooks):
+    """
+    RequestHooks that keep, per endpoint and method, counters of
+    requests by status, of retries and of response bytes, and a
+    histogram of request latencies.  Endpoints are named by
+    zulip.cache.endpoint_pattern, which replaces IDs and emails in them
+    by {id} and {email}, so that e.g. all requests for users/{id} are
+    counted together, and the labels don't identify users.
+
+    >>> metrics = zulip.MetricsCollector()
+    >>> client = zulip.Client(request_hooks=[metrics])
+    >>> print(metrics.to_prometheus())
+
+    One collector can be shared by several clients.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = sorted(buckets)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            # (method, endpoint, status or error) -> count
+            self.requests = {}  # type: Dict[Tuple[str, str, str], int]
+            # (method, endpoint, status or "connection-error") -> count
+            self.retries = {}  # type: Dict[Tuple[str, str, str], int]
+            self.response_bytes = {}  # type: Dict[_Key, int]
+            self.durations = {}  # type: Dict[_Key, _Histogram]
+
+    def on_response(
+        self,
+        method: str,
+        endpoint: str,
+        attempt: int,
+        status: Optional[int],
+        response_bytes: Optional[int],
+        duration: float,
+        error: Optional[str],
+    ) -> None:
+        key = (method, endpoint_pattern(endpoint))
+        outcome = str(status) if status is not None else str(error)
+        with self.lock:
+            self.requests[key + (outcome,)] = self.requests.get(key + (outcome,), 0) + 1
+            if response_bytes is not None:
+                self.response_bytes[key] = self.response_bytes.get(key, 0) + response_bytes
+            histogram = self.durations.get(key)
+            if histogram is None:
+                histogram = self.durations[key] = _Histogram(self.buckets)
+            histogram.counts[bisect.bisect_left(self.buckets, duration)] += 1
+            histogram.sum += duration
+            histogram.count += 1
+
+    def on_retry(
+        self, method: str, endpoint: str, attempt: int, status: Optional[int], delay: float
+    ) -> None:
+        reason = str(status) if status is not None else "connection-error"
+        key = (method, endpoint_pattern(endpoint), reason)
+        with self.lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the metrics keyed by "METHOD endpoint", e.g.
+
+        {"GET users/{id}": {"requests": {"200": 3, "timeout": 1},
+                            "retries": {"connection-error": 1},
+                            "response_bytes": 1203,
+                            "duration": {"count": 4, "sum": 15.3,
+                                         "buckets": {0.005: 0, ...}}}}
+
+        where the duration buckets are cumulative, as in Prometheus.
+        """
+        result = {}  # type: Dict[str, Dict[str, Any]]
+
+        def entry(method: str, endpoint: str) -> Dict[str, Any]:
+            name = f"{method} {endpoint}"
+            if name not in result:
+                result[name] = {"requests": {}, "retries": {}, "response_bytes": 0}
+            return result[name]
+
+        with self.lock:
+            for (method, endpoint, outcome), count in self.requests.items():
+                entry(method, endpoint)["requests"][outcome] = count
+            for (method, endpoint, reason), count in self.retries.items():
+                entry(method, endpoint)["retries"][reason] = count
+            for (method, endpoint), size in self.response_bytes.items():
+                entry(method, endpoint)["response_bytes"] = size
+            for (method, endpoint), histogram in self.durations.items():
+                entry(method, endpoint)["duration"] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(zip(self.buckets, self._cumulative(histogram))),
+                }
+        return result
+
+    def to_prometheus(self, prefix: str = "zulip_client") -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format,
+        e.g. to be served on a /metrics endpoint.
+        """
+        lines = []
+        with self.lock:
+            lines += [
+                f"# HELP {prefix}_requests_total Requests made, by HTTP status or error.",
+                f"# TYPE {prefix}_requests_total counter",
+            ]
+            for (method, endpoint, outcome), count in sorted(self.requests.items()):
+                labels = _labels(method=method, endpoint=endpoint, status=outcome)
+                lines.append(f"{prefix}_requests_total{{{labels}}} {count}")
+
+            lines += [
+                f"# HELP {prefix}_retries_total Requests retried, by HTTP status or error.",
+                f"# TYPE {prefix}_retries_total counter",
+            ]
+            for (method, endpoint, reason), count in sorted(self.retries.items()):
+                labels = _labels(method=method, endpoint=endpoint, reason=reason)
+                lines.append(f"{prefix}_retries_total{{{labels}}} {count}")
+
+            lines += [
+                f"# HELP {prefix}_response_bytes_total Size of the response bodies received.",
+                f"# TYPE {prefix}_response_bytes_total counter",
+            ]
+            for (method, endpoint), size in sorted(self.response_bytes.items()):
+                labels = _labels(method=method, endpoint=endpoint)
+                lines.append(f"{prefix}_response_bytes_total{{{labels}}} {size}")
+
+            name = f"{prefix}_request_duration_seconds"
+            lines += [
+                f"# HELP {name} How long requests took.",
+                f"# TYPE {name} histogram",
+            ]
+            for (method, endpoint), histogram in sorted(self.durations.items()):
+                labels = _labels(method=method, endpoint=endpoint)
+                bounds = [repr(float(bound)) for bound in self.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, self._cumulative(histogram)):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _cumulative(histogram: _Histogram) -> Sequence[int]:
+        total = 0
+        counts = []
+        for count in histogram.counts:
+            total += count
+            counts.append(total)
+        return counts
@@ -0,0 +1,157 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from zulip import BaseClient
+from zulip.async_client import AsyncClient, EventCallback
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# Starts one client's event loop, once the shared session exists.
+_Loop = Callable[[], Awaitable[None]]
+_Loops = List[_Loop]
+_Session = Optional["aiohttp.ClientSession"]
+
+
+class EventMultiplexer:
+    """
+    Runs the event loops of many clients, e.g. one per bot, possibly
+    on different realms, in a single thread:
+
+    >>> multiplexer = zulip.EventMultiplexer()
+    >>> for path in zuliprcs:
+    ...     bot = zulip.Client(config_file=path)
+    ...     multiplexer.add_message_callback(bot, make_handler(bot))
+    >>> multiplexer.run()
+
+    Each client's long-polling get_events requests wait in one asyncio
+    event loop, on one aiohttp connection pool, rather than each in a
+    thread or process of its own.  Clients are registered, and their
+    queues re-registered, as with Client.call_on_each_event.
+
+    Callbacks may be plain functions or coroutine functions.  Plain
+    callbacks run in the event loop, so they should not block for
+    long; one that does, e.g. by calling a zulip.Client method, holds
+    up all the other clients' events meanwhile.  An exception raised
+    by any callback stops all the loops, and is raised by run().
+
+    Requires the `aiohttp` package.
+    """
+
+    def __init__(self, connection_limit: int = 0) -> None:
+        # Every long-poll holds a connection, so by default there is
+        # no limit on the number of connections.
+        self.connection_limit = connection_limit
+        self.loops = []  # type: _Loops
+        # The clients using the shared session while running.
+        self.sharing_clients = []  # type: List[AsyncClient]
+        self.session = None  # type: _Session
+        self.tasks = None  # type: Optional[List[asyncio.Future[None]]]
+        self.stopped = None  # type: Optional[asyncio.Future[None]]
+
+    def _add(
+        self, client: BaseClient, loop: Callable[[AsyncClient], Awaitable[None]]
+    ) -> AsyncClient:
+        async_client = (
+            client if isinstance(client, AsyncClient) else AsyncClient.from_client(client)
+        )
+
+        async def run_loop() -> None:
+            if async_client.session is None:
+                async_client.session = self.session
+                async_client.owns_session = False
+                self.sharing_clients.append(async_client)
+            await loop(async_client)
+
+        self.loops.append(run_loop)
+        if self.tasks is not None:
+            # Added by a callback while running.
+            self._start(run_loop)
+        return async_client
+
+    def _start(self, loop: _Loop) -> None:
+        assert self.tasks is not None and self.stopped is not None
+        stopped = self.stopped
+
+        def done(task: "asyncio.Future[None]") -> None:
+            # Event loops only end by raising an exception.
+            if not task.cancelled() and not stopped.done():
+                stopped.set_exception(task.exception() or RuntimeError("event loop ended"))
+
+        task = asyncio.ensure_future(loop())
+        task.add_done_callback(done)
+        self.tasks.append(task)
+
+    def add_event_callback(
+        self,
+        client: BaseClient,
+        callback: EventCallback,
+        event_types: Optional[List[str]] = None,
+        narrow: Optional[List[List[str]]] = None,
+        **kwargs: object,
+    ) -> AsyncClient:
+        """
+        Calls `callback` on each event of a queue registered by
+        `client` (a zulip.Client or zulip.AsyncClient); the other
+        arguments are those of call_on_each_event.  Returns the
+        AsyncClient used, whose methods callbacks can await.
+        """
+        return self._add(
+            client,
+            lambda async_client: async_client.call_on_each_event(
+                callback, event_types, narrow, **kwargs
+            ),
+        )
+
+    def add_message_callback(
+        self,
+        client: BaseClient,
+        callback: EventCallback,
+        narrow: Optional[List[List[str]]] = None,
+        message_filter: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        compact: bool = False,
+        **kwargs: object,
+    ) -> AsyncClient:
+        """Like add_event_callback, but as call_on_each_message."""
+        return self._add(
+            client,
+            lambda async_client: async_client.call_on_each_message(
+                callback, narrow, message_filter, compact, **kwargs
+            ),
+        )
+
+    async def run_async(self) -> None:
+        """Runs all the event loops until a callback raises an exception."""
+        import aiohttp
+
+        if not self.loops:
+            return
+        connector = aiohttp.TCPConnector(limit=self.connection_limit)
+        self.session = aiohttp.ClientSession(connector=connector)
+        self.stopped = asyncio.get_event_loop().create_future()
+        self.tasks = []
+        for loop in self.loops:
+            self._start(loop)
+        try:
+            await self.stopped
+        finally:
+            tasks = self.tasks
+            self.tasks = None
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.session.close()
+            self.session = None
+            for client in self.sharing_clients:
+                client.session = None
+                client.owns_session = True
+            self.sharing_clients = []
+
+    def run(self) -> None:
+        """Runs all the event loops in a new asyncio event loop."""
+        # Like asyncio.run, which needs Python 3.7.
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.run_async())
+        finally:
+            loop.close()
@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Any, Mapping, Optional
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    A client-side token bucket that paces requests to stay within the
+    rate limit the Zulip server advertises.
+
+    The server reports the limit in the X-RateLimit-Limit,
+    X-RateLimit-Remaining and X-RateLimit-Reset (a UNIX timestamp)
+    headers of every response.  From those we learn how many requests
+    are left and how fast the budget refills, and delay requests that
+    would otherwise exceed it.  When the server does answer 429, we
+    hold back all requests until its Retry-After has passed.
+
+    Until a response with rate limit headers has been seen, requests
+    are never delayed.  A RateLimiter is thread-safe; since Zulip's
+    limits are per user, it can be shared by all Clients using the
+    same credentials.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.capacity = None  # type: Optional[float]
+        self.tokens = 0.0
+        self.refill_rate = 0.0  # tokens per second
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if self.capacity is not None:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate
+            )
+        self.updated_at = now
+
+    def reserve(self) -> float:
+        """
+        Takes a token for one request, and returns how many seconds the
+        caller must wait before sending it.
+        """
+        with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.blocked_until - now)
+            if self.capacity is None:
+                return delay
+
+            self._refill(now)
+            # Tokens may go negative; later callers then wait for the
+            # requests reserved before them to be paid back.
+            self.tokens -= 1
+            if self.tokens < 0:
+                if self.refill_rate > 0:
+                    delay = max(delay, -self.tokens / self.refill_rate)
+                else:
+                    delay = max(delay, 1.0)
+            return delay
+
+    def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def update(self, headers: Mapping[str, Any]) -> None:
+        """
+        Updates the budget from the rate limit headers of a response.
+        """
+        limit = _parse_float(headers.get("X-RateLimit-Limit"))
+        remaining = _parse_float(headers.get("X-RateLimit-Remaining"))
+        reset = _parse_float(headers.get("X-RateLimit-Reset"))
+        if limit is None or remaining is None:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            # The server's count is authoritative: it also counts the
+            # requests of other clients with the same credentials, and
+            # lets us catch up once the budget has refilled.
+            self.tokens = remaining
+            self.capacity = limit
+            if reset is not None:
+                time_to_reset = reset - time.time()
+                if time_to_reset > 0 and limit > remaining:
+                    self.refill_rate = (limit - remaining) / time_to_reset
+
+    def hit_limit(
+        self, headers: Mapping[str, Any], body: Optional[Mapping[str, Any]] = None
+    ) -> float:
+        """
+        Handles a 429 response: blocks requests until the server's
+        Retry-After has passed, and returns that delay in seconds.
+        """
+        retry_after = _parse_float(headers.get("Retry-After"))
+        if retry_after is None and body is not None and "retry-after" in body:
+            retry_after = _parse_float(str(body["retry-after"]))
+        if retry_after is None:
+            retry_after = 1.0
+
+        self.update(headers)
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+        return retry_after
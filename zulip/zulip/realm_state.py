@@ -0,0 +1,226 @@
+import threading
+from typing import AbstractSet, Any, Dict, Iterable, Mapping, Optional, Set
+
+
+class RealmState:
+    """
+    A local copy of a realm's users, streams, subscriptions and custom
+    emoji, kept up to date from the event queue, so that looking them
+    up doesn't need a round trip to the server.
+
+    The easiest way to use one is to pass it as the `realm_state`
+    argument of call_on_each_event or call_on_each_message, which
+    registers for the events it needs and loads the initial state:
+
+    >>> state = zulip.RealmState()
+    >>> def handle(message):
+    ...     sender = state.get_user_by_id(message["sender_id"])
+    >>> client.call_on_each_message(handle, realm_state=state)
+
+    To use it with your own event loop, register for EVENT_TYPES with
+    include_subscribers=True, pass the result to load_initial_state,
+    and pass each event to apply_event.
+
+    All lookups take constant time.  The returned dictionaries and
+    sets are shared with the RealmState, so don't modify them.
+    """
+
+    EVENT_TYPES = ["realm_user", "stream", "subscription", "realm_emoji"]
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self.users_by_id = {}  # type: Dict[int, Dict[str, Any]]
+        self.users_by_email = {}  # type: Dict[str, Dict[str, Any]]
+        self.streams_by_id = {}  # type: Dict[int, Dict[str, Any]]
+        self.streams_by_name = {}  # type: Dict[str, Dict[str, Any]]
+        # The streams we're subscribed to, with our subscription settings.
+        self.subscriptions = {}  # type: Dict[int, Dict[str, Any]]
+        self.subscribers = {}  # type: Dict[int, Set[int]]
+        self.emoji_by_name = {}  # type: Dict[str, Dict[str, Any]]
+
+    def load_initial_state(self, state: Mapping[str, Any]) -> None:
+        """
+        Replaces the state with the initial state returned by register.
+        """
+        with self.lock:
+            self._clear()
+            for key in ("realm_users", "realm_non_active_users", "cross_realm_bots"):
+                for user in state.get(key, []):
+                    self._add_user(user)
+            for stream in state.get("streams", []):
+                self._add_stream(stream)
+            for key in ("subscriptions", "unsubscribed", "never_subscribed"):
+                for subscription in state.get(key, []):
+                    stream_id = subscription["stream_id"]
+                    if stream_id not in self.streams_by_id:
+                        self._add_stream(subscription)
+                    if "subscribers" in subscription:
+                        self.subscribers[stream_id] = set(subscription["subscribers"])
+                    if key == "subscriptions":
+                        self.subscriptions[stream_id] = subscription
+            self._set_emoji(state.get("realm_emoji", {}))
+
+    def apply_event(self, event: Mapping[str, Any]) -> None:
+        """
+        Updates the state for an event from the event queue; events of
+        other types than EVENT_TYPES are ignored.
+        """
+        handler = {
+            "realm_user": self._apply_realm_user,
+            "stream": self._apply_stream,
+            "subscription": self._apply_subscription,
+            "realm_emoji": self._apply_realm_emoji,
+        }.get(event["type"])
+        if handler is not None:
+            with self.lock:
+                handler(event)
+
+    def get_user_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return self.users_by_id.get(user_id)
+
+    def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return self.users_by_email.get(email.lower())
+
+    def get_stream_by_id(self, stream_id: int) -> Optional[Dict[str, Any]]:
+        return self.streams_by_id.get(stream_id)
+
+    def get_stream_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.streams_by_name.get(name.lower())
+
+    def get_stream_id(self, name: str) -> Optional[int]:
+        stream = self.get_stream_by_name(name)
+        return None if stream is None else stream["stream_id"]
+
+    def get_subscribers(self, stream_id: int) -> AbstractSet[int]:
+        """
+        The IDs of the users subscribed to the stream, as far as we
+        can see them.
+        """
+        return self.subscribers.get(stream_id, frozenset())
+
+    def is_subscribed(self, stream_id: int) -> bool:
+        return stream_id in self.subscriptions
+
+    def get_emoji_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.emoji_by_name.get(name)
+
+    def _add_user(self, user: Dict[str, Any]) -> None:
+        self._remove_user_email(user["user_id"])
+        self.users_by_id[user["user_id"]] = user
+        self.users_by_email[user["email"].lower()] = user
+
+    def _remove_user_email(self, user_id: int) -> None:
+        old_user = self.users_by_id.get(user_id)
+        if old_user is not None:
+            self.users_by_email.pop(old_user["email"].lower(), None)
+
+    def _apply_realm_user(self, event: Mapping[str, Any]) -> None:
+        person = event["person"]
+        user_id = person["user_id"]
+        if event["op"] == "add":
+            self._add_user(dict(person))
+        elif event["op"] == "remove":
+            # Deactivated users are still around, e.g. as senders of
+            # old messages.
+            user = self.users_by_id.get(user_id)
+            if user is not None:
+                user["is_active"] = False
+        elif event["op"] == "update":
+            user = self.users_by_id.get(user_id)
+            if user is None:
+                return
+            if "new_email" in person:
+                self._remove_user_email(user_id)
+                user["email"] = person["new_email"]
+                self.users_by_email[user["email"].lower()] = user
+            for key, value in person.items():
+                if key not in ("user_id", "new_email", "custom_profile_field"):
+                    user[key] = value
+
+    def _add_stream(self, stream: Mapping[str, Any]) -> None:
+        # Subscriptions carry the stream's properties too, but keep
+        # the stream dictionaries free of per-user settings.
+        stream = {key: value for key, value in stream.items() if key != "subscribers"}
+        self._remove_stream_name(stream["stream_id"])
+        self.streams_by_id[stream["stream_id"]] = stream
+        self.streams_by_name[stream["name"].lower()] = stream
+
+    def _remove_stream_name(self, stream_id: int) -> None:
+        old_stream = self.streams_by_id.get(stream_id)
+        if old_stream is not None:
+            self.streams_by_name.pop(old_stream["name"].lower(), None)
+
+    def _apply_stream(self, event: Mapping[str, Any]) -> None:
+        if event["op"] == "create":
+            for stream in event["streams"]:
+                self._add_stream(stream)
+        elif event["op"] == "delete":
+            for stream in event["streams"]:
+                stream_id = stream["stream_id"]
+                self._remove_stream_name(stream_id)
+                self.streams_by_id.pop(stream_id, None)
+                self.subscriptions.pop(stream_id, None)
+                self.subscribers.pop(stream_id, None)
+        elif event["op"] == "update":
+            stream_id = event["stream_id"]
+            stream = self.streams_by_id.get(stream_id)
+            if stream is None:
+                return
+            if event["property"] == "name":
+                self._remove_stream_name(stream_id)
+                self.streams_by_name[event["value"].lower()] = stream
+            for properties in (stream, self.subscriptions.get(stream_id, {})):
+                properties[event["property"]] = event["value"]
+                # Updates to e.g. the description come with the
+                # rendered version too.
+                if "rendered_description" in event:
+                    properties["rendered_description"] = event["rendered_description"]
+
+    def _apply_subscription(self, event: Mapping[str, Any]) -> None:
+        op = event["op"]
+        if op == "add":
+            for subscription in event["subscriptions"]:
+                stream_id = subscription["stream_id"]
+                if stream_id not in self.streams_by_id:
+                    self._add_stream(subscription)
+                self.subscriptions[stream_id] = subscription
+                if "subscribers" in subscription:
+                    self.subscribers[stream_id] = set(subscription["subscribers"])
+        elif op == "remove":
+            for subscription in event["subscriptions"]:
+                self.subscriptions.pop(subscription["stream_id"], None)
+        elif op == "update":
+            subscription = self.subscriptions.get(event["stream_id"])
+            if subscription is not None:
+                subscription[event["property"]] = event["value"]
+        elif op in ("peer_add", "peer_remove"):
+            for stream_id in self._event_ids(event, "stream_id"):
+                subscribers = self._mutable_subscribers(stream_id)
+                for user_id in self._event_ids(event, "user_id"):
+                    if op == "peer_add":
+                        subscribers.add(user_id)
+                    else:
+                        subscribers.discard(user_id)
+
+    def _mutable_subscribers(self, stream_id: int) -> Set[int]:
+        return self.subscribers.setdefault(stream_id, set())
+
+    @staticmethod
+    def _event_ids(event: Mapping[str, Any], key: str) -> Iterable[int]:
+        # Servers before Zulip 4.0 send one stream_id and user_id per
+        # peer_add/peer_remove event; newer ones send lists.
+        if key + "s" in event:
+            return event[key + "s"]
+        return [event[key]]
+
+    def _set_emoji(self, realm_emoji: Mapping[str, Dict[str, Any]]) -> None:
+        self.emoji_by_name = {
+            emoji["name"]: emoji for emoji in realm_emoji.values() if not emoji.get("deactivated")
+        }
+
+    def _apply_realm_emoji(self, event: Mapping[str, Any]) -> None:
+        if event["op"] == "update":
+            self._set_emoji(event["realm_emoji"])
@@ -0,0 +1,101 @@
+import fnmatch
+import random
+import time
+from typing import Collection, Mapping, Optional
+
+
+class RetryPolicy:
+    """
+    Decides whether, and after how long, a Client retries a failed
+    request (a connection error or a retryable HTTP status), and how
+    long its event loop waits before fetching events again after an
+    error.
+
+    The n-th retry waits initial_delay * multiplier ** (n - 1) seconds,
+    capped at max_delay, and then reduced by a random fraction of up to
+    `jitter` of that, so that many clients that failed at the same time
+    (e.g. because the server restarted) don't all retry in lockstep.
+    A request is given up on after `max_retries` retries, or once
+    retrying would take it past `deadline` seconds from its first
+    attempt.
+
+    `endpoint_overrides` maps endpoint patterns to the policy to use
+    for matching requests instead.  Patterns are fnmatch patterns for
+    the endpoint's path, optionally preceded by the HTTP method, e.g.
+    {"POST messages": RetryPolicy(max_retries=0)} to never resend a
+    message, or {"users/*": RetryPolicy(deadline=5)}.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 10,
+        initial_delay: float = 0.5,
+        max_delay: float = 10.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.5,
+        deadline: Optional[float] = None,
+        retry_statuses: Optional[Collection[int]] = None,
+        endpoint_overrides: Optional[Mapping[str, "RetryPolicy"]] = None,
+    ) -> None:
+        if not 0 <= jitter <= 1:
+            raise ValueError("jitter must be between 0 and 1")
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        # By default, retry all 5xx errors.
+        self.retry_statuses = retry_statuses
+        self.endpoint_overrides = endpoint_overrides if endpoint_overrides is not None else {}
+
+    def for_endpoint(self, method: str, path: str) -> "RetryPolicy":
+        for pattern, policy in self.endpoint_overrides.items():
+            if fnmatch.fnmatchcase(path, pattern) or fnmatch.fnmatchcase(
+                f"{method} {path}", pattern
+            ):
+                return policy
+        return self
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        if self.retry_statuses is None:
+            return 500 <= status_code < 600
+        return status_code in self.retry_statuses
+
+    def get_delay(self, retry_number: int) -> float:
+        """Returns how long to wait before the given (1-based) retry."""
+        try:
+            delay = min(self.initial_delay * self.multiplier ** (retry_number - 1), self.max_delay)
+        except OverflowError:
+            # The event loops count errors without limit, so after
+            # enough of them the power no longer fits in a float.
+            delay = self.max_delay
+        return delay * (1 - self.jitter * random.random())
+
+    def start(self) -> "RetryState":
+        return RetryState(self)
+
+
+class RetryState:
+    """
+    Tracks the retries of one request under a RetryPolicy.
+    """
+
+    def __init__(self, policy: RetryPolicy) -> None:
+        self.policy = policy
+        self.retries = 0
+        self.started_at = time.monotonic()
+
+    def next_delay(self) -> Optional[float]:
+        """
+        Returns how long to wait before retrying, or None if the
+        request should not be retried again.
+        """
+        if self.retries >= self.policy.max_retries:
+            return None
+        delay = self.policy.get_delay(self.retries + 1)
+        deadline = self.policy.deadline
+        if deadline is not None and time.monotonic() + delay - self.started_at > deadline:
+            return None
+        self.retries += 1
+        return delay
@@ -0,0 +1,117 @@
+import codecs
+import json
+from typing import Any, Collection, Iterable, Iterator, Tuple
+
+# Characters that may follow a complete number inside an object or
+# array; see StreamingJSONParser.decode_value.
+_NUMBER_TERMINATORS = frozenset(" \t\n\r,]}")
+_WHITESPACE = frozenset(" \t\n\r")
+
+
+class StreamingJSONParser:
+    """
+    Incrementally parses a JSON object arriving in chunks of bytes,
+    such as a large API response being downloaded.
+
+    iter_items() yields the object's (key, value) pairs as soon as each
+    value is complete.  The values of keys listed in `expand` that are
+    arrays are not yielded whole; instead each element is yielded as
+    its own (key, element) pair.  Only the element being parsed and
+    the not yet parsed part of the current chunk are held in memory,
+    so peak memory is independent of the size of the response.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], expand: Collection[str] = ()) -> None:
+        self.chunks = iter(chunks)
+        self.expand = expand
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def read_more(self) -> bool:
+        if self.exhausted:
+            return False
+        # Drop what we have already parsed, so that memory use stays
+        # proportional to the value currently being parsed.
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer += self.text_decoder.decode(chunk)
+                return True
+        self.buffer += self.text_decoder.decode(b"", final=True)
+        self.exhausted = True
+        return False
+
+    def peek(self) -> str:
+        """Skips whitespace, and returns the next character."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                raise ValueError("Unexpected end of JSON input")
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if character not in characters:
+            raise ValueError(
+                f"Expected one of {characters!r} but found {character!r} in JSON input"
+            )
+        self.pos += 1
+        return character
+
+    def decode_value(self) -> Any:
+        self.peek()
+        wanted = 0
+        while True:
+            if len(self.buffer) - self.pos >= wanted or self.exhausted:
+                try:
+                    value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                except json.JSONDecodeError:
+                    if self.exhausted:
+                        raise
+                else:
+                    # Strings, arrays, objects and literals only parse
+                    # once complete, but a number may have been cut
+                    # short (e.g. 12 of 123, or 1.5 of 1.5e3) unless a
+                    # separator follows it.
+                    if (
+                        self.exhausted
+                        or isinstance(value, bool)
+                        or not isinstance(value, (int, float))
+                        or (end < len(self.buffer) and self.buffer[end] in _NUMBER_TERMINATORS)
+                    ):
+                        self.pos = end
+                        return value
+                # Wait for the pending text to double before trying
+                # again, so that large values are parsed in linear time.
+                wanted = 2 * (len(self.buffer) - self.pos)
+            self.read_more()
+
+    def iter_items(self) -> Iterator[Tuple[str, Any]]:
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            if not isinstance(key, str):
+                raise ValueError("Expected a string key in JSON object")
+            self.expect(":")
+            if key in self.expand and self.peek() == "[":
+                self.pos += 1
+                if self.peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield (key, self.decode_value())
+                        if self.expect(",]") == "]":
+                            break
+            else:
+                yield (key, self.decode_value())
+            if self.expect(",}") == "}":
+                return
@@ -0,0 +1,707 @@
+import base64
+import collections
+import email.parser
+import io
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import requests
+
+import zulip
+
+API_PREFIX = "/api/v1/"
+
+# (HTTP status, JSON response); a status of None drops the connection.
+_Response = Tuple[Optional[int], Dict[str, Any]]
+# (method, endpoint) -> the response to a request to a ScriptedTransport.
+_Respond = Callable[[str, str], requests.Response]
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Queue:
+    def __init__(
+        self,
+        queue_id: str,
+        user: Dict[str, Any],
+        event_types: Optional[List[str]],
+        narrow: List[Tuple[str, Any]],
+    ) -> None:
+        self.queue_id = queue_id
+        self.user = user
+        self.event_types = event_types
+        self.narrow = narrow
+        self.events = []  # type: List[Dict[str, Any]]
+        self.next_event_id = 0
+        self.last_access = time.monotonic()
+
+    def wants(self, event_type: str) -> bool:
+        return self.event_types is None or event_type in self.event_types
+
+    def push(self, event: Dict[str, Any]) -> None:
+        event = dict(event, id=self.next_event_id)
+        self.next_event_id += 1
+        self.events.append(event)
+
+    def prune(self, last_event_id: int) -> None:
+        # As on a real server, fetching events acknowledges all events
+        # up to last_event_id, which are then dropped.
+        self.events = [event for event in self.events if event["id"] > last_event_id]
+
+
+class _InjectedError:
+    def __init__(self, count: int, status: Optional[int], endpoint: Optional[str]) -> None:
+        self.count = count
+        self.status = status
+        self.endpoint = endpoint
+
+
+class FakeZulipServer:
+    """
+    A local HTTP server implementing the core of the Zulip API, for
+    integration tests and reproducible benchmarks of clients, bots and
+    bridges without a Zulip deployment:
+
+    >>> with FakeZulipServer(latency=0.02) as server:
+    ...     client = server.make_client("bot@example.com")
+    ...     client.send_message({"type": "stream", "to": "general",
+    ...                          "topic": "test", "content": "hi"})
+
+    It implements register, events (long-polling, with heartbeats
+    every `heartbeat_interval` seconds and queues that expire after
+    `queue_timeout` idle seconds), sending and fetching messages,
+    user_uploads, bot_storage, users/me and get_stream_id.  Any email
+    and API key are accepted; users are created as they first make a
+    request, and all users are subscribed to all streams.  Narrows
+    support the stream, topic, sender and is:private operators.
+
+    latency: seconds to wait before answering each request, or a
+        function returning that, e.g. to draw it from a distribution.
+    error_rate: the fraction of requests answered with `error_status`
+        instead, chosen using a random number generator seeded with
+        `seed`; a status of None drops the connection instead.
+
+    See also inject_errors, to make specific requests fail.  The
+    server runs in background threads from start() until stop(); all
+    its state is in memory and can be inspected, e.g. `messages`.
+    """
+
+    def __init__(
+        self,
+        latency: Union[float, Callable[[], float]] = 0.0,
+        error_rate: float = 0.0,
+        error_status: Optional[int] = 500,
+        heartbeat_interval: float = 60.0,
+        queue_timeout: float = 600.0,
+        streams: Sequence[str] = ("general",),
+        seed: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.heartbeat_interval = heartbeat_interval
+        self.queue_timeout = queue_timeout
+        self.random = random.Random(seed)
+
+        # Guards all the state below, and is notified on new events.
+        self.condition = threading.Condition()
+        self.users = {}  # type: Dict[str, Dict[str, Any]]
+        self.streams = {}  # type: Dict[int, Dict[str, Any]]
+        self.messages = []  # type: List[Dict[str, Any]]
+        self.queues = {}  # type: Dict[str, _Queue]
+        self.storage = {}  # type: Dict[int, Dict[str, str]]
+        self.uploads = {}  # type: Dict[str, bytes]
+        self.injected_errors = []  # type: List[_InjectedError]
+        # (method, endpoint) -> number of requests, for benchmarks.
+        self.request_counts = {}  # type: Dict[Tuple[str, str], int]
+        self.stopped = False
+        for name in streams:
+            self.add_stream(name)
+
+        self.httpd = _ThreadingHTTPServer((host, port), self._make_handler())
+        self.thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> "FakeZulipServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeZulipServer":
+        return self.start()
+
+    def __exit__(self, *args: object) -> None:
+        self.stop()
+
+    def make_client(self, email: str, **kwargs: Any) -> "zulip.Client":
+        """A zulip.Client for the given user of this server."""
+        return zulip.Client(email=email, api_key="key", site=self.url, **kwargs)
+
+    def write_zuliprc(self, path: str, email: str) -> None:
+        """Writes a zuliprc for the given user, e.g. for bots and bridges."""
+        with open(path, "w") as f:
+            f.write(f"[api]\nemail={email}\nkey=key\nsite={self.url}\n")
+
+    def add_user(self, email: str, full_name: Optional[str] = None) -> Dict[str, Any]:
+        with self.condition:
+            user = self.users.get(email.lower())
+            if user is None:
+                user = {
+                    "user_id": len(self.users) + 1,
+                    "email": email,
+                    "full_name": full_name or email.split("@")[0],
+                    "is_active": True,
+                    "is_bot": False,
+                }
+                self.users[email.lower()] = user
+                self._send_event(
+                    {"type": "realm_user", "op": "add", "person": dict(user)}, lambda queue: True
+                )
+            return user
+
+    def add_stream(self, name: str) -> Dict[str, Any]:
+        with self.condition:
+            stream = self._get_stream(name)
+            if stream is None:
+                stream_id = len(self.streams) + 1
+                stream = {"stream_id": stream_id, "name": name, "description": ""}
+                self.streams[stream_id] = stream
+                self._send_event(
+                    {"type": "stream", "op": "create", "streams": [dict(stream)]},
+                    lambda queue: True,
+                )
+            return stream
+
+    def inject_errors(
+        self, count: int = 1, status: Optional[int] = 500, endpoint: Optional[str] = None
+    ) -> None:
+        """
+        Answers the next `count` requests (to `endpoint`, e.g.
+        "messages", if given) with the HTTP status `status`, or drops
+        their connections if it is None.
+        """
+        with self.condition:
+            self.injected_errors.append(_InjectedError(count, status, endpoint))
+
+    def _make_handler(self) -> Callable[..., BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Otherwise, writing the headers and the body separately
+            # runs into delayed ACKs, adding 40ms to each request.
+            disable_nagle_algorithm = True
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+            def handle_request(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                status, result = server._handle(
+                    self.command, self.path, self.headers.get("Authorization"), self.headers, body
+                )
+                if status is None:
+                    self.close_connection = True
+                    return
+                if isinstance(result, bytes):
+                    content = result
+                    content_type = "application/octet-stream"
+                else:
+                    content = json.dumps(result).encode()
+                    content_type = "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_request
+
+        return Handler
+
+    def _handle(
+        self, method: str, path: str, authorization: Optional[str], headers: Any, body: bytes
+    ) -> Tuple[Optional[int], Any]:
+        url = urllib.parse.urlsplit(path)
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        content_type = headers.get("Content-Type", "")
+        files = {}  # type: Dict[str, Tuple[str, bytes]]
+        if content_type.startswith("multipart/form-data"):
+            message = email.parser.BytesParser().parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )  # type: Any
+            for part in message.get_payload():
+                name = part.get_param("name", header="content-disposition")
+                payload = part.get_payload(decode=True)
+                if part.get_filename() is not None:
+                    files[name] = (part.get_filename(), payload)
+                else:
+                    params[name] = payload.decode()
+        elif body:
+            for key, values in urllib.parse.parse_qs(body.decode()).items():
+                params[key] = values[-1]
+
+        endpoint = url.path[len(API_PREFIX) :] if url.path.startswith(API_PREFIX) else url.path
+        with self.condition:
+            request_key = (method, endpoint)
+            self.request_counts[request_key] = self.request_counts.get(request_key, 0) + 1
+            error = self._take_error(endpoint)
+        if error is not None:
+            return error
+
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency > 0:
+            time.sleep(latency)
+
+        user = self._authenticate(authorization)
+        if user is None:
+            return 401, {"result": "error", "msg": "Invalid API key", "code": "UNAUTHORIZED"}
+        if endpoint.startswith("/user_uploads/") and method == "GET":
+            with self.condition:
+                content = self.uploads.get(endpoint)
+            if content is None:
+                return 404, {"result": "error", "msg": "File not found"}
+            return 200, content
+
+        handlers = {
+            ("POST", "register"): self._register,
+            ("GET", "events"): self._get_events,
+            ("DELETE", "events"): self._delete_queue,
+            ("POST", "messages"): self._send_message,
+            ("GET", "messages"): self._get_messages,
+            ("POST", "user_uploads"): lambda user, params: self._upload(user, files),
+            ("GET", "bot_storage"): self._get_storage,
+            ("PUT", "bot_storage"): self._update_storage,
+            ("DELETE", "bot_storage"): self._remove_storage,
+            ("GET", "users/me"): lambda user, params: (200, dict(user, result="success", msg="")),
+            ("GET", "get_stream_id"): self._get_stream_id,
+        }  # type: Dict[Tuple[str, str], Callable[[Dict[str, Any], Dict[str, str]], _Response]]
+        handler = handlers.get((method, endpoint))
+        if handler is None:
+            return 404, {"result": "error", "msg": "Endpoint not found", "code": "BAD_REQUEST"}
+        try:
+            return handler(user, params)
+        except (KeyError, ValueError) as e:
+            return 400, {"result": "error", "msg": f"Invalid request: {e}", "code": "BAD_REQUEST"}
+
+    def _take_error(self, endpoint: str) -> Optional[_Response]:
+        for injected in self.injected_errors:
+            if injected.endpoint is None or injected.endpoint == endpoint:
+                injected.count -= 1
+                if injected.count <= 0:
+                    self.injected_errors.remove(injected)
+                return self._error_response(injected.status)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self._error_response(self.error_status)
+        return None
+
+    @staticmethod
+    def _error_response(status: Optional[int]) -> _Response:
+        return status, {"result": "error", "msg": "Injected error", "code": "BAD_REQUEST"}
+
+    def _authenticate(self, authorization: Optional[str]) -> Optional[Dict[str, Any]]:
+        if authorization is None or not authorization.startswith("Basic "):
+            return None
+        try:
+            credentials = base64.b64decode(authorization[len("Basic ") :]).decode()
+        except ValueError:
+            return None
+        email, _, api_key = credentials.partition(":")
+        if not email or not api_key:
+            return None
+        return self.add_user(email)
+
+    @staticmethod
+    def _json_param(params: Dict[str, str], name: str, default: Any) -> Any:
+        if name not in params:
+            return default
+        return json.loads(params[name])
+
+    def _get_stream(self, name: str) -> Optional[Dict[str, Any]]:
+        for stream in self.streams.values():
+            if stream["name"].lower() == name.lower():
+                return stream
+        return None
+
+    def _send_event(self, event: Dict[str, Any], recipient: Callable[[_Queue], bool]) -> None:
+        for queue in self.queues.values():
+            if queue.wants(event["type"]) and recipient(queue):
+                queue.push(event)
+        self.condition.notify_all()
+
+    def _expire_queues(self) -> None:
+        now = time.monotonic()
+        for queue_id, queue in list(self.queues.items()):
+            if now - queue.last_access > self.queue_timeout:
+                del self.queues[queue_id]
+
+    def _register(self, user: Dict[str, Any], params: Dict[str, str]) -> _Response:
+        event_types = self._json_param(params, "event_types", None)
+        narrow = self._narrow_param(params)
+        with self.condition:
+            self._expire_queues()
+            queue = _Queue(uuid.uuid4().hex, user, event_types, narrow)
+            self.queues[queue.queue_id] = queue
+            state = {
+                "result": "success",
+                "msg": "",
+                "queue_id": queue.queue_id,
+                "last_event_id": -1,
+                "zulip_version": "fake",
+                "zulip_feature_level": 1,
+                "max_message_id": self.messages[-1]["id"] if self.messages else -1,
+            }  # type: Dict[str, Any]
+            if event_types is None or "realm_user" in event_types:
+                state["realm_users"] = [dict(other) for other in self.users.values()]
+                state["realm_non_active_users"] = []
+                state["cross_realm_bots"] = []
+            if event_types is None or "stream" in event_types:
+                state["streams"] = [dict(stream) for stream in self.streams.values()]
+            if event_types is None or "subscription" in event_types:
+                subscribers = [other["user_id"] for other in self.users.values()]
+                state["subscriptions"] = [
+                    dict(stream, subscribers=subscribers) for stream in self.streams.values()
+                ]
+                state["unsubscribed"] = []
+                state["never_subscribed"] = []
+        return 200, state
+
+    def _get_queue(self, params: Dict[str, str]) -> Union[_Queue, _Response]:
+        queue_id = params.get("queue_id", "")
+        self._expire_queues()
+        queue = self.queues.get(queue_id)
+        if queue is None:
+            return 400, {
+                "result": "error",
+                "msg": f"Bad event queue ID: {queue_id}",
+                "code": "BAD_EVENT_QUEUE_ID",
+                "queue_id": queue_id,
+            }
+        queue.last_access = time.monotonic()
+        return queue
+
+    def _get_events(self, user: Dict[str, Any], params: Dict[str, str]) -> _Response:
+        last_event_id = int(params.get("last_event_id", -1))
+        dont_block = self._json_param(params, "dont_block", False)
+        with self.condition:
+            queue = self._get_queue(params)
+            if not isinstance(queue, _Queue):
+                return queue
+            queue.prune(last_event_id)
+            deadline = time.monotonic() + self.heartbeat_interval
+            while not queue.events and not dont_block and not self.stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    queue.push({"type": "heartbeat"})
+                    break
+                self.condition.wait(remaining)
+            queue.last_access = time.monotonic()
+            return 200, {
+                "result": "success",
+                "msg": "",
+                "events": list(queue.events),
+                "queue_id": queue.queue_id,
+            }
+
+    def _delete_queue(self, user: Dict[str, Any], params: Dict[str, str]) -> _Response:
+        with self.condition:
+            queue = self._get_queue(params)
+            if not isinstance(queue, _Queue):
+                return queue
+            del self.queues[queue.queue_id]
+        return 200, {"result": "success", "msg": ""}
+
+    def _recipient_users(self, to: Any) -> List[Dict[str, Any]]:
+        if isinstance(to, str):
+            try:
+                to = json.loads(to)
+            except ValueError:
+                to = to.split(",")
+        if not isinstance(to, list):
+            to = [to]
+        users = []
+        for recipient in to:
+            if isinstance(recipient, int):
+                user = next(
+                    (user for user in self.users.values() if user["user_id"] == recipient), None
+                )
+                if user is None:
+                    raise ValueError(f"Invalid user ID {recipient}")
+                users.append(user)
+            else:
+                users.append(self.add_user(recipient.strip()))
+        return users
+
+    def _send_message(self, user: Dict[str, Any], params: Dict[str, str]) -> _Response:
+        with self.condition:
+            message = {
+                "id": len(self.messages) + 1,
+                "sender_id": user["user_id"],
+                "sender_email": user["email"],
+                "sender_full_name": user["full_name"],
+                "content": params["content"],
+                "timestamp": int(time.time()),
+                "client": "FakeZulipServer",
+            }  # type: Dict[str, Any]
+            if params["type"] == "stream":
+                to = params["to"]  # type: Any
+                try:
+                    to = json.loads(to)
+                except ValueError:
+                    pass
+                if isinstance(to, list):
+                    to = to[0]
+                stream = self.streams.get(to) if isinstance(to, int) else self._get_stream(to)
+                if stream is None:
+                    return 400, {
+                        "result": "error",
+                        "msg": f"Stream '{to}' does not exist",
+                        "code": "STREAM_DOES_NOT_EXIST",
+                    }
+                message.update(
+                    type="stream",
+                    stream_id=stream["stream_id"],
+                    display_recipient=stream["name"],
+                    subject=params.get("topic", params.get("subject", "(no topic)")),
+                )
+                recipient_ids = None  # type: Optional[List[int]]
+            else:
+                recipients = self._recipient_users(params["to"])
+                if user not in recipients:
+                    recipients.append(user)
+                message.update(
+                    type="private",
+                    display_recipient=[
+                        {"id": r["user_id"], "email": r["email"], "full_name": r["full_name"]}
+                        for r in recipients
+                    ],
+                    subject="",
+                )
+                recipient_ids = [r["user_id"] for r in recipients]
+            self.messages.append(message)
+
+            def receives(queue: _Queue) -> bool:
+                if recipient_ids is not None and queue.user["user_id"] not in recipient_ids:
+                    return False
+                return self._matches(message, queue.narrow)
+
+            self._send_event({"type": "message", "message": message, "flags": []}, receives)
+        return 200, {"result": "success", "msg": "", "id": message["id"]}
+
+    def _narrow_param(self, params: Dict[str, str]) -> List[Tuple[str, Any]]:
+        narrow = []
+        for term in self._json_param(params, "narrow", []):
+            if isinstance(term, dict):
+                operator, operand = term["operator"], term["operand"]
+            else:
+                operator, operand = term
+            if operator not in ("stream", "topic", "sender", "is"):
+                raise ValueError(f"unsupported narrow operator {operator}")
+            narrow.append((operator, operand))
+        return narrow
+
+    @staticmethod
+    def _matches(message: Dict[str, Any], narrow: List[Tuple[str, Any]]) -> bool:
+        for operator, operand in narrow:
+            if operator == "stream":
+                if message["type"] != "stream" or (
+                    message["display_recipient"].lower() != str(operand).lower()
+                    and message["stream_id"] != operand
+                ):
+                    return False
+            elif operator == "topic":
+                if message["subject"].lower() != operand.lower():
+                    return False
+            elif operator == "sender":
+                if operand not in (message["sender_email"], message["sender_id"]):
+                    return False
+            elif operator == "is" and operand == "private":
+                if message["type"] != "private":
+                    return False
+        return True
+
+    def _get_messages(self, user: Dict[str, Any], params: Dict[str, str]) -> _Response:
+        narrow = self._narrow_param(params)
+        anchor = params.get("anchor", "newest")
+        num_before = int(params.get("num_before", 0))
+        num_after = int(params.get("num_after", 0))
+        include_anchor = self._json_param(params, "include_anchor", True)
+
+        with self.condition:
+            messages = [
+                message
+                for message in self.messages
+                if self._matches(message, narrow)
+                and (
+                    message["type"] == "stream"
+                    or user["user_id"] in [r["id"] for r in message["display_recipient"]]
+                )
+            ]
+        if anchor == "newest":
+            anchor_id = messages[-1]["id"] if messages else 0
+        elif anchor in ("oldest", "first_unread"):
+            anchor_id = messages[0]["id"] if messages else 0
+        else:
+            anchor_id = int(anchor)
+
+        before = [m for m in messages if m["id"] < anchor_id]
+        after = [m for m in messages if m["id"] > anchor_id]
+        at_anchor = [m for m in messages if m["id"] == anchor_id and include_anchor]
+        result_messages = (before[-num_before:] if num_before else []) + at_anchor
+        result_messages += after[:num_after]
+        return 200, {
+            "result": "success",
+            "msg": "",
+            "messages": [dict(message, flags=["read"]) for message in result_messages],
+            "anchor": anchor_id,
+            "found_anchor": bool(at_anchor),
+            "found_oldest": len(before) <= num_before,
+            "found_newest": len(after) <= num_after,
+        }
+
+    def _upload(self, user: Dict[str, Any], files: Dict[str, Tuple[str, bytes]]) -> _Response:
+        if len(files) != 1:
+            return 400, {"result": "error", "msg": "You must specify a file to upload"}
+        ((filename, content),) = files.values()
+        uri = f"/user_uploads/1/{uuid.uuid4().hex[:24]}/{os.path.basename(filename)}"
+        with self.condition:
+            self.uploads[uri] = content
+        return 200, {"result": "success", "msg": "", "uri": uri, "url": uri}
+
+    def _get_storage(self, user: Dict[str, Any], params: Dict[str, str]) -> _Response:
+        with self.condition:
+            storage = self.storage.get(user["user_id"], {})
+            keys = self._json_param(params, "keys", None)
+            if keys is None:
+                return 200, {"result": "success", "msg": "", "storage": dict(storage)}
+            missing = [key for key in keys if key not in storage]
+            if missing:
+                return 400, {"result": "error", "msg": "Key does not exist.", "code": "BAD_REQUEST"}
+            return 200, {"result": "success", "msg": "", "storage": {k: storage[k] for k in keys}}
+
+    def _update_storage(self, user: Dict[str, Any], params: Dict[str, str]) -> _Response:
+        storage = self._json_param(params, "storage", {})
+        with self.condition:
+            self.storage.setdefault(user["user_id"], {}).update(storage)
+        return 200, {"result": "success", "msg": ""}
+
+    def _remove_storage(self, user: Dict[str, Any], params: Dict[str, str]) -> _Response:
+        keys = self._json_param(params, "keys", None)
+        with self.condition:
+            storage = self.storage.setdefault(user["user_id"], {})
+            if keys is None:
+                storage.clear()
+            elif any(key not in storage for key in keys):
+                return 400, {"result": "error", "msg": "Key does not exist.", "code": "BAD_REQUEST"}
+            else:
+                for key in keys:
+                    del storage[key]
+        return 200, {"result": "success", "msg": ""}
+
+    def _get_stream_id(self, user: Dict[str, Any], params: Dict[str, str]) -> _Response:
+        with self.condition:
+            stream = self._get_stream(params["stream"])
+        if stream is None:
+            return 400, {
+                "result": "error",
+                "msg": f"Invalid stream name '{params['stream']}'",
+                "code": "BAD_REQUEST",
+            }
+        return 200, {"result": "success", "msg": "", "stream_id": stream["stream_id"]}
+
+
+class ScriptedBody(io.BytesIO):
+    """
+    The body of a make_response response, which records whether
+    requests has released its connection.
+    """
+
+    released = False
+
+    def release_conn(self) -> None:
+        self.released = True
+
+
+def make_response(
+    status_code: int,
+    body: Union[bytes, Mapping[str, Any]],
+    headers: Optional[Mapping[str, str]] = None,
+) -> requests.Response:
+    """
+    A response for a ScriptedTransport to answer a request with; `body`
+    is a JSON object, or its encoding.  The body is only read once it
+    is accessed, as in a streamed response.
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers["Content-Type"] = "application/json"
+    if headers is not None:
+        response.headers.update(headers)
+    response.raw = ScriptedBody(body if isinstance(body, bytes) else json.dumps(body).encode())
+    return response
+
+
+class ScriptedTransport(zulip.Transport):
+    """
+    A zulip.Transport for unit tests that script the server's responses,
+    e.g. to make a request fail, and for benchmarks that only measure
+    the client; it answers requests without any I/O:
+
+    >>> transport = ScriptedTransport(
+    ...     [make_response(503, {"result": "error", "msg": "Unavailable"})],
+    ...     respond=lambda method, endpoint: make_response(200, {"result": "success", "msg": ""}),
+    ... )
+    >>> client = zulip.Client(email="bot@example.com", api_key="key",
+    ...                       site="zulip.example.com", transport=transport)
+
+    Each request is answered with the next of `responses`, and once
+    they have run out, with `respond(method, endpoint)`.  Like
+    FakeZulipServer, it counts the requests made in `request_counts`.
+    """
+
+    def __init__(
+        self, responses: Iterable[requests.Response] = (), respond: Optional[_Respond] = None
+    ) -> None:
+        self.responses = collections.deque(responses)
+        self.respond = respond
+        self.lock = threading.Lock()
+        # (method, endpoint) -> number of requests.
+        self.request_counts = {}  # type: Dict[Tuple[str, str], int]
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        path = urllib.parse.urlsplit(url).path
+        endpoint = path[len(API_PREFIX) :] if path.startswith(API_PREFIX) else path
+        with self.lock:
+            request_key = (method, endpoint)
+            self.request_counts[request_key] = self.request_counts.get(request_key, 0) + 1
+            response = self.responses.popleft() if self.responses else None
+        if response is None:
+            if self.respond is None:
+                raise AssertionError(f"Unexpected request: {method} {endpoint}")
+            response = self.respond(method, endpoint)
+        response.url = url
+        return response
@@ -0,0 +1,353 @@
+import abc
+import http.cookiejar
+import ssl
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Tuple, Union
+
+import requests
+import requests.adapters
+import requests.structures
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class Transport(abc.ABC):
+    """
+    The HTTP layer used by zulip.Client to talk to the server.
+
+    A transport holds connection state (pools, keep-alive sockets) but
+    no credentials or cookies: the client passes its authentication and TLS
+    settings with every request, so one transport can be shared by
+    any number of Clients, including Clients for different users or
+    realms.
+
+    Implementations must return a `requests.Response`-compatible
+    object and raise the `requests.exceptions` errors that
+    Client.do_api_query knows how to retry.
+    """
+
+    @abc.abstractmethod
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        ...
+
+    def get_stats(self) -> Dict[str, int]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class _RejectCookies(http.cookiejar.DefaultCookiePolicy):
+    # A cookie set in a response to one Client must not be sent with the
+    # requests of another sharing the transport, e.g. for another user.
+    def set_ok(self, cookie: http.cookiejar.Cookie, request: Any) -> bool:
+        return False
+
+    def return_ok(self, cookie: http.cookiejar.Cookie, request: Any) -> bool:
+        return False
+
+
+class PoolStats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters = {
+            "requests": 0,
+            "pool_hits": 0,
+            "pool_misses": 0,
+            "idle_closed": 0,
+        }
+
+    def increment(self, counter: str) -> None:
+        with self.lock:
+            self.counters[counter] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+
+class _InstrumentedPoolMixin:
+    """
+    Counts how often a request reuses a kept-alive connection from the
+    pool (a hit) instead of opening a new one (a miss), and closes
+    connections that have been idle in the pool for longer than
+    `idle_timeout` so that we don't send requests on sockets that the
+    server or a proxy has likely already dropped.
+    """
+
+    # Set on the pool classes that PoolingHTTPAdapter builds.
+    stats = PoolStats()
+    idle_timeout = None  # type: Optional[float]
+
+    def _get_conn(self, timeout: Optional[float] = None) -> Any:
+        conn = super()._get_conn(timeout)  # type: ignore[misc] # mixin for urllib3 pools
+        last_used = getattr(conn, "_zulip_last_used", None)
+        if (
+            self.idle_timeout is not None
+            and last_used is not None
+            and getattr(conn, "sock", None) is not None
+            and time.monotonic() - last_used > self.idle_timeout
+        ):
+            conn.close()
+            self.stats.increment("idle_closed")
+
+        self.stats.increment("requests")
+        if getattr(conn, "sock", None) is None:
+            self.stats.increment("pool_misses")
+        else:
+            self.stats.increment("pool_hits")
+        return conn
+
+    def _put_conn(self, conn: Any) -> None:
+        if conn is not None:
+            conn._zulip_last_used = time.monotonic()
+        super()._put_conn(conn)  # type: ignore[misc] # mixin for urllib3 pools
+
+
+class PoolingHTTPAdapter(requests.adapters.HTTPAdapter):
+    def __init__(
+        self, stats: PoolStats, idle_timeout: Optional[float] = None, **kwargs: Any
+    ) -> None:
+        attributes = {"stats": stats, "idle_timeout": idle_timeout}
+        self.pool_classes = {
+            "http": type(
+                "InstrumentedHTTPConnectionPool",
+                (_InstrumentedPoolMixin, HTTPConnectionPool),
+                attributes,
+            ),
+            "https": type(
+                "InstrumentedHTTPSConnectionPool",
+                (_InstrumentedPoolMixin, HTTPSConnectionPool),
+                attributes,
+            ),
+        }
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+
+class RequestsTransport(Transport):
+    """
+    A Transport built on a single `requests.Session`, whose keep-alive
+    connections are pooled per (scheme, host, port).
+
+    pool_connections: how many hosts to keep a pool for.
+    pool_maxsize: how many idle connections to keep per host.
+    pool_block: if True, pool_maxsize is also a hard limit on the
+        number of concurrent connections to one host; further
+        requests wait for a connection to be returned to the pool.
+    idle_timeout: close pooled connections that have been idle for
+        longer than this many seconds instead of reusing them.
+
+    To share one pool between many clients:
+
+    >>> transport = zulip.RequestsTransport(pool_maxsize=20)
+    >>> clients = [zulip.Client(config_file=f, transport=transport) for f in zuliprcs]
+    >>> transport.get_stats()
+    {'requests': 1200, 'pool_hits': 1180, 'pool_misses': 20, 'idle_closed': 0}
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = requests.adapters.DEFAULT_POOLSIZE,
+        pool_maxsize: int = requests.adapters.DEFAULT_POOLSIZE,
+        pool_block: bool = False,
+        idle_timeout: Optional[float] = None,
+    ) -> None:
+        self.stats = PoolStats()
+        self.session = requests.Session()
+        self.session.cookies.set_policy(_RejectCookies())
+        adapter = PoolingHTTPAdapter(
+            self.stats,
+            idle_timeout=idle_timeout,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    def get_stats(self) -> Dict[str, int]:
+        return self.stats.snapshot()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# requests' `verify` and `cert` arguments.
+_TLSSettings = Tuple[Union[bool, str], Union[None, str, Tuple[str, str]]]
+
+
+class _HTTPXRaw:
+    """
+    Stands in for the urllib3 response as the `raw` attribute of the
+    requests.Response for a streamed httpx response.
+    """
+
+    def __init__(self, response: "httpx.Response") -> None:
+        self.response = response
+
+    def stream(self, chunk_size: int, decode_content: bool = True) -> Iterator[bytes]:
+        import httpx
+
+        try:
+            yield from self.response.iter_bytes(chunk_size)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ConnectionError(e)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+
+    def close(self) -> None:
+        self.response.close()
+
+
+def build_ssl_context(
+    verify: Union[bool, str], cert: Union[None, str, Tuple[str, str]]
+) -> ssl.SSLContext:
+    """
+    Returns an SSLContext for the `verify` and `cert` settings that
+    Client passes to requests, for HTTP libraries other than requests.
+    """
+    if isinstance(verify, str):
+        context = ssl.create_default_context(cafile=verify)
+    else:
+        # The same CA bundle that requests uses by default.
+        context = ssl.create_default_context(cafile=requests.utils.DEFAULT_CA_BUNDLE_PATH)
+        if not verify:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+    if isinstance(cert, tuple):
+        context.load_cert_chain(*cert)
+    elif cert is not None:
+        context.load_cert_chain(cert)
+    return context
+
+
+class HTTPXTransport(Transport):
+    """
+    A Transport built on `httpx`, which can use HTTP/2 (the default),
+    so that concurrent requests to a server, such as a long-polling
+    get_events alongside message sends, are multiplexed over one
+    connection instead of each needing a connection of its own.
+
+    Clients with different TLS settings (cert_bundle, insecure,
+    client_cert) use separate connections; all others share them.
+
+    max_connections: the most connections to open to one server, when
+        the server limits the number of concurrent streams on one.
+    http2: set to False to only use HTTP/1.1.
+
+    Requires the `httpx` package, with the `h2` package for HTTP/2:
+    pip install zulip[http2].
+    """
+
+    def __init__(self, max_connections: int = 10, http2: bool = True) -> None:
+        import httpx
+
+        self.httpx = httpx
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.lock = threading.Lock()
+        self.clients = {}  # type: Dict[_TLSSettings, httpx.Client]
+        self.requests = 0
+
+    def get_client(
+        self, verify: Union[bool, str], cert: Union[None, str, Tuple[str, str]]
+    ) -> "httpx.Client":
+        key = (verify, cert)  # type: _TLSSettings
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                client = self.clients[key] = self.httpx.Client(
+                    verify=build_ssl_context(verify, cert),
+                    http2=self.http2,
+                    limits=self.httpx.Limits(max_connections=self.max_connections),
+                    # Like requests, which honors e.g. HTTPS_PROXY too.
+                    trust_env=True,
+                )
+                client.cookies.jar.set_policy(_RejectCookies())
+            return client
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        httpx = self.httpx
+        client = self.get_client(kwargs.get("verify", True), kwargs.get("cert"))
+
+        headers = dict(kwargs.get("headers") or {})
+        auth = kwargs.get("auth")
+        if isinstance(auth, requests.auth.HTTPBasicAuth):
+            auth = httpx.BasicAuth(auth.username, auth.password)
+        elif auth is not None and not isinstance(auth, tuple):
+            # Let other requests auth classes set their headers; httpx
+            # sets the body's Content-Length itself.
+            prepared = requests.Request(method, url, headers=headers, auth=auth).prepare()
+            headers = {
+                key: value
+                for key, value in prepared.headers.items()
+                if key.lower() != "content-length"
+            }
+            auth = None
+
+        data = kwargs.get("data")
+        content = None
+        if data is not None and not isinstance(data, dict):
+            # A streamed body, such as a MultipartBody.
+            content = data
+            headers["Content-Length"] = str(len(data))
+            data = None
+
+        request = client.build_request(
+            method,
+            url,
+            params=kwargs.get("params"),
+            data=data,
+            content=content,
+            headers=headers,
+            timeout=kwargs.get("timeout"),
+        )
+        stream = kwargs.get("stream", False)
+        with self.lock:
+            self.requests += 1
+        try:
+            response = client.send(request, stream=stream, auth=auth)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e)
+        except httpx.TransportError as e:
+            # Failing to connect, or the connection being dropped.
+            raise requests.exceptions.ConnectionError(e)
+        except Exception as e:
+            # httpcore lets some HTTP/2 errors through unwrapped, e.g.
+            # for requests in flight when the server closes the
+            # connection after its maximum number of requests.
+            if type(e).__module__.startswith("h2."):
+                raise requests.exceptions.ConnectionError(e)
+            raise
+
+        result = requests.Response()
+        result.status_code = response.status_code
+        result.reason = response.reason_phrase
+        result.headers = requests.structures.CaseInsensitiveDict(response.headers)
+        result.url = str(response.url)
+        result.encoding = response.encoding
+        if stream:
+            result.raw = _HTTPXRaw(response)
+        else:
+            result._content = response.content
+        return result
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"requests": self.requests}
+
+    def close(self) -> None:
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients = {}
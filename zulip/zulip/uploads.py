@@ -0,0 +1,228 @@
+import concurrent.futures
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import tempfile
+import threading
+import uuid
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+CHUNK_SIZE = 64 * 1024
+
+# A part of a MultipartBody: either bytes, or a (file, start, size) range.
+_Part = Union[bytes, Tuple[IO[Any], int, int]]
+_Parts = List[_Part]
+
+
+def _quote(value: str) -> str:
+    # Browsers percent-encode quotes and line breaks in multipart
+    # parameters, and Django decodes them again.
+    return value.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class MultipartBody:
+    """
+    A multipart/form-data request body with the given form fields and
+    files, which reads the files only as the body is being sent, so
+    that uploading a file never needs it all in memory.  Each file is
+    sent as a field named after the file, from its current position to
+    its end.
+
+    Files that aren't seekable are read into memory first, since the
+    body must know its length up front and be able to start over if
+    the request is retried; see rewind.
+    """
+
+    def __init__(self, fields: Mapping[str, str], files: Sequence[IO[Any]]) -> None:
+        boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary=" + boundary
+
+        self.parts = []  # type: _Parts
+        for name, value in fields.items():
+            self.parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                f"{value}\r\n".encode()
+            )
+        for file in files:
+            if not file.seekable():
+                name = file.name
+                file = io.BytesIO(file.read())
+                file.name = name
+            filename = os.path.basename(file.name)
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            self.parts.append(
+                f"--{boundary}\r\nContent-Disposition: form-data; "
+                f'name="{_quote(file.name)}"; filename="{_quote(filename)}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n".encode()
+            )
+            start = file.tell()
+            size = file.seek(0, io.SEEK_END) - start
+            self.parts.append((file, start, size))
+            self.parts.append(b"\r\n")
+        self.parts.append(f"--{boundary}--\r\n".encode())
+
+        self.length = sum(part[2] if isinstance(part, tuple) else len(part) for part in self.parts)
+        self.rewind()
+
+    def rewind(self) -> None:
+        """Starts reading the body from the beginning again."""
+        self.part_index = 0
+        self.offset = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[bytes]:
+        chunk = self.read(CHUNK_SIZE)
+        while chunk:
+            yield chunk
+            chunk = self.read(CHUNK_SIZE)
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            size = self.length
+        chunks = []
+        while size > 0 and self.part_index < len(self.parts):
+            part = self.parts[self.part_index]
+            if isinstance(part, tuple):
+                file, start, part_size = part
+                file.seek(start + self.offset)
+                chunk = file.read(min(size, part_size - self.offset))
+                if not chunk and self.offset < part_size:
+                    raise ValueError(f"{file.name} was truncated while being uploaded")
+            else:
+                part_size = len(part)
+                chunk = part[self.offset : self.offset + size]
+            chunks.append(chunk)
+            size -= len(chunk)
+            self.offset += len(chunk)
+            if self.offset >= part_size:
+                self.part_index += 1
+                self.offset = 0
+        return b"".join(chunks)
+
+
+def file_digest(file: IO[bytes]) -> str:
+    """
+    Returns the SHA-256 hash of the rest of the file, leaving the file
+    at the position it was at; so the file must be seekable.
+    """
+    start = file.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.seek(start)
+    return digest.hexdigest()
+
+
+class UploadCache:
+    """
+    Remembers the results of uploading files with zulip.Client, keyed
+    by a hash of their content, so that uploading the same content
+    again returns the URI of the earlier upload instead of transferring
+    it again.  Pass one as the `upload_cache` argument of zulip.Client.
+
+    With a `path`, the cache is also saved in that JSON file, and so
+    kept across restarts.  Entries are specific to the server and user,
+    since uploads are only accessible in messages sent by their owner.
+    Concurrent uploads of the same content are coalesced into one.
+    Note that if an upload is deleted on the server, its URI stays in
+    the cache; clear it with forget.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = os.path.abspath(os.path.expanduser(path)) if path is not None else None
+        self.lock = threading.Lock()
+        self.results = {}  # type: Dict[str, Dict[str, Any]]
+        self.in_flight = {}  # type: Dict[str, concurrent.futures.Future[Dict[str, Any]]]
+        if self.path is not None:
+            try:
+                with open(self.path) as f:
+                    self.results = json.load(f)
+            except FileNotFoundError:
+                pass
+            except ValueError:
+                # A corrupt cache just means uploading files again.
+                pass
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            result = self.results.get(key)
+            return dict(result) if result is not None else None
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        with self.lock:
+            self.results[key] = dict(result)
+            self._save()
+
+    def get_or_upload(self, key: str, upload: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Returns the cached result for `key`, or calls `upload` to upload
+        the file, caching its result if it succeeds.  While the upload
+        is in progress, other calls for the same key wait for its result
+        rather than uploading the content again.
+        """
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None:
+                return dict(result)
+            future = self.in_flight.get(key)
+            owner = future is None
+            if future is None:
+                future = concurrent.futures.Future()
+                self.in_flight[key] = future
+
+        if not owner:
+            return dict(future.result())
+
+        try:
+            result = upload()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.in_flight[key]
+            if result["result"] == "success":
+                self.results[key] = dict(result)
+                self._save()
+        future.set_result(result)
+        return result
+
+    def forget(self, uri: str) -> None:
+        """Removes all entries for the given URI."""
+        with self.lock:
+            self.results = {
+                key: result for key, result in self.results.items() if result.get("uri") != uri
+            }
+            self._save()
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path), prefix=".zulip-upload-cache-"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.results, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
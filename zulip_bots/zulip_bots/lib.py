@@ -11,7 +11,7 @@ from typing import IO, Any, Dict, Iterator, List, Optional, Set
 
 from typing_extensions import Protocol
 
-from zulip import Client, ZulipError
+from zulip import Client, UploadCache, ZulipError
 
 
 class NoBotConfigException(Exception):
@@ -443,6 +443,7 @@ def run_message_handler_for_bot(
     config_file: str,
     bot_config_file: str,
     bot_name: str,
+    upload_cache: Optional[str] = None,
 ) -> Any:
     """
     lib_module is of type Any, since it can contain any bot's
@@ -451,6 +452,10 @@ def run_message_handler_for_bot(
     function.
 
     Set default bot_details, then override from class, if provided
+
+    With an `upload_cache` file, the URIs of uploaded files are cached
+    there, so that a bot attaching the same file again doesn't upload
+    it again.
     """
     bot_details = {
         "name": bot_name.capitalize(),
@@ -462,7 +467,11 @@ def run_message_handler_for_bot(
     client_name = f"Zulip{bot_name.capitalize()}Bot"
 
     try:
-        client = Client(config_file=config_file, client=client_name)
+        client = Client(
+            config_file=config_file,
+            client=client_name,
+            upload_cache=UploadCache(upload_cache) if upload_cache is not None else None,
+        )
     except configparser.Error as e:
         display_config_file_errors(str(e), config_file)
         sys.exit(1)
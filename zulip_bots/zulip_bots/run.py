@@ -50,6 +50,12 @@ def parse_args() -> argparse.Namespace:
 
     parser.add_argument("--provision", action="store_true", help="install dependencies for the bot")
 
+    parser.add_argument(
+        "--upload-cache",
+        action="store",
+        help="file to cache uploaded files' URIs in, so that identical files aren't uploaded again",
+    )
+
     args = parser.parse_args()
     return args
 
@@ -160,6 +166,7 @@ def main() -> None:
             bot_config_file=args.bot_config_file,
             quiet=args.quiet,
             bot_name=bot_name,
+            upload_cache=args.upload_cache,
         )
     except NoBotConfigException:
         print(
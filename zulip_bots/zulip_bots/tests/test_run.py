@@ -30,6 +30,7 @@ class TestDefaultArguments(TestCase):
             bot_config_file=None,
             lib_module=mock.ANY,
             quiet=False,
+            upload_cache=None,
         )
 
     @patch("sys.argv", ["zulip-run-bot", path_to_bot, "--config-file", "/foo/bar/baz.conf"])
@@ -46,6 +47,7 @@ class TestDefaultArguments(TestCase):
             bot_config_file=None,
             lib_module=mock.ANY,
             quiet=False,
+            upload_cache=None,
         )
 
     def test_adding_bot_parent_dir_to_sys_path_when_bot_name_specified(self) -> None:
@@ -49,4 +49,11 @@ def parse_args() -> argparse.Namespace:
         type=int,
         help="Port on which you want to run the Botserver. (default: %(default)d)",
     )
+    parser.add_argument(
+        "--upload-cache",
+        action="store",
+        default=None,
+        help="File to cache the URIs of files uploaded by the bots in, so that "
+        "identical files aren't uploaded again.",
+    )
     return parser.parse_args()
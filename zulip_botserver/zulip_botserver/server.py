@@ -16,7 +16,7 @@ from typing import Any, Dict, List, Optional
 from flask import Flask, request
 from werkzeug.exceptions import BadRequest, Unauthorized
 
-from zulip import Client
+from zulip import Client, RequestsTransport, UploadCache
 from zulip_bots import lib
 from zulip_botserver.input_parameters import parse_args
 
@@ -149,13 +149,20 @@ def load_bot_handlers(
     available_bots: List[str],
     bots_config: Dict[str, Dict[str, str]],
     third_party_bot_conf: Optional[configparser.ConfigParser] = None,
+    upload_cache: Optional[UploadCache] = None,
 ) -> Dict[str, lib.ExternalBotHandler]:
     bot_handlers = {}
+    # All bots typically talk to the same Zulip server, so let them
+    # share one pool of keep-alive connections.
+    transport = RequestsTransport(pool_maxsize=max(len(available_bots), 1))
+    # The upload cache's keys include the bot's email, so it can be shared.
     for bot in available_bots:
         client = Client(
             email=bots_config[bot]["email"],
             api_key=bots_config[bot]["key"],
             site=bots_config[bot]["site"],
+            transport=transport,
+            upload_cache=upload_cache,
         )
         bot_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bots", bot)
         bot_handler = lib.ExternalBotHandler(
@@ -253,7 +260,10 @@ def main() -> None:
     third_party_bot_conf = (
         parse_config_file(options.bot_config_file) if options.bot_config_file is not None else None
     )
-    bot_handlers = load_bot_handlers(available_bots, bots_config, third_party_bot_conf)
+    upload_cache = UploadCache(options.upload_cache) if options.upload_cache is not None else None
+    bot_handlers = load_bot_handlers(
+        available_bots, bots_config, third_party_bot_conf, upload_cache
+    )
     message_handlers = init_message_handlers(available_bots, bots_lib_modules, bot_handlers)
     app.config["BOTS_LIB_MODULES"] = bots_lib_modules
     app.config["BOT_HANDLERS"] = bot_handlers